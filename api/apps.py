@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        # warm the workflow input cache of the worker (if enabled in the SettingsFile)
+        from .src_demo_new.lib.WorkflowInputs import preload_WorkflowInputs
+        preload_WorkflowInputs()
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...src_demo_new.lib.readData import readCurrentMarketData        , \
+                                         invalidateMarketDataSnapshot
+from ...src_demo_new.lib.PreProcessing import getStrDateIdentifier
+
+
+class Command(BaseCommand):
+    help = 'Invalidate and re-read the local CurrentMarketData snapshot of a trade date'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tradeDate', help='trade date DD/MM/YYYY')
+        parser.add_argument('--all', action='store_true',
+                            help='invalidate the snapshots of all trade dates')
+        parser.add_argument('--invalidate-only', action='store_true',
+                            help='only delete the snapshot, do not query the database')
+
+    def handle(self, *args, **options):
+        if options['all'] == True:
+            if not options['invalidate_only']:
+                raise CommandError('--all can only be used together with --invalidate-only')
+            str_dateIdentifier = None
+
+        else:
+            if options['tradeDate'] is None:
+                raise CommandError('--tradeDate DD/MM/YYYY is required (or --all --invalidate-only)')
+
+            str_dateIdentifier = getStrDateIdentifier(options['tradeDate'])
+            if str_dateIdentifier is None:
+                raise CommandError('The tradeDate format is wrong. It needs to be DD/MM/YYYY')
+
+        for filename in invalidateMarketDataSnapshot(str_dateIdentifier = str_dateIdentifier):
+            self.stdout.write('Deleted ' + filename)
+
+        if options['invalidate_only']:
+            return
+
+        completedNoError = readCurrentMarketData( str_dateIdentifier = str_dateIdentifier ,
+                                                  useSnapshot        = True               )[0]
+        if completedNoError == False:
+            raise CommandError('Could not read the CurrentMarketData of ' + options['tradeDate'])
+
+        self.stdout.write('Refreshed the CurrentMarketData snapshot of ' + options['tradeDate'])
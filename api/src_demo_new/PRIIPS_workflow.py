@@ -1,33 +1,33 @@
 def run_workflow(input):
 
     import pandas as pd
-    import numpy as np
-    import random
     import sys
     import os.path
     import timeit
     import json
 
     from .lib.readData import readSettings                   , \
-                             readMapping                    , \
-                             readRandomIndexFile            , \
-                             readCurrentMarketData          , \
-                             readHistoricalMarketData       , \
                              read_PRIIPsPath
 
+    from .lib.WorkflowInputs import settingsFilename_default , \
+                                   load_WorkflowInputs      , \
+                                   get_WorkflowInputs
+
+    from .lib.DBConnection import configure_ConnectionPool
+
     from .lib.setup_products import setup_products
 
     from .lib.PreProcessing import get_SpotRate         , \
                                   getStrDateIdentifier
 
-    from .lib.Bootstrap import calculate_LogReturns_FX       , \
-                              read_RandomIndices            , \
-                              select_RandomIndices          , \
-                              calculate_ItoTerm             , \
-                              calculate_ShiftTerm           , \
-                              calculate_PRIIPsPath_FMU      , \
-                              calculate_PRIIPsPath_Stressed , \
-                              calculate_stressed_vol
+    from .lib.BookPreProcessing import preProcess_ProductBook
+    from .lib.DateLogic import get_DateLogicCacheStatistics
+    from .lib.ProductBook import class_ProductBook
+    from .lib.Payoffs import update_Payoffs_ProductBook
+    from .lib.LogReturnCache import get_LogReturns_FX                , \
+                                   calculate_LogReturnStatistics_FX
+
+    from .lib.Simulation import simulate_PRIIPsPaths
 
     from .lib.LogInformation import getAllClassAttributes         , \
                                    write_LogInfo_ClassAttributes , \
@@ -48,10 +48,16 @@ def run_workflow(input):
     ###############################################################################
     print('')
     print('[READING SETTINGS FILE]')
-    dict_settings = readSettings(filename="Settings_20180625.json")
+    settingsFilename = settingsFilename_default
+
+    dict_settings = readSettings(filename=settingsFilename)
     if dict_settings == None:
         sys.exit()
 
+    # reuse the database connections across requests
+    configure_ConnectionPool( connection_string = dict_settings["dbConnectionString"] ,
+                              pool_size         = dict_settings["dbPoolSize"]         )
+
     str_dateIdentifier = getStrDateIdentifier(dict_settings["tradeDate"])
     if str_dateIdentifier == None:
         sys.exit()
@@ -108,62 +114,30 @@ def run_workflow(input):
     print('[READING MARKET DATA]')
 
     #-----------------------------------------------------------------------------#
-    #             Current Market Data                                             #
+    #    Current/Historical Market Data, Random Indices, Mappings                 #
+    #    (process-level cache: the historical data of all FX pairs is kept)       #
     #-----------------------------------------------------------------------------#
-    print('   (+) Current Market Data ...')
-    completedNoError                , \
-    df_CurrentMarketData_Exchange   , \
-    df_CurrentMarketData_Yield      , \
-    df_CurrentMarketData_FXATMVol   , \
-    df_CurrentMarketData_FXDeltaVol = readCurrentMarketData( str_dateIdentifier = str_dateIdentifier,
-                                                              filenameSuffix     = "-BARC-CurrentMarketData",
-                                                              fileFormat         = "csv")
-
-    # if there was just one error reading the files --> abort run
-    if completedNoError == False:
+    if dict_settings['useInputCache'] == True:
+        dict_inputs = get_WorkflowInputs( dict_settings      = dict_settings      ,
+                                          settingsFilename   = settingsFilename   ,
+                                          str_dateIdentifier = str_dateIdentifier ,
+                                          dict_timer         = dict_timer         )
+    else:
+        dict_inputs = load_WorkflowInputs( dict_settings      = dict_settings            ,
+                                           str_dateIdentifier = str_dateIdentifier       ,
+                                           list_FX_rates      = list_FX_rates_toSimulate ,
+                                           dict_timer         = dict_timer               )
+
+    # if there was just one error reading the inputs --> abort run
+    if dict_inputs is None:
         sys.exit()
 
-    # add timer
-    dict_timer['readCurrentMarketData'] = timeit.default_timer()
-
-    #-----------------------------------------------------------------------------#
-    #             Historical Market Data                                          #
-    #-----------------------------------------------------------------------------#
-    if len(list_FX_rates_toSimulate) != 0:
-        print('   (+) Historical Market Data ...')
-
-        completedNoError                   , \
-        df_HistoricalMarketData_Exchange   , \
-        df_HistoricalMarketData_Yield      , \
-        df_HistoricalMarketData_FXATMVol   , \
-        df_HistoricalMarketData_FXDeltaVol = readHistoricalMarketData( str_dateIdentifier = str_dateIdentifier,
-                                                                       filenameSuffix     = "-BARC-HistoricalMarketData",
-                                                                       fileFormat         = "csv",
-                                                                       list_typesToRead   = ["Exchange"] )
-
-        # if there was just one error reading the files (all 4 are None) --> abort run
-        if completedNoError == False:
-            sys.exit()
-
-    # add timer
-    dict_timer['readHistoricalMarketData'] = timeit.default_timer()
-
-    #-----------------------------------------------------------------------------#
-    #             Read Random Indices                                             #
-    #-----------------------------------------------------------------------------#
-    if dict_settings['readRandomIndices'] == True:
-        df_RandomIndices = readRandomIndexFile(filename = dict_settings["readRandomIndicesFilename"])
-
-    # add timer
-    dict_timer['readRandomIndices'] = timeit.default_timer()
-
-    ###############################################################################
-    #        READ MAPPINGS: CurrencyName to CurveName                             #
-    ###############################################################################
-    dict_Mapping = readMapping(filename=dict_settings["filename_Mapping"])
-
-    # add timer
-    dict_timer['readMappings'] = timeit.default_timer()
+    df_CurrentMarketData_Exchange    = dict_inputs['df_CurrentMarketData_Exchange']
+    obj_YieldCurves                  = dict_inputs['obj_YieldCurves']
+    obj_VolSurface                   = dict_inputs['obj_VolSurface']
+    df_HistoricalMarketData_Exchange = dict_inputs['df_HistoricalMarketData_Exchange']
+    obj_RandomIndices                = dict_inputs['obj_RandomIndices']
+    dict_Mapping                     = dict_inputs['dict_Mapping']
 
     ###############################################################################
     #        PRE-PROCESSING                                                       #
@@ -177,71 +151,51 @@ def run_workflow(input):
         # set tradeDate
         product.set_tradeDate(dict_settings['tradeDate'])
 
-        errorMessage = 0
-
-        #-------------------------------------------------------------------------#
-        #         FX Forward                                                      #
-        #-------------------------------------------------------------------------#
-        if product.product_type == 'FX_Forward':
-            errorMessage = product.preProcessing(df_CurrentMarketData_Exchange = df_CurrentMarketData_Exchange ,
-                                                 df_CurrentMarketData_Yield    = df_CurrentMarketData_Yield    ,
-                                                 dict_YieldCcy_CurveName       = dict_Mapping["FX_Yield"]      )
-
-        #-------------------------------------------------------------------------#
-        #         FX Swap                                                         #
-        #-------------------------------------------------------------------------#
-        elif product.product_type == 'FX_Swap':
-            errorMessage = product.preProcessing(df_CurrentMarketData_Exchange = df_CurrentMarketData_Exchange ,
-                                                 df_CurrentMarketData_Yield    = df_CurrentMarketData_Yield    ,
-                                                 dict_YieldCcy_CurveName       = dict_Mapping["FX_Yield"]      )
-
-        #-------------------------------------------------------------------------#
-        #         FX Option                                                       #
-        #-------------------------------------------------------------------------#
-        elif product.product_type == 'FX_Option':
-            errorMessage = product.preProcessing(df_CurrentMarketData_Exchange = df_CurrentMarketData_Exchange ,
-                                                 df_CurrentMarketData_Yield    = df_CurrentMarketData_Yield    ,
-                                                 dict_YieldCcy_CurveName       = dict_Mapping["FX_Yield"]      ,
-                                                 df_CurrentMarketData_FXATMVol = df_CurrentMarketData_FXATMVol ,
-                                                 dict_FXATMVol_CurveName       = dict_Mapping["FX_Vol_ATM"]    )
-
-        #-------------------------------------------------------------------------#
-        #         FX DCI                                                          #
-        #-------------------------------------------------------------------------#
-        elif product.product_type == 'FX_DCI':
-            errorMessage = product.preProcessing(df_CurrentMarketData_Exchange   = df_CurrentMarketData_Exchange   ,
-                                                 df_CurrentMarketData_Yield      = df_CurrentMarketData_Yield      ,
-                                                 dict_YieldCcy_CurveName         = dict_Mapping["FX_Yield"]        ,
-                                                 df_CurrentMarketData_FXATMVol   = df_CurrentMarketData_FXATMVol   ,
-                                                 dict_FXATMVol_CurveName         = dict_Mapping["FX_Vol_ATM"]      ,
-                                                 df_CurrentMarketData_FXDeltaVol = df_CurrentMarketData_FXDeltaVol ,
-                                                 dict_FXDeltaVol_MS_CurveName    = dict_Mapping["FX_Vol_DeltaMS"]  ,
-                                                 dict_FXDeltaVol_RR_CurveName    = dict_Mapping["FX_Vol_DeltaRR"]  )
-
-        #-------------------------------------------------------------------------#
-        #         FX ODF                                                          #
-        #-------------------------------------------------------------------------#
-        elif product.product_type == 'FX_ODF':
-            errorMessage = product.preProcessing(df_CurrentMarketData_Exchange = df_CurrentMarketData_Exchange ,
-                                                 df_CurrentMarketData_Yield    = df_CurrentMarketData_Yield    ,
-                                                 dict_YieldCcy_CurveName       = dict_Mapping["FX_Yield"]      )
-
-        #-------------------------------------------------------------------------#
-        #         unknown product type                                            #
-        #-------------------------------------------------------------------------#
-        else:
-            print('[ERROR]. Product type ' + product.product_type + ' not known...')
-            print('         Skipping')
-
-            product.set_ErrorMessage()
-
-            continue
-
-        if errorMessage < 0:
+    # market data per product type
+    dict_PreProcessingArguments = {
+        'FX_Forward' : { 'df_CurrentMarketData_Exchange'   : df_CurrentMarketData_Exchange    ,
+                         'df_CurrentMarketData_Yield'      : obj_YieldCurves                  ,
+                         'dict_YieldCcy_CurveName'         : dict_Mapping["FX_Yield"]         },
+
+        'FX_Swap'    : { 'df_CurrentMarketData_Exchange'   : df_CurrentMarketData_Exchange    ,
+                         'df_CurrentMarketData_Yield'      : obj_YieldCurves                  ,
+                         'dict_YieldCcy_CurveName'         : dict_Mapping["FX_Yield"]         },
+
+        'FX_Option'  : { 'df_CurrentMarketData_Exchange'   : df_CurrentMarketData_Exchange    ,
+                         'df_CurrentMarketData_Yield'      : obj_YieldCurves                  ,
+                         'dict_YieldCcy_CurveName'         : dict_Mapping["FX_Yield"]         ,
+                         'df_CurrentMarketData_FXATMVol'   : obj_VolSurface                   ,
+                         'dict_FXATMVol_CurveName'         : dict_Mapping["FX_Vol_ATM"]       },
+
+        'FX_DCI'     : { 'df_CurrentMarketData_Exchange'   : df_CurrentMarketData_Exchange    ,
+                         'df_CurrentMarketData_Yield'      : obj_YieldCurves                  ,
+                         'dict_YieldCcy_CurveName'         : dict_Mapping["FX_Yield"]         ,
+                         'df_CurrentMarketData_FXATMVol'   : obj_VolSurface                   ,
+                         'dict_FXATMVol_CurveName'         : dict_Mapping["FX_Vol_ATM"]       ,
+                         'df_CurrentMarketData_FXDeltaVol' : obj_VolSurface                   ,
+                         'dict_FXDeltaVol_MS_CurveName'    : dict_Mapping["FX_Vol_DeltaMS"]   ,
+                         'dict_FXDeltaVol_RR_CurveName'    : dict_Mapping["FX_Vol_DeltaRR"]   },
+
+        'FX_ODF'     : { 'df_CurrentMarketData_Exchange'   : df_CurrentMarketData_Exchange    ,
+                         'df_CurrentMarketData_Yield'      : obj_YieldCurves                  ,
+                         'dict_YieldCcy_CurveName'         : dict_Mapping["FX_Yield"]         }}
+
+    # products with the same pair/RHP/... share the market data part
+    list_errorMessages = preProcess_ProductBook( list_products               = list_products               ,
+                                                 dict_PreProcessingArguments = dict_PreProcessingArguments )
+
+    print('   (+) DateLogic cache: ' + str(get_DateLogicCacheStatistics()))
+
+    for product, errorMessage in zip(list_products, list_errorMessages):
+        if errorMessage is not None and errorMessage < 0:
             print('[ERROR]. A problem was found in preProcessing.')
             print('         Product affected: ', product.product_type, ' ID: ', product.product_id)
             print('         This product will be skipped for all upcoming computations...')
 
+    # scalar attributes of the products --> typed columns per product type
+    obj_ProductBook = class_ProductBook(list_products = list_products)
+    print('   (+) ProductBook: ' + str(obj_ProductBook.get_Statistics()))
+
     # add timer
     dict_timer['preProcessing'] = timeit.default_timer()
 
@@ -279,12 +233,12 @@ def run_workflow(input):
             nTradingDaysRHP_max = product.nTradingDaysRHP
 
     # check if nTradingDaysMax is larger than #rows in RandomIndexFile
-    if nTradingDaysRHP_max > df_RandomIndices.shape[0]:
+    if dict_settings['readRandomIndices'] == True and nTradingDaysRHP_max > obj_RandomIndices.nDays:
         print('[WARNING]. The number of TradingDays is larger than the number of rows in RandomIndexFile.')
         print('           nTradingDaysRHP_max: ', nTradingDaysRHP_max)
-        print('           number of rows in RandomIndexFile: ', df_RandomIndices.shape[0])
+        print('           number of rows in RandomIndexFile: ', obj_RandomIndices.nDays)
 
-        if (nTradingDaysRHP_max - df_RandomIndices.shape[0] > 5):
+        if (nTradingDaysRHP_max - obj_RandomIndices.nDays > 5):
             print('    [ERROR]. The difference between is large  (>5).')
             print('             Aborting run!')
             sys.exit()
@@ -294,10 +248,23 @@ def run_workflow(input):
 
             # reset all nTradingDays within 5 trading days
             for product_id, product in enumerate(list_products):
-                if abs(product.nTradingDaysRHP - df_RandomIndices.shape[0]) < 5:
+                if abs(product.nTradingDaysRHP - obj_RandomIndices.nDays) < 5:
                     print('           Reset nTradingDaysRHP for product-id ', product_id, \
-                                      ' from ', product.nTradingDaysRHP, ' to ', df_RandomIndices.shape[0])
-                    list_products[product_id].nTradingDaysRHP = df_RandomIndices.shape[0]
+                                      ' from ', product.nTradingDaysRHP, ' to ', obj_RandomIndices.nDays)
+                    list_products[product_id].nTradingDaysRHP = obj_RandomIndices.nDays
+
+    ###############################################################################
+    #         Collect the observation days of all products per FX_rate            #
+    ###############################################################################
+    dict_FXpair_to_observationDays = dict()
+
+    for FX_rate, list_product_ids in dict_FXpair_to_FXproduct.items():
+        set_observationDays = set()
+
+        for product_id in list_product_ids:
+            set_observationDays.update(list_products[product_id].get_requiredObservationDays())
+
+        dict_FXpair_to_observationDays[FX_rate] = sorted(set_observationDays)
 
     # add timer
     dict_timer['BookKeeping'] = timeit.default_timer()
@@ -357,10 +324,15 @@ def run_workflow(input):
     dict_paths_FMU = dict()
     dict_paths_S   = dict()
 
+    list_simulationTasks = []
+
     for FX_rate in list_FX_rates_toSimulate:
         print('  (+) Simulating ' + FX_rate)
 
-        df_underlyer = pd.DataFrame()
+        # no product left for this underlyer (e.g. errors in preProcessing)
+        if len(dict_FXpair_to_observationDays[FX_rate]) == 0:
+            print('   No product requires this underlyer. Continue to next underlyer')
+            continue
 
         #-------------------------------------------------------------------------#
         #    Get relevant market data                                             #
@@ -379,105 +351,56 @@ def run_workflow(input):
         #.........................................................................#
         #         Log returns                                                     #
         #.........................................................................#
-        arr_logReturns = calculate_LogReturns_FX( df_HistoricalMarketData_Exchange = df_HistoricalMarketData_Exchange, \
-                                                  ccy_FOR                          = ccy_FOR                         , \
-                                                  ccy_DOM                          = ccy_DOM                         )
-        if arr_logReturns.size == 0:
+        if dict_settings['useLogReturnCache'] == True:
+            dict_logReturns = get_LogReturns_FX( df_HistoricalMarketData_Exchange = df_HistoricalMarketData_Exchange, \
+                                                 ccy_FOR                          = ccy_FOR                         , \
+                                                 ccy_DOM                          = ccy_DOM                         , \
+                                                 flag_persist                     = True                            )
+        else:
+            dict_logReturns = calculate_LogReturnStatistics_FX( df_HistoricalMarketData_Exchange = df_HistoricalMarketData_Exchange, \
+                                                                ccy_FOR                          = ccy_FOR                         , \
+                                                                ccy_DOM                          = ccy_DOM                         )
+        if dict_logReturns is None or dict_logReturns['stressed_vol'] is None:
             print('   Continue to next underlyer')
             continue
 
         #-------------------------------------------------------------------------#
-        #    PRIIPs sampling - Favourable/Moderate/Unfavourable                   #
-        #-------------------------------------------------------------------------#
-        print('       (*) Favourable, Moderate, Unfavourable')
-
-        if dict_settings['readRandomIndices'] == True:
-            nTradingDaysRHP_max = df_RandomIndices.shape[0]
-
-        # set random seed
-        random.seed(dict_settings['randomSeed'])
-
-        # calculate Ito term
-        arr_ItoTerm = calculate_ItoTerm( arr_logReturns = arr_logReturns,
-                                         n              = nTradingDaysRHP_max     )
-
-        # calculate paths
-        for i_resample in range(dict_settings['nPRIIPsSimulations']):
-            if dict_settings['readRandomIndices'] == True:
-                arr_idxSelected = read_RandomIndices( df_RandomIndices  = df_RandomIndices         ,
-                                                      n_indices         = df_RandomIndices.shape[0],
-                                                      rowSelection      = i_resample               ,
-                                                      n_logReturns      = arr_logReturns.size      )
-            else:
-                arr_idxSelected = select_RandomIndices( n_indices = nTradingDaysRHP_max,
-                                                        n_LogReturns = arr_logReturns.size)
-
-            if arr_idxSelected.size == 0:
-                print('   Continue to next underlyer')
-                continue
-
-            arr_underlying = calculate_PRIIPsPath_FMU( arr_randomIndices = arr_idxSelected ,
-                                                       arr_logReturns    = arr_logReturns  ,
-                                                       arr_ItoTerm       = arr_ItoTerm     ,
-                                                       spot_rate         = spot_rate       )
-
-            df_underlyer[i_resample] = arr_underlying
-        dict_paths_FMU[FX_rate] = df_underlyer
-
-        #-------------------------------------------------------------------------#
-        #    PRIIPs sampling - Stressed                                           #
+        #    Random indices, FMU and Stressed paths: see lib/Simulation.py        #
         #-------------------------------------------------------------------------#
-        print('       (*) Stressed')
-
-        df_underlyer = pd.DataFrame()
-
-        if dict_settings['readRandomIndices'] == True:
-            nTradingDaysRHP_max = df_RandomIndices.shape[0]
-
-        # set random seed
-        random.seed(dict_settings['randomSeed'])
-
-        #TODO only <= 1Y products in scope, if onboarding of more products: UPDATE!
-        stressed_vol = calculate_stressed_vol( arr_returns   = arr_logReturns, \
-                                               window_length = 21              )
-
-        # calculate rescaled returns
-        arr_logReturnsRescaled = arr_logReturns * (stressed_vol / np.std(arr_logReturns))
-
-        # calculate shift
-        arr_shiftTerm = calculate_ShiftTerm( arr_logReturnsRescaled = arr_logReturnsRescaled,
-                                             stressed_vol           = stressed_vol,
-                                             n                      = nTradingDaysRHP_max)
+        list_simulationTasks.append({ 'FX_rate'              : FX_rate                                 ,
+                                      'spot_rate'            : spot_rate                               ,
+                                      'arr_logReturns'       : dict_logReturns['arr_logReturns']       ,
+                                      'std'                  : dict_logReturns['std']                  ,
+                                      'stressed_vol'         : dict_logReturns['stressed_vol']         ,
+                                      'mean_rescaled'        : dict_logReturns['mean_rescaled']        ,
+                                      'nTradingDaysRHP_max'  : nTradingDaysRHP_max                     ,
+                                      'list_observationDays' : dict_FXpair_to_observationDays[FX_rate] })
 
-        # calculate stressed paths
-        for i_resample in range(dict_settings['nPRIIPsSimulations']):
-            if dict_settings['readRandomIndices'] == True:
-                arr_idxSelected = read_RandomIndices( df_RandomIndices  = df_RandomIndices            ,
-                                                      n_indices         = df_RandomIndices.shape[0]   ,
-                                                      rowSelection      = i_resample                  ,
-                                                      n_logReturns      = arr_logReturnsRescaled.size )
-            else:
-                arr_idxSelected = select_RandomIndices( n_indices    = nTradingDaysRHP_max,
-                                                        n_LogReturns = arr_logReturnsRescaled.size)
-
-            if arr_idxSelected.size == 0:
-                print('   Continue to next underlyer')
-                continue
+    #-----------------------------------------------------------------------------#
+    #    Simulate all FX pairs (process pool if nSimulationWorkers > 1)           #
+    #-----------------------------------------------------------------------------#
+    list_simulationResults = simulate_PRIIPsPaths( list_tasks        = list_simulationTasks ,
+                                                   obj_RandomIndices = obj_RandomIndices    ,
+                                                   dict_settings     = dict_settings        )
 
-            arr_underlying = calculate_PRIIPsPath_Stressed( arr_randomIndices      = arr_idxSelected         ,
-                                                            arr_logReturnsRescaled = arr_logReturnsRescaled  ,
-                                                            arr_shiftTerm          = arr_shiftTerm           ,
-                                                            spot_rate              = spot_rate               )
+    for tuple_result in list_simulationResults:
+        if tuple_result is None:
+            continue
 
-            df_underlyer[i_resample] = arr_underlying
+        FX_rate, arr_rowIndex, arr_paths_FMU, arr_paths_S = tuple_result
 
-        # [DEBUG] print('Memory: ' , df_underlyer.memory_usage().sum()/1e6 , ' MB')
-        dict_paths_S[FX_rate] = df_underlyer
+        # row label = trading day - 1 (paths may only contain the observation days)
+        dict_paths_FMU[FX_rate] = pd.DataFrame(arr_paths_FMU, index=arr_rowIndex)
+        dict_paths_S[FX_rate]   = pd.DataFrame(arr_paths_S  , index=arr_rowIndex)
 
     ###############################################################################
     #    write PRIIPs paths into file                                             #
     ###############################################################################
-    if len(list_FX_rates_toSimulate) != 0:
+    if dict_settings['PRIIPsPathMode'] == 'observationDays':
+        print('')
+        print('[NOT WRITING PATHS INTO FILE]. Only observation days were simulated (PRIIPsPathMode)')
+
+    elif len(list_FX_rates_toSimulate) != 0:
         script_dir = os.path.dirname(__file__)
         print('')
         print('[WRITING PATHS INTO FILE]')
@@ -515,11 +438,23 @@ def run_workflow(input):
     print('')
     print('[CALCULATING GROSS AMOUNTS]')
 
+    # payoffs of all products of one type on one underlyer in one batched pass
+    set_productsEvaluated = update_Payoffs_ProductBook( obj_ProductBook = obj_ProductBook ,
+                                                        dict_paths_FMU  = dict_paths_FMU  ,
+                                                        dict_paths_S    = dict_paths_S    )
+    print('   (+) Batched payoffs: ' + str(len(set_productsEvaluated)) + ' products')
+
     for product_id, product in enumerate(list_products):
         # skip products for which an error was raised
         if product.flag_error_encountered == True:
             continue
 
+        # payoffs already set by the batched pass
+        if product in set_productsEvaluated:
+            product.calculate_GrossAmount_FMU()
+            product.calculate_GrossAmount_S()
+            continue
+
         list_requiredUnderlyers = product.get_requiredUnderlyers()
 
         dict_pathsFMU_forProduct = dict()
@@ -0,0 +1,69 @@
+###############################################################################
+#        PRE-PROCESSING OF THE WHOLE PRODUCT BOOK                             #
+###############################################################################
+def preProcess_ProductBook( list_products               ,
+                            dict_PreProcessingArguments ):
+    """
+    Run the preProcessing of all products.
+
+    Products with the same get_PreProcessingKey (product type, tradeDate,
+    currencies, RHP, ...) share dates, year fractions, trading days, spot,
+    yields, volatilities and strike. preProcessing_Market only runs for the
+    first product of each group; the others copy its list_MarketAttributes.
+    preProcessing_Product (amounts, position) runs for every product.
+
+      dict_PreProcessingArguments ... product_type --> keyword arguments of
+                                      preProcessing_Market
+
+    Return value: list with the errorMessage of every product
+                  (0 ... ok, < 0 ... error, None ... product type not known)
+    """
+    # key --> (first product of the group, its errorMessage)
+    dict_groups = dict()
+
+    list_errorMessages = []
+
+    for product in list_products:
+
+        if product.product_type not in dict_PreProcessingArguments:
+            print('[ERROR]. Product type ' + product.product_type + ' not known...')
+            print('         Skipping')
+
+            product.set_ErrorMessage()
+
+            list_errorMessages.append(None)
+            continue
+
+        key = product.get_PreProcessingKey()
+
+        #-------------------------------------------------------------------------#
+        #         first product of the group: market data part                    #
+        #-------------------------------------------------------------------------#
+        if key not in dict_groups:
+            errorMessage = product.preProcessing_Market(**dict_PreProcessingArguments[product.product_type])
+
+            dict_groups[key] = (product, errorMessage)
+
+        #-------------------------------------------------------------------------#
+        #         other products of the group: copy the market data part          #
+        #-------------------------------------------------------------------------#
+        else:
+            product_first, errorMessage = dict_groups[key]
+
+            if errorMessage < 0:
+                product.set_ErrorMessage()
+            else:
+                for attribute in product.list_MarketAttributes:
+                    setattr(product, attribute, getattr(product_first, attribute))
+
+        #-------------------------------------------------------------------------#
+        #         per product part                                                #
+        #-------------------------------------------------------------------------#
+        if errorMessage == 0:
+            errorMessage = product.preProcessing_Product()
+
+        list_errorMessages.append(errorMessage)
+
+    print('   (+) ' + str(len(list_products)) + ' products in ' + str(len(dict_groups)) + ' preProcessing groups')
+
+    return list_errorMessages
@@ -1,6 +1,5 @@
 import numpy as np
 import pandas as pd
-import random
 
 from .PreProcessing import get_HistoricalData_FX
 
@@ -33,66 +32,104 @@ def calculate_LogReturns_FX( df_HistoricalMarketData_Exchange,
     return df_historical_sorted['log_return'].values
 
 ###############################################################################
-#                  READ RANDOM INDICES                                        #
+#                  RANDOM INDEX MATRIX (READ FROM FILE)                       #
 ###############################################################################
-def read_RandomIndices( df_RandomIndices,
-                        n_indices       ,
-                        rowSelection    ,
-                        n_logReturns    ):
+class class_RandomIndices:
     """
-    get RandomIndices from DataFrame that was created based on csv file.
-    There's two choices for the RandomIndex file:
-        [1] Read Integers (Return Picks)
-        [2] Read Uniform distribution in [0,1] that needs to be converted to [1]
+    Holds the content of the RandomIndex file as (nSims x nDays) matrix,
+    one row per simulation.
 
-    This function converts [2] to [1] if necessary, namely if index is 0 < idx < 1
+    There's two choices for the RandomIndex file:
+        [1] Integers (Return Picks), starting at 1
+        [2] Uniform distribution in [0,1) that needs to be converted to [1]
 
-    The index_array that is returned is in range [0 , n_logReturns-1]
+    The conversion to indices in range [0 , n_logReturns-1] is done once per
+    n_logReturns for the whole matrix, and the result is kept for reuse.
     """
+    def __init__(self, arr_RandomValues, flag_uniform):
+
+        self.arr_RandomValues = arr_RandomValues
+        self.flag_uniform     = flag_uniform
+
+        self.nSims, self.nDays = arr_RandomValues.shape
+
+        # n_logReturns --> int32 index matrix
+        self.dict_IndexMatrix = dict()
+
+    ###########################################################################
+    #              GET INDEX MATRIX FOR n_logReturns                          #
+    ###########################################################################
+    def get_IndexMatrix(self, n_logReturns, n_simulations):
+        """
+        Return value: int32 matrix (n_simulations x nDays) with indices in
+                      range [0 , n_logReturns-1], None if the file does not
+                      provide enough simulations
+        """
+        if n_simulations > self.nSims:
+            print('[ERROR]. Not enough RandomIndices provided to run all simulations')
+            print('         nSimulations(RandomIndexFile) = ' + str(self.nSims))
+            print('         nPRIIPsSimulations            = ' + str(n_simulations))
+            print('         Skipping FX_rate')
+            return None
+
+        if n_logReturns not in self.dict_IndexMatrix:
+            #----------------#
+            # float values   #
+            #----------------#
+            if self.flag_uniform == True:
+                arr_indices = np.floor(self.arr_RandomValues*n_logReturns).astype(np.int32)
+
+            #----------------#
+            # integer values #
+            #----------------#
+            else:
+                arr_indices = self.arr_RandomValues.astype(np.int32) - 1
+
+            # every value that is larger than max_value will be replaced, so that range = [0 , n_logReturns-1]
+            np.minimum(arr_indices, n_logReturns-1, out=arr_indices)
+
+            self.dict_IndexMatrix[n_logReturns] = arr_indices
+
+        return self.dict_IndexMatrix[n_logReturns][:n_simulations]
 
-    if n_indices > df_RandomIndices.shape[0]:
-        print('[ERROR]. Not enough RandomIndices provided to select n_indices')
-        print('         nRows(df_RandomIndices) = ' + str(df_RandomIndices.shape[0]))
-        print('         n_indices               = ' + str(n_indices))
-        print('         Skipping FX_rate')
-
-        return(np.array([]))
-
-    first_RandomValue = df_RandomIndices[rowSelection].values[0]
-    last_RandomValue  = df_RandomIndices[rowSelection].values[-1]
-
-    #----------------#
-    # float values   #
-    #----------------#
-    if first_RandomValue > 0.0 and first_RandomValue < 1.0 and \
-       last_RandomValue  > 0.0 and last_RandomValue  < 1.0:
-        idx_selected = df_RandomIndices[rowSelection].values
-        idx_selected = (np.floor(idx_selected*n_logReturns)).astype(int)
+###############################################################################
+#                  COMPUTE RANDOM INDICES                                     #
+###############################################################################
+def select_RandomIndices( n_indices    ,
+                          n_LogReturns ,
+                          n_simulations,
+                          randomSeed   ,
+                          FX_rate      ,
+                          scenario     ):
+    """
+    Draw the RandomIndices for all simulations of one FX_rate and scenario in
+    one call.
 
-    #----------------#
-    # integer values #
-    #----------------#
-    else:
-        idx_selected = df_RandomIndices[rowSelection].values-1
+    The generator (counter-based Philox) is keyed by (randomSeed, FX_rate,
+    scenario), so the indices do not depend on the order in which the FX
+    pairs are simulated.
 
-    # every value that is larger than max_value will be replaced, so that range = [0 , n_logReturns-1]
-    idx_selected[idx_selected >= n_logReturns] = n_logReturns-1
+    The index_array that is returned is (n_simulations x n_indices) and in
+    range [0 , n_LogReturns-1]
+    """
+    obj_seed = np.random.SeedSequence([ randomSeed                                ,
+                                        int.from_bytes(FX_rate.encode() , 'big')  ,
+                                        int.from_bytes(scenario.encode(), 'big')  ])
 
-    return idx_selected
+    obj_generator = np.random.Generator(np.random.Philox(obj_seed))
 
-###############################################################################
-#                  COMPUTE RANDOM INDICES                                     #
-###############################################################################
-def select_RandomIndices( n_indices,
-                          n_LogReturns):
-    idx_selected = [ random.randint(0, n_LogReturns-1) for x in range(0, n_indices) ]
+    idx_selected = obj_generator.integers( 0, n_LogReturns                , \
+                                           size  = (n_simulations, n_indices) , \
+                                           dtype = np.int32                   )
     return idx_selected
 
 ###############################################################################
 #                  COMPUTE Ito TERM                                           #
 ###############################################################################
-def calculate_ItoTerm( arr_logReturns, n):
-    std          = np.std(arr_logReturns) # computes population std by default
+def calculate_ItoTerm( arr_logReturns, n, std = None):
+    # std can be passed if it is known already (see LogReturnCache.py)
+    if std is None:
+        std      = np.std(arr_logReturns) # computes population std by default
     arr_ito_term = -0.5 * std**2 * np.arange(1, n+1)
 
     return arr_ito_term
@@ -102,55 +139,126 @@ def calculate_ItoTerm( arr_logReturns, n):
 ###############################################################################
 def calculate_ShiftTerm( arr_logReturnsRescaled,
                          stressed_vol          ,
-                         n                     ):
+                         n                     ,
+                         mean_rescaled = None  ):
 
-    mean_rescaled = np.mean(arr_logReturnsRescaled)
+    # mean_rescaled can be passed if it is known already (see LogReturnCache.py)
+    if mean_rescaled is None:
+        mean_rescaled = np.mean(arr_logReturnsRescaled)
     arr_shift = (-0.5 * stressed_vol**2 * np.arange(1, n+1)) - \
                 (mean_rescaled*np.arange(1, n+1))
 
     return arr_shift
 
 ###############################################################################
-#                  COMPUTE 1 PRIIPS PATH (Fav, Mod, Unfav)                    #
+#                  COMPUTE ALL PRIIPS PATHS AT ONCE                           #
 ###############################################################################
-def calculate_PRIIPsPath_FMU( arr_randomIndices,
-                              arr_logReturns   ,
-                              arr_ItoTerm      ,
-                              spot_rate        ):
+def calculate_PRIIPsPaths_Matrix( arr_randomIndices,
+                                  arr_logReturns   ,
+                                  arr_driftTerm    ,
+                                  spot_rate        ):
+    """
+    Compute all PRIIPs paths of one underlyer in one go.
 
+    arr_randomIndices is the full index matrix with shape (nSims x nDays),
+    one row per simulation. arr_driftTerm is the Ito term (Fav, Mod, Unfav)
+    or the shift term (Stressed), both of length nDays.
 
+    The returns are gathered into one preallocated float array and summed up
+    along the time axis, so that no per-simulation Python loop is needed.
 
-    arr_returns        = arr_logReturns[arr_randomIndices]
-    arr_returns_cumsum = np.cumsum(arr_returns)
-    arr_underlying     = spot_rate*np.exp(arr_returns_cumsum + arr_ItoTerm)
+    Return value: array with shape (nDays x nSims), one column per simulation
+                  (same layout as the path DataFrames / path files)
+    """
+    nSims, nDays = arr_randomIndices.shape
+
+    arr_paths = np.empty((nDays, nSims), dtype=np.float64)
+
+    # gather: arr_paths[day, sim] = arr_logReturns[arr_randomIndices[sim, day]]
+    np.take(arr_logReturns, arr_randomIndices.T, out=arr_paths)
 
-    return arr_underlying
+    np.cumsum(arr_paths, axis=0, out=arr_paths)
+    arr_paths += arr_driftTerm[:nDays, np.newaxis]
+    np.exp(arr_paths, out=arr_paths)
+    arr_paths *= spot_rate
 
+    return arr_paths
 
 ###############################################################################
-#                  COMPUTE 1 PRIIPS PATH (Stressed)                           #
+#                  COMPUTE PRIIPS PATHS ON OBSERVATION DAYS ONLY              #
 ###############################################################################
-def calculate_PRIIPsPath_Stressed( arr_randomIndices     ,
-                                   arr_logReturnsRescaled,
-                                   arr_shiftTerm         ,
-                                   spot_rate             ):
+def calculate_PRIIPsPaths_ObservationDays( arr_randomIndices    ,
+                                           arr_logReturns       ,
+                                           arr_driftTerm        ,
+                                           spot_rate            ,
+                                           list_observationDays ,
+                                           n_chunkDays = 21     ):
+    """
+    Same as calculate_PRIIPsPaths_Matrix, but the underlying is only computed
+    on the observation days that are read by the payoffs.
+
+    list_observationDays holds trading days counted from 1 (nTradingDaysRHP,
+    nTradingDaysIntermediate, ...). The cumulative sum is carried forward in
+    chunks of n_chunkDays, so that only (nSims x n_chunkDays) returns are
+    gathered at any point in time.
 
-        arr_returns        = arr_logReturnsRescaled[arr_randomIndices]
-        arr_returns_cumsum = np.cumsum(arr_returns)
-        arr_underlying     = spot_rate*np.exp(arr_returns_cumsum + arr_shiftTerm)
+    Return value: two values:
+      1 ... sorted array of the observation days
+      2 ... array with shape (nObsDays x nSims), one column per simulation
+    """
+    arr_observationDays = np.unique(np.asarray(list_observationDays, dtype=int))
+
+    nSims = arr_randomIndices.shape[0]
+
+    arr_paths  = np.empty((arr_observationDays.size, nSims), dtype=np.float64)
+    arr_cumsum = np.zeros(nSims, dtype=np.float64)
+
+    idx_day = 0
+    for i_obs, observationDay in enumerate(arr_observationDays):
+        while idx_day < observationDay:
+            idx_chunkEnd = min(idx_day + n_chunkDays, observationDay)
+            arr_cumsum  += arr_logReturns[arr_randomIndices[:, idx_day:idx_chunkEnd]].sum(axis=1)
+            idx_day      = idx_chunkEnd
+
+        arr_paths[i_obs] = arr_cumsum + arr_driftTerm[observationDay-1]
 
-        return arr_underlying
+    np.exp(arr_paths, out=arr_paths)
+    arr_paths *= spot_rate
+
+    return arr_observationDays, arr_paths
 
 ###############################################################################
 #                  COMPUTE THE STRESSED VOLATILITY                            #
 ###############################################################################
 def calculate_stressed_vol(arr_returns, window_length):
-    arr_rolling_returns = (rolling_window(arr_returns, window_length+1))
+    """
+    Compute the stressed volatility from the rolling volatility of the returns
+    (each window holds window_length+1 returns, population std).
+
+    The rolling std is computed in O(n) from cumulative sums of x and x**2.
+    The returns are demeaned first, which leaves the std unchanged but avoids
+    cancellation in E[x**2] - E[x]**2.
+    """
+    n_window = window_length + 1
+
+    if arr_returns.size < n_window:
+        print('[ERROR]. Not enough returns to compute the stressed volatility')
+        print('         number of returns = ' + str(arr_returns.size))
+        print('         window length     = ' + str(n_window))
+        return None
 
-    arr_rolling_vol = np.array([])
+    arr_x = np.asarray(arr_returns, dtype=np.float64)
+    arr_x = arr_x - np.mean(arr_x)
 
-    for arr_ret_window in arr_rolling_returns:
-        arr_rolling_vol = np.append(arr_rolling_vol, np.std(arr_ret_window))
+    arr_cumsum_x  = np.concatenate(([0.0], np.cumsum(arr_x)))
+    arr_cumsum_x2 = np.concatenate(([0.0], np.cumsum(arr_x*arr_x)))
+
+    arr_rolling_mean = (arr_cumsum_x [n_window:] - arr_cumsum_x [:-n_window]) / n_window
+    arr_rolling_var  = (arr_cumsum_x2[n_window:] - arr_cumsum_x2[:-n_window]) / n_window - \
+                       arr_rolling_mean**2
+
+    # rounding can produce tiny negative variances for (almost) constant windows
+    arr_rolling_vol = np.sqrt(np.maximum(arr_rolling_var, 0.0))
 
     stressed_vol = None
 
@@ -166,25 +274,3 @@ def calculate_stressed_vol(arr_returns, window_length):
         stressed_vol = np.percentile(arr_rolling_vol, 99)
 
     return stressed_vol
-
-
-###############################################################################
-#                  COMPUTE A ROLLING WINDOW OF ARRAY                          #
-###############################################################################
-def rolling_window(arr, window):
-    idx_windowStart = 0
-    idx_windowEnd   = window
-
-    arr_window = np.array([])
-    list_window = []
-
-    while True:
-        if len(arr) < (idx_windowStart+idx_windowEnd):
-            break
-        else:
-            new_window = arr[idx_windowStart : (idx_windowStart+idx_windowEnd)]
-            list_window.append(new_window)
-
-            idx_windowStart += 1
-
-    return np.array(list_window)
@@ -0,0 +1,138 @@
+import threading
+import timeit
+import functools
+from collections import OrderedDict
+
+###############################################################################
+#        LRU CACHE WITH TIME TO LIVE                                          #
+###############################################################################
+class class_LRUCache:
+    """
+    Thread-safe least-recently-used cache.
+
+      maxsize ... maximum number of entries, the least recently used entry
+                  is dropped first (None ... unbounded)
+      ttl     ... seconds an entry stays valid after it was stored
+                  (None ... never expires)
+
+    nHits / nMisses count the lookups, see get_Statistics.
+    """
+    def __init__(self, maxsize = 128, ttl = None):
+
+        self.maxsize      = maxsize
+        self.ttl          = ttl
+
+        # key --> (value, time stored)
+        self.dict_entries = OrderedDict()
+        self.lock         = threading.RLock()
+
+        self.nHits        = 0
+        self.nMisses      = 0
+
+    ###########################################################################
+    #              LOOKUP                                                     #
+    ###########################################################################
+    def is_expired(self, time_stored):
+        return self.ttl is not None and timeit.default_timer() - time_stored > self.ttl
+
+    def get(self, key, default = None):
+        with self.lock:
+            if key in self.dict_entries:
+                value, time_stored = self.dict_entries[key]
+
+                if not self.is_expired(time_stored):
+                    self.dict_entries.move_to_end(key)
+                    self.nHits += 1
+                    return value
+
+                del self.dict_entries[key]
+
+            self.nMisses += 1
+            return default
+
+    def put(self, key, value):
+        with self.lock:
+            self.dict_entries[key] = (value, timeit.default_timer())
+            self.dict_entries.move_to_end(key)
+
+            if self.maxsize is not None:
+                while len(self.dict_entries) > self.maxsize:
+                    self.dict_entries.popitem(last = False)
+
+    def get_or_compute(self, key, function):
+        """
+        Return the cached value of key, or compute it with function(), store
+        and return it. Values that are None are not stored (errors).
+        """
+        sentinel = object()
+
+        value = self.get(key, sentinel)
+        if value is not sentinel:
+            return value
+
+        value = function()
+        if value is not None:
+            self.put(key, value)
+
+        return value
+
+    ###########################################################################
+    #              INVALIDATION / STATISTICS                                  #
+    ###########################################################################
+    def invalidate(self, key):
+        with self.lock:
+            self.dict_entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.dict_entries.clear()
+
+    def __len__(self):
+        return len(self.dict_entries)
+
+    def get_Statistics(self):
+        with self.lock:
+            return { "hits"    : self.nHits             ,
+                     "misses"  : self.nMisses           ,
+                     "size"    : len(self.dict_entries) ,
+                     "maxsize" : self.maxsize           ,
+                     "ttl"     : self.ttl               }
+
+###############################################################################
+#        MEMOIZATION DECORATOR                                                #
+###############################################################################
+def get_HashableKey(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(get_HashableKey(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, get_HashableKey(item)) for key, item in value.items()))
+    return value
+
+def memoize_LRU(maxsize = 1024, ttl = None):
+    """
+    Decorator: keep the results of the function in a class_LRUCache keyed
+    by its arguments (lists are turned into tuples). Lists that are
+    returned are copied, so callers cannot change the cached value.
+
+    The decorated function gets the attributes
+      cache             ... the class_LRUCache (get_Statistics, clear)
+      function_uncached ... the original function
+    """
+    def decorator(function):
+        obj_cache = class_LRUCache(maxsize = maxsize, ttl = ttl)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            key = (get_HashableKey(args), get_HashableKey(kwargs))
+
+            value = obj_cache.get_or_compute( key      = key                                 ,
+                                              function = lambda: function(*args, **kwargs) )
+            if isinstance(value, list):
+                return list(value)
+            return value
+
+        wrapper.cache             = obj_cache
+        wrapper.function_uncached = function
+        return wrapper
+
+    return decorator
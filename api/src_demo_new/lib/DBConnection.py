@@ -0,0 +1,209 @@
+import os
+import queue
+import threading
+import contextlib
+import timeit
+
+import pyodbc
+
+###############################################################################
+#        DEFAULT CONNECTION SETTINGS                                          #
+###############################################################################
+# used if neither the SettingsFile nor the environment provide a value
+default_ConnectionString = 'DRIVER={ODBC Driver 13 for SQL Server};SERVER=127.0.0.1,1433;DATABASE=rh01;UID=sa;PWD=Darqube17;TDS_Version=8.0;'
+default_PoolSize         = 4
+
+# seconds a connection may be idle before it is validated again
+default_ValidateAfter    = 30.0
+
+###############################################################################
+#        CONNECTION POOL                                                      #
+###############################################################################
+class class_ConnectionPool:
+    """
+    Pool of pyodbc connections to the MarketData database.
+
+    At most pool_size connections are opened, idle connections are kept and
+    handed out again (last in, first out). A connection that was idle for
+    more than validateAfter seconds is checked with 'select 1' before it is
+    handed out, and replaced if the check fails.
+
+    Usage:
+        with obj_ConnectionPool.connection() as cnxn:
+            df = pd.read_sql(sql_query, cnxn)
+    """
+    def __init__(self, connection_string, pool_size, validateAfter = default_ValidateAfter):
+
+        self.connection_string = connection_string
+        self.pool_size         = pool_size
+        self.validateAfter     = validateAfter
+
+        # (connection, time it was released)
+        self.queue_idle        = queue.LifoQueue()
+        self.nConnections      = 0
+        self.lock              = threading.Lock()
+
+    ###########################################################################
+    #              OPEN / VALIDATE A CONNECTION                               #
+    ###########################################################################
+    def open_connection(self):
+        return pyodbc.connect(self.connection_string)
+
+    def is_valid(self, cnxn):
+        try:
+            cursor = cnxn.cursor()
+            cursor.execute('select 1')
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except pyodbc.Error:
+            return False
+
+    def close_connection(self, cnxn):
+        try:
+            cnxn.close()
+        except pyodbc.Error:
+            pass
+
+    ###########################################################################
+    #              ACQUIRE / RELEASE                                          #
+    ###########################################################################
+    def acquire(self, timeout = 30.0):
+        """
+        Return value: open pyodbc connection. Waits up to timeout seconds if
+                      all pool_size connections are in use.
+        """
+        flag_open = False
+
+        try:
+            cnxn, time_released = self.queue_idle.get_nowait()
+        except queue.Empty:
+            with self.lock:
+                if self.nConnections < self.pool_size:
+                    self.nConnections += 1
+                    flag_open = True
+
+            if flag_open == False:
+                try:
+                    cnxn, time_released = self.queue_idle.get(timeout = timeout)
+                except queue.Empty:
+                    raise RuntimeError('[ERROR - ConnectionPool]. No database connection available after ' + \
+                                       str(timeout) + ' seconds (pool size ' + str(self.pool_size) + ')')
+
+        if flag_open == True:
+            try:
+                return self.open_connection()
+            except:
+                with self.lock:
+                    self.nConnections -= 1
+                raise
+
+        # idle for a while: make sure the server did not drop it
+        if timeit.default_timer() - time_released > self.validateAfter and not self.is_valid(cnxn):
+            print('[WARNING - ConnectionPool]. Replacing a broken database connection')
+            self.close_connection(cnxn)
+            try:
+                cnxn = self.open_connection()
+            except:
+                with self.lock:
+                    self.nConnections -= 1
+                raise
+
+        return cnxn
+
+    def release(self, cnxn, flag_discard = False):
+        """
+        Hand the connection back to the pool, or close it if flag_discard
+        (e.g. the connection raised a database error).
+        """
+        if flag_discard == True:
+            self.close_connection(cnxn)
+            with self.lock:
+                self.nConnections -= 1
+        else:
+            self.queue_idle.put((cnxn, timeit.default_timer()))
+
+    @contextlib.contextmanager
+    def connection(self, timeout = 30.0):
+        """
+        Hand out a connection for the with block. If the block raises, the
+        connection is closed instead of being handed back: its state is
+        unknown (pd.read_sql wraps driver errors in pandas' DatabaseError,
+        so pyodbc.Error alone does not catch them).
+        """
+        cnxn = self.acquire(timeout = timeout)
+        try:
+            yield cnxn
+        except:
+            self.release(cnxn, flag_discard = True)
+            raise
+        else:
+            self.release(cnxn)
+
+    def close_all(self):
+        while True:
+            try:
+                cnxn, time_released = self.queue_idle.get_nowait()
+            except queue.Empty:
+                break
+
+            self.close_connection(cnxn)
+            with self.lock:
+                self.nConnections -= 1
+
+###############################################################################
+#        PROCESS-WIDE POOL                                                    #
+###############################################################################
+obj_ConnectionPool      = None
+lock_ConnectionPool     = threading.Lock()
+
+def configure_ConnectionPool(connection_string = None, pool_size = None):
+    """
+    (Re-)create the process-wide pool. Values that are None are taken from
+    the environment:
+        RH_DB_CONNECTION_STRING ... full ODBC connection string
+        DB_NAME, SA_PASSWORD    ... database and password of the default string
+        RH_DB_POOL_SIZE         ... number of connections
+    and otherwise from the defaults of this module.
+    """
+    global obj_ConnectionPool
+
+    if connection_string is None:
+        connection_string = os.environ.get('RH_DB_CONNECTION_STRING')
+
+    if connection_string is None:
+        connection_string = default_ConnectionString
+
+        db_name = os.environ.get('DB_NAME')
+        pwd     = os.environ.get('SA_PASSWORD')
+        if db_name is not None:
+            connection_string = connection_string.replace('DATABASE=rh01;', 'DATABASE=' + db_name + ';')
+        if pwd is not None:
+            connection_string = connection_string.replace('PWD=Darqube17;', 'PWD=' + pwd + ';')
+
+    if pool_size is None:
+        pool_size = int(os.environ.get('RH_DB_POOL_SIZE', default_PoolSize))
+
+    with lock_ConnectionPool:
+        # same configuration: keep the open connections
+        if obj_ConnectionPool is not None and \
+           obj_ConnectionPool.connection_string == connection_string and \
+           obj_ConnectionPool.pool_size         == pool_size:
+            return obj_ConnectionPool
+
+        if obj_ConnectionPool is not None:
+            obj_ConnectionPool.close_all()
+
+        obj_ConnectionPool = class_ConnectionPool( connection_string = connection_string ,
+                                                   pool_size         = pool_size         )
+    return obj_ConnectionPool
+
+def get_ConnectionPool():
+    """
+    Return value: the process-wide pool (created from the environment on
+                  first use if configure_ConnectionPool was not called)
+    """
+    if obj_ConnectionPool is None:
+        return configure_ConnectionPool()
+
+    return obj_ConnectionPool
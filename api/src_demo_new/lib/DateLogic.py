@@ -2,6 +2,10 @@ from datetime import datetime,timedelta, date
 from dateutil.relativedelta import relativedelta
 import re
 import holidays
+import numpy as np
+
+from .Cache import class_LRUCache , \
+                   memoize_LRU
 
 # Define the weekday mnemonics to match the date.weekday function
 (MON, TUE, WED, THU, FRI, SAT, SUN) = range(7)
@@ -44,6 +48,10 @@ map_holidays={
 
 default_holidays='England'
 
+# size of the memoization of getHolidaysBetween, getYearFraction,
+# networkdays and addTenor (results per distinct arguments)
+dateLogic_cacheSize = 4096
+
 ##############################################################################
 #        PRINT HOLIDAYS IN TIME PERIOD                                       #
 ##############################################################################
@@ -63,29 +71,85 @@ def getHolidays(country, years=[]):
     
     return result       
 
+##############################################################################
+#        BUSINESS DAY CALENDAR                                               #
+##############################################################################
+class class_BusinessDayCalendar:
+    """
+    Holidays and business days of one country for a range of years.
+    Build it with get_BusinessDayCalendar (memoized), not directly.
+
+      set_holidays      ... holidays (datetime.date), O(1) membership
+      arr_holidays      ... holidays, sorted (datetime64[D])
+      arr_businessDays  ... weekdays that are not holidays, sorted (datetime64[D])
+      obj_busdaycalendar ... numpy calendar for np.busday_count / np.busday_offset
+    """
+    def __init__(self, country, years):
+
+        self.country = country
+        self.years   = tuple(years)
+
+        self.set_holidays = set( holiday_date for holiday_date,name in getHolidays(country, list(self.years)) )
+
+        self.arr_holidays = np.array(sorted(self.set_holidays), dtype='datetime64[D]')
+
+        # all days of the years, weekends and holidays removed
+        arr_days = np.arange( np.datetime64(str(min(self.years))     + '-01-01'),
+                              np.datetime64(str(max(self.years) + 1) + '-01-01'),
+                              dtype='datetime64[D]' )
+        arr_isWeekday = np.is_busday(arr_days, weekmask='1111100')
+
+        self.arr_businessDays   = arr_days[arr_isWeekday & ~np.isin(arr_days, self.arr_holidays)]
+        self.obj_busdaycalendar = np.busdaycalendar(weekmask='1111100', holidays=self.arr_holidays)
+
+    def is_holiday(self, cdate):
+        if isinstance(cdate, datetime):
+            cdate = cdate.date()
+        return cdate in self.set_holidays
+
+    def is_businessDay(self, cdate):
+        return cdate.weekday() not in default_weekends and not self.is_holiday(cdate)
+
+    def get_HolidaysBetween(self, start_date, end_date):
+        """
+        Return value: sorted holidays with start_date <= date <= end_date
+                      (datetime64[D])
+        """
+        i_start = np.searchsorted(self.arr_holidays, np.datetime64(start_date, 'D'), side='left')
+        i_end   = np.searchsorted(self.arr_holidays, np.datetime64(end_date  , 'D'), side='right')
+        return self.arr_holidays[i_start:i_end]
+
+# (country, years) --> class_BusinessDayCalendar
+cache_BusinessDayCalendars = class_LRUCache(maxsize = 64)
+
+def get_BusinessDayCalendar(country, years):
+    """
+    Return value: class_BusinessDayCalendar of country for the years,
+                  built once per (country, years)
+    """
+    years = tuple(sorted(set(years)))
+
+    return cache_BusinessDayCalendars.get_or_compute( key      = (country, years)                                 ,
+                                                      function = lambda: class_BusinessDayCalendar(country, years) )
+
 ##############################################################################
 #        GET LIST OF HOLIDAYS IN TIME PERIOD                                 #
 ##############################################################################
+@memoize_LRU(maxsize = dateLogic_cacheSize)
 def getHolidaysBetween(start_date, end_date, COUNTRY_HOLIDAYS):
     start_date = datetime.strptime(start_date, '%d/%m/%Y')
     end_date   = datetime.strptime(end_date  , '%d/%m/%Y')
-    delta      = end_date - start_date
-    
-    # this will give you a list containing all of the dates
-    LIST_DATES=[]
-    years=[]
-    
-    for i in range(delta.days + 1):
-        d=start_date + timedelta(i)
-        years.append(d.year)
-        LIST_DATES.append(d.strftime('%Y-%m-%d'))
-    
+
+    # empty period: no holidays (and no years to build a calendar for)
+    if end_date < start_date:
+        return []
+
+    obj_calendar = get_BusinessDayCalendar(COUNTRY_HOLIDAYS, range(start_date.year, end_date.year + 1))
+
     # match only holidays
     LIST_HOLIDAYS=[]
-    for date,name in getHolidays(COUNTRY_HOLIDAYS,years):
-        if date.strftime('%Y-%m-%d') in LIST_DATES:
-            # [DEBUG] print(date,name)
-            LIST_HOLIDAYS.append(date.strftime('%d/%m/%Y'))
+    for holiday_date in obj_calendar.get_HolidaysBetween(start_date, end_date).tolist():
+        LIST_HOLIDAYS.append(holiday_date.strftime('%d/%m/%Y'))
             
     return LIST_HOLIDAYS
 
@@ -127,6 +191,7 @@ def getTenorFromString(str_tenor):
 ##############################################################################
 #        CALCULATE YEAR FRACTION                                             #
 ##############################################################################
+@memoize_LRU(maxsize = dateLogic_cacheSize)
 def getYearFraction(start_date, end_date, BusinessDayConvention='ACTACT'):
     """
     calculate year fraction between two dates.
@@ -189,6 +254,7 @@ def calendardays(start_date, end_date):
 ##############################################################################
 #        GET NUMBER OF TRADING DAYS                                          #
 ##############################################################################
+@memoize_LRU(maxsize = dateLogic_cacheSize)
 def networkdays(start_date, end_date, holidays=[], weekends=default_weekends):
     """
     Returns the number of working days between start_date and end_date
@@ -266,12 +332,9 @@ def getBusinessDay(cdate, Delta, COUNTRY_HOLIDAYS=default_holidays):
     else:
         bdate = cdate
     
-    LIST_HOLIDAYS=[]
-    for date,name in getHolidays(COUNTRY_HOLIDAYS,[bdate.year]):
-        LIST_HOLIDAYS.append(date.strftime('%d/%m/%Y'))
+    obj_calendar = get_BusinessDayCalendar(COUNTRY_HOLIDAYS, [bdate.year])
 
-    
-    while bdate.strftime('%d/%m/%Y') in LIST_HOLIDAYS:
+    while obj_calendar.is_holiday(bdate):
         if Delta > 0:
             bdate = next_weekday(bdate,1) 
         elif Delta < 0:
@@ -282,6 +345,7 @@ def getBusinessDay(cdate, Delta, COUNTRY_HOLIDAYS=default_holidays):
 ##############################################################################
 #        ADD TENOR TO DATE                                                   #
 ##############################################################################
+@memoize_LRU(maxsize = dateLogic_cacheSize)
 def addTenor(cdate, shift, flag_excludeNonBusinessDay=True):
     """
     add shift (e.g. 1M or 2D) to date.
@@ -316,6 +380,147 @@ def addTenor(cdate, shift, flag_excludeNonBusinessDay=True):
     else:
         return ndate.strftime('%d/%m/%Y')
         
+##############################################################################
+#        DD/MM/YYYY STRINGS <--> datetime64[D]                               #
+##############################################################################
+def convertStrDates_toDatetime64(list_str_dates):
+    """
+    ['25/06/2018', ...] --> array of datetime64[D]
+    """
+    return np.array([ str_date[6:10] + '-' + str_date[3:5] + '-' + str_date[0:2] for str_date in list_str_dates ],
+                    dtype='datetime64[D]')
+
+def convertDatetime64_toStrDates(arr_dates):
+    """
+    array of datetime64[D] --> ['25/06/2018', ...]
+    """
+    return [ str_date[8:10] + '/' + str_date[5:7] + '/' + str_date[0:4] for str_date in np.datetime_as_string(arr_dates, unit='D') ]
+
+def get_DatesArray(dates):
+    if isinstance(dates, str):
+        dates = [dates]
+
+    arr_dates = np.asarray(dates)
+    if np.issubdtype(arr_dates.dtype, np.datetime64):
+        return arr_dates.astype('datetime64[D]')
+    return convertStrDates_toDatetime64(arr_dates.ravel()).reshape(arr_dates.shape)
+
+def get_CalendarForDates(COUNTRY_HOLIDAYS, *list_arr_dates):
+    """
+    Return value: class_BusinessDayCalendar covering all years of the dates
+                  (plus one year for rolling past the last of them)
+    """
+    arr_years = np.concatenate([ arr_dates.astype('datetime64[Y]').astype(int).ravel() + 1970 for arr_dates in list_arr_dates ])
+    return get_BusinessDayCalendar(COUNTRY_HOLIDAYS, range(int(arr_years.min()), int(arr_years.max()) + 2))
+
+##############################################################################
+#        GET NUMBER OF TRADING DAYS (ARRAYS)                                 #
+##############################################################################
+def networkdays_Array(start_dates, end_dates, COUNTRY_HOLIDAYS=default_holidays):
+    """
+    networkdays for arrays of dates (DD/MM/YYYY strings or datetime64),
+    with the holidays of getHolidaysBetween(start_date, end_date, COUNTRY_HOLIDAYS).
+
+    Same count as networkdays: weekdays between start_date and end_date
+    INCLUSIVE, minus every holiday in that period (also the ones that fall
+    onto a weekend).
+
+    Return value: array of int
+    """
+    arr_start = get_DatesArray(start_dates)
+    arr_end   = get_DatesArray(end_dates)
+
+    obj_calendar = get_CalendarForDates(COUNTRY_HOLIDAYS, arr_start, arr_end)
+
+    arr_weekdays = np.busday_count(arr_start, arr_end + np.timedelta64(1, 'D'), weekmask='1111100')
+
+    arr_nHolidays = np.searchsorted(obj_calendar.arr_holidays, arr_end  , side='right') - \
+                    np.searchsorted(obj_calendar.arr_holidays, arr_start, side='left' )
+
+    return arr_weekdays - arr_nHolidays
+
+##############################################################################
+#        ADD TENOR TO DATE (ARRAYS)                                          #
+##############################################################################
+def addTenor_Array(dates, shifts, flag_excludeNonBusinessDay=True, COUNTRY_HOLIDAYS=default_holidays):
+    """
+    addTenor for arrays of dates (DD/MM/YYYY strings or datetime64) and
+    shifts (e.g. '2D', '-2D', '6M', '1Y'; one string or one per date).
+
+    Months and years are added like relativedelta (end of month clipped).
+    With flag_excludeNonBusinessDay the date is moved like getBusinessDay:
+      Saturday --> Monday (positive shift) / Thursday (negative shift)
+      Sunday   --> Monday (positive shift) / Friday   (negative shift)
+    and then on to the next (previous) business day while it is a holiday.
+
+    Return value: array of datetime64[D] (see convertDatetime64_toStrDates)
+    """
+    arr_dates  = get_DatesArray(dates)
+    arr_shifts = np.broadcast_to(np.asarray(shifts), arr_dates.shape)
+
+    #-------------------------------------------------------------------------#
+    #    tenor: number and unit per date                                      #
+    #-------------------------------------------------------------------------#
+    arr_unit  = np.array([ str_shift[-1]                       for str_shift in arr_shifts.ravel() ]).reshape(arr_dates.shape)
+    arr_Delta = np.array([ getTenorFromString(str(str_shift)) for str_shift in arr_shifts.ravel() ], dtype=np.int64).reshape(arr_dates.shape)
+
+    #-------------------------------------------------------------------------#
+    #    add days / weeks / months / years                                    #
+    #-------------------------------------------------------------------------#
+    arr_days   = np.where(arr_unit == 'W', 7*arr_Delta, arr_Delta)
+    arr_months = np.where(arr_unit == 'Y', 12*arr_Delta, arr_Delta)
+
+    arr_isMonths = (arr_unit == 'M') | (arr_unit == 'Y')
+
+    # month shift: same day of month, clipped to the last day of the new month
+    arr_month       = arr_dates.astype('datetime64[M]') + np.where(arr_isMonths, arr_months, 0).astype('timedelta64[M]')
+    arr_dayOfMonth  = (arr_dates - arr_dates.astype('datetime64[M]')).astype(np.int64)
+    arr_lengthMonth = ((arr_month + np.timedelta64(1, 'M')).astype('datetime64[D]') - arr_month.astype('datetime64[D]')).astype(np.int64)
+
+    arr_shifted_M = arr_month.astype('datetime64[D]') + np.minimum(arr_dayOfMonth, arr_lengthMonth - 1).astype('timedelta64[D]')
+    arr_shifted_D = arr_dates + arr_days.astype('timedelta64[D]')
+
+    arr_ndate = np.where(arr_isMonths, arr_shifted_M, arr_shifted_D)
+
+    # end_date can be business or non-business day
+    if flag_excludeNonBusinessDay == False:
+        return arr_ndate
+
+    #-------------------------------------------------------------------------#
+    #    make sure that the end_date falls onto a business day                #
+    #-------------------------------------------------------------------------#
+    # weekday: 0 = MON, ..., 6 = SUN (1970-01-01 was a Thursday)
+    arr_weekday = (arr_ndate.astype(np.int64) + 3) % 7
+
+    arr_forward = arr_Delta > 0
+    arr_step    = np.zeros(arr_ndate.shape, dtype=np.int64)
+    arr_step    = np.where((arr_weekday == SAT) &  arr_forward, 2, arr_step)
+    arr_step    = np.where((arr_weekday == SUN) &  arr_forward, 1, arr_step)
+    arr_step    = np.where((arr_weekday == SAT) & ~arr_forward, -2, arr_step)
+    arr_step    = np.where((arr_weekday == SUN) & ~arr_forward, -2, arr_step)
+    arr_bdate   = arr_ndate + arr_step.astype('timedelta64[D]')
+
+    obj_calendar = get_CalendarForDates(COUNTRY_HOLIDAYS, arr_bdate)
+
+    arr_bdate_forward  = np.busday_offset(arr_bdate, 0, roll='forward' , busdaycal=obj_calendar.obj_busdaycalendar)
+    arr_bdate_backward = np.busday_offset(arr_bdate, 0, roll='backward', busdaycal=obj_calendar.obj_busdaycalendar)
+
+    return np.where(arr_forward, arr_bdate_forward, np.where(arr_Delta < 0, arr_bdate_backward, arr_bdate))
+
+##############################################################################
+#        STATISTICS OF THE MEMOIZED FUNCTIONS                                #
+##############################################################################
+def get_DateLogicCacheStatistics():
+    """
+    Return value: dict function name --> hits/misses/size of its cache
+    """
+    return { function.__name__ : function.cache.get_Statistics() \
+             for function in [getHolidaysBetween, getYearFraction, networkdays, addTenor] }
+
+def clear_DateLogicCache():
+    for function in [getHolidaysBetween, getYearFraction, networkdays, addTenor]:
+        function.cache.clear()
+
 ###########################################################################
 #              DATE CONVERION FOR ATTRIBUTES.TXT                          #
 ########################################################################### 
@@ -13,12 +13,14 @@ from .DateLogic import getYearFraction                , \
                           convertDateFormatForAttributes , \
                           getTenorInformation
 
+from .ProductBook import class_ProductRowView
+
 from .Pricing import value_FX_Option_GarmanKohlhagen
 from .Pricing import class_FX_Vol_Malz
 
 
 
-class class_FX_DCI:
+class class_FX_DCI(class_ProductRowView):
     def __init__(self,
                  ccy_FOR         ,
                  ccy_DOM         ,
@@ -91,6 +93,27 @@ class class_FX_DCI:
     ###########################################################################
     #              PRE-PROCESSING                                             #
     ###########################################################################
+    # attributes set by preProcessing_Market: the same for all products
+    # with the same get_PreProcessingKey (see BookPreProcessing.py)
+    list_MarketAttributes = [ 'spotDate'                ,
+                              'settlementDate'          ,
+                              'fixingDate'              ,
+                              'T_RHP'                   ,
+                              'nTradingDaysRHP'         ,
+                              'list_requiredUnderlyers' ,
+                              'spot_rate'               ,
+                              'yield_FOR'               ,
+                              'yield_DOM'               ,
+                              'volatility_ATM'          ,
+                              'volatility_MS_25Delta'   ,
+                              'volatility_RR_25Delta'   ,
+                              'DeltaFlag'               ,
+                              'volatility_40Delta'      ,
+                              'strike'                  ]
+
+    def get_PreProcessingKey(self):
+        return (self.product_type, self.tradeDate, self.ccy_FOR, self.ccy_DOM, self.ccy_SET, self.RHP_string)
+
     def preProcessing(self,
                       df_CurrentMarketData_Exchange   ,
                       df_CurrentMarketData_Yield      ,
@@ -100,6 +123,39 @@ class class_FX_DCI:
                       df_CurrentMarketData_FXDeltaVol ,
                       dict_FXDeltaVol_MS_CurveName    ,
                       dict_FXDeltaVol_RR_CurveName    ):
+        """
+        preProcessing_Market followed by preProcessing_Product
+        """
+        errorMessage = self.preProcessing_Market( df_CurrentMarketData_Exchange   = df_CurrentMarketData_Exchange   ,
+                                                  df_CurrentMarketData_Yield      = df_CurrentMarketData_Yield      ,
+                                                  dict_YieldCcy_CurveName         = dict_YieldCcy_CurveName         ,
+                                                  df_CurrentMarketData_FXATMVol   = df_CurrentMarketData_FXATMVol   ,
+                                                  dict_FXATMVol_CurveName         = dict_FXATMVol_CurveName         ,
+                                                  df_CurrentMarketData_FXDeltaVol = df_CurrentMarketData_FXDeltaVol ,
+                                                  dict_FXDeltaVol_MS_CurveName    = dict_FXDeltaVol_MS_CurveName    ,
+                                                  dict_FXDeltaVol_RR_CurveName    = dict_FXDeltaVol_RR_CurveName    )
+
+        if errorMessage < 0:
+            return errorMessage
+
+        return self.preProcessing_Product()
+
+    ###########################################################################
+    #              PRE-PROCESSING (MARKET DATA)                               #
+    ###########################################################################
+    def preProcessing_Market(self,
+                             df_CurrentMarketData_Exchange   ,
+                             df_CurrentMarketData_Yield      ,
+                             dict_YieldCcy_CurveName         ,
+                             df_CurrentMarketData_FXATMVol   ,
+                             dict_FXATMVol_CurveName         ,
+                             df_CurrentMarketData_FXDeltaVol ,
+                             dict_FXDeltaVol_MS_CurveName    ,
+                             dict_FXDeltaVol_RR_CurveName    ):
+        """
+        Dates, spot, yields, volatilities and strike: only depend on
+        get_PreProcessingKey and the market data
+        """
 
         #.....................................................................#
         #          calculate spot/fixing/settlement dates                     #
@@ -266,6 +322,23 @@ class class_FX_DCI:
                                                             delta     = 40                      ,
                                                             TDays     = self.nTradingDaysRHP    )
 
+        #.....................................................................#
+        #          if no error encountered: return 0                          #
+        #.....................................................................#
+        return 0
+
+    ###########################################################################
+    #              PRE-PROCESSING (PER PRODUCT)                               #
+    ###########################################################################
+    def preProcessing_Product(self):
+        """
+        Part of the preProcessing that depends on the product itself
+        (amounts, position), run after preProcessing_Market.
+        """
+        spot_rate = self.spot_rate
+        yield_FOR = self.yield_FOR
+        yield_DOM = self.yield_DOM
+
         #.....................................................................#
         #          calculate CallAmount & PutAmount                           #
         #.....................................................................#
@@ -321,12 +394,6 @@ class class_FX_DCI:
         #.....................................................................#
         #          value the option                                           #
         #.....................................................................#
-        # the vol surface for XAUUSD is messed up (comes as USDXAU instead of XAUUSD)
-        if self.ccy_FOR == 'XAU':
-            ccy_name_counter = 'XAU'
-        else:
-            ccy_name_counter = self.ccy_DOM
-
         # DCI rely on shorting a Call option (40 Delta)
         OptionValue = value_FX_Option_GarmanKohlhagen( spot       = spot_rate               , \
                                                        strike     = self.strike             , \
@@ -390,6 +457,16 @@ class class_FX_DCI:
     def get_requiredUnderlyers(self):
         return self.list_requiredUnderlyers
 
+    ###########################################################################
+    #              RETURN LIST WITH REQUIRED OBSERVATION DAYS                 #
+    ###########################################################################
+    def get_requiredObservationDays(self):
+        """
+        trading days (counted from tradeDate, starting at 1) on which
+        calculate_payoff reads the underlying
+        """
+        return [self.nTradingDaysRHP]
+
     ###########################################################################
     #              SET THE FAV / MOD / UNFAV PAYOFFS                          #
     ###########################################################################
@@ -573,7 +650,8 @@ class class_FX_DCI:
             df_path = dict_paths[underlyer]
 
             # pick the underlying timepoint for payoff evaluation
-            arr_underlying = df_path.iloc[self.nTradingDaysRHP-1]
+            # (row label = trading day - 1, paths may only contain the observation days)
+            arr_underlying = df_path.loc[self.nTradingDaysRHP-1]
 
             # note:
             # applying the max(arg, 0) function won't work, because it is not a vectorized operation
@@ -9,7 +9,9 @@ from .DateLogic import getYearFraction                , \
                           convertDateFormatForAttributes , \
                           getTenorInformation
 
-class class_FX_Forward:
+from .ProductBook import class_ProductRowView
+
+class class_FX_Forward(class_ProductRowView):
     def __init__(self,
                  ccy_FOR         ,
                  ccy_DOM         ,
@@ -70,10 +72,49 @@ class class_FX_Forward:
     ###########################################################################
     #              PRE-PROCESSING                                             #
     ###########################################################################
+    # attributes set by preProcessing_Market: the same for all products
+    # with the same get_PreProcessingKey (see BookPreProcessing.py)
+    list_MarketAttributes = [ 'spotDate'                ,
+                              'settlementDate'          ,
+                              'fixingDate'              ,
+                              'T_RHP'                   ,
+                              'nTradingDaysRHP'         ,
+                              'list_requiredUnderlyers' ,
+                              'spot_rate'               ,
+                              'yield_FOR'               ,
+                              'yield_DOM'               ,
+                              'strike'                  ]
+
+    def get_PreProcessingKey(self):
+        return (self.product_type, self.tradeDate, self.ccy_FOR, self.ccy_DOM, self.ccy_SET, self.RHP_string, self.deliveryType)
+
     def preProcessing(self,
                       df_CurrentMarketData_Exchange,
                       df_CurrentMarketData_Yield,
                       dict_YieldCcy_CurveName):
+        """
+        preProcessing_Market followed by preProcessing_Product
+        """
+        errorMessage = self.preProcessing_Market( df_CurrentMarketData_Exchange = df_CurrentMarketData_Exchange ,
+                                                  df_CurrentMarketData_Yield    = df_CurrentMarketData_Yield    ,
+                                                  dict_YieldCcy_CurveName       = dict_YieldCcy_CurveName       )
+
+        if errorMessage < 0:
+            return errorMessage
+
+        return self.preProcessing_Product()
+
+    ###########################################################################
+    #              PRE-PROCESSING (MARKET DATA)                               #
+    ###########################################################################
+    def preProcessing_Market(self,
+                             df_CurrentMarketData_Exchange,
+                             df_CurrentMarketData_Yield,
+                             dict_YieldCcy_CurveName):
+        """
+        Dates, spot, yields, volatilities and strike: only depend on
+        get_PreProcessingKey and the market data
+        """
         #.....................................................................#
         #          calculate spot/fixing/settlement dates                     #
         #.....................................................................#
@@ -156,6 +197,19 @@ class class_FX_Forward:
                                        T                    = self.T_RHP      , \
                                        n_compoundingPeriods = 1)
 
+        #.....................................................................#
+        #          if no error encountered: return 0                          #
+        #.....................................................................#
+        return 0
+
+    ###########################################################################
+    #              PRE-PROCESSING (PER PRODUCT)                               #
+    ###########################################################################
+    def preProcessing_Product(self):
+        """
+        Part of the preProcessing that depends on the product itself
+        (amounts, position), run after preProcessing_Market.
+        """
         #.....................................................................#
         #          calculate PayAmount & ReceiveAmount                        #
         #.....................................................................#
@@ -216,6 +270,16 @@ class class_FX_Forward:
     def get_requiredUnderlyers(self):
         return self.list_requiredUnderlyers
 
+    ###########################################################################
+    #              RETURN LIST WITH REQUIRED OBSERVATION DAYS                 #
+    ###########################################################################
+    def get_requiredObservationDays(self):
+        """
+        trading days (counted from tradeDate, starting at 1) on which
+        calculate_payoff reads the underlying
+        """
+        return [self.nTradingDaysRHP]
+
     ###########################################################################
     #              SET THE FAV / MOD / UNFAV PAYOFFS                          #
     ###########################################################################
@@ -294,7 +358,8 @@ class class_FX_Forward:
             df_path = dict_paths[underlyer]
 
             # pick the underlying timepoint for payoff evaluation
-            arr_underlying = df_path.iloc[self.nTradingDaysRHP-1]
+            # (row label = trading day - 1, paths may only contain the observation days)
+            arr_underlying = df_path.loc[self.nTradingDaysRHP-1]
 
             # EURUSD, EURGBP, USDINR, ...
             if self.ccy_SET == self.ccy_FOR:
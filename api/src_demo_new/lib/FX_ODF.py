@@ -10,9 +10,11 @@ from .DateLogic import getYearFraction                , \
                           convertDateFormatForAttributes , \
                           getTenorInformation
 
+from .ProductBook import class_ProductRowView
 
 
-class class_FX_ODF:
+
+class class_FX_ODF(class_ProductRowView):
     def __init__(self,
                  ccy_FOR         ,
                  ccy_DOM         ,
@@ -75,10 +77,57 @@ class class_FX_ODF:
     ###########################################################################
     #              PRE-PROCESSING                                             #
     ###########################################################################
+    # attributes set by preProcessing_Market: the same for all products
+    # with the same get_PreProcessingKey (see BookPreProcessing.py)
+    list_MarketAttributes = [ 'spotDate'                 ,
+                              'intermediateDate'         ,
+                              'settlementDate'           ,
+                              'fixingDate'               ,
+                              'T_Intermediate'           ,
+                              'T_RHP'                    ,
+                              'nTradingDaysRHP'          ,
+                              'nTradingDaysIntermediate' ,
+                              'list_requiredUnderlyers'  ,
+                              'spot_rate'                ,
+                              'yield_FOR_Intermediate'   ,
+                              'yield_DOM_Intermediate'   ,
+                              'strike_Intermediate'      ,
+                              'yield_FOR_RHP'            ,
+                              'yield_DOM_RHP'            ,
+                              'strike_RHP'               ,
+                              'ForwardRate'              ,
+                              'ForwardAccrualFactor'     ]
+
+    def get_PreProcessingKey(self):
+        return (self.product_type, self.tradeDate, self.ccy_FOR, self.ccy_DOM, self.ccy_SET, self.T_Inter_string, self.RHP_string)
+
     def preProcessing(self,
                       df_CurrentMarketData_Exchange,
                       df_CurrentMarketData_Yield,
                       dict_YieldCcy_CurveName):
+        """
+        preProcessing_Market followed by preProcessing_Product
+        """
+        errorMessage = self.preProcessing_Market( df_CurrentMarketData_Exchange = df_CurrentMarketData_Exchange ,
+                                                  df_CurrentMarketData_Yield    = df_CurrentMarketData_Yield    ,
+                                                  dict_YieldCcy_CurveName       = dict_YieldCcy_CurveName       )
+
+        if errorMessage < 0:
+            return errorMessage
+
+        return self.preProcessing_Product()
+
+    ###########################################################################
+    #              PRE-PROCESSING (MARKET DATA)                               #
+    ###########################################################################
+    def preProcessing_Market(self,
+                             df_CurrentMarketData_Exchange,
+                             df_CurrentMarketData_Yield,
+                             dict_YieldCcy_CurveName):
+        """
+        Dates, spot, yields, volatilities and strike: only depend on
+        get_PreProcessingKey and the market data
+        """
 
         #.....................................................................#
         #          calculate spot/fixing/settlement dates                     #
@@ -185,15 +234,6 @@ class class_FX_ODF:
                                              T                          = self.T_RHP         , \
                                              n_compoundingPeriods       = 1)
 
-        # the strike that is chosen for the investor is the one that is worse
-        # from the investor perspective
-        # i.e. if long ODF  --> pick the larger strike
-        #      if short ODF --> pick the lower strike
-        if self.positionType == 'long':
-            self.strike = max(self.strike_Intermediate, self.strike_RHP)
-        if self.positionType == 'short':
-            self.strike = min(self.strike_Intermediate, self.strike_RHP)
-
         #.....................................................................#
         #          calculate ForwardAccrualFactor                             #
         #.....................................................................#
@@ -212,6 +252,28 @@ class class_FX_ODF:
 
         self.ForwardAccrualFactor = np.power((1.0 + self.ForwardRate), (self.T_RHP-self.T_Intermediate))
 
+        #.....................................................................#
+        #          if no error encountered: return 0                          #
+        #.....................................................................#
+        return 0
+
+    ###########################################################################
+    #              PRE-PROCESSING (PER PRODUCT)                               #
+    ###########################################################################
+    def preProcessing_Product(self):
+        """
+        Part of the preProcessing that depends on the product itself
+        (amounts, position), run after preProcessing_Market.
+        """
+        # the strike that is chosen for the investor is the one that is worse
+        # from the investor perspective
+        # i.e. if long ODF  --> pick the larger strike
+        #      if short ODF --> pick the lower strike
+        if self.positionType == 'long':
+            self.strike = max(self.strike_Intermediate, self.strike_RHP)
+        if self.positionType == 'short':
+            self.strike = min(self.strike_Intermediate, self.strike_RHP)
+
         #.....................................................................#
         #          calculate PayAmount & ReceiveAmount                        #
         #.....................................................................#
@@ -272,6 +334,16 @@ class class_FX_ODF:
     def get_requiredUnderlyers(self):
         return self.list_requiredUnderlyers
 
+    ###########################################################################
+    #              RETURN LIST WITH REQUIRED OBSERVATION DAYS                 #
+    ###########################################################################
+    def get_requiredObservationDays(self):
+        """
+        trading days (counted from tradeDate, starting at 1) on which
+        calculate_payoff reads the underlying
+        """
+        return [self.nTradingDaysIntermediate, self.nTradingDaysRHP]
+
     ###########################################################################
     #              SET THE FAV / MOD / UNFAV PAYOFFS                          #
     ###########################################################################
@@ -350,8 +422,9 @@ class class_FX_ODF:
             df_path = dict_paths[underlyer]
 
             # pick the underlying timepoint for payoff evaluation
-            arr_underlying_Intermediate = df_path.iloc[self.nTradingDaysIntermediate-1]
-            arr_underlying_RHP          = df_path.iloc[self.nTradingDaysRHP-1]
+            # (row label = trading day - 1, paths may only contain the observation days)
+            arr_underlying_Intermediate = df_path.loc[self.nTradingDaysIntermediate-1]
+            arr_underlying_RHP          = df_path.loc[self.nTradingDaysRHP-1]
 
             #----------------------------------#
             # calculate payoff for short tenor #
@@ -11,10 +11,12 @@ from .DateLogic import getYearFraction                , \
                           convertDateFormatForAttributes , \
                           getTenorInformation
 
+from .ProductBook import class_ProductRowView
+
 from .Pricing import value_FX_Option_GarmanKohlhagen
 
 
-class class_FX_Option:
+class class_FX_Option(class_ProductRowView):
     def __init__(self,
                  ccy_FOR         ,
                  ccy_DOM         ,
@@ -77,12 +79,56 @@ class class_FX_Option:
     ###########################################################################
     #              PRE-PROCESSING                                             #
     ###########################################################################
+    # attributes set by preProcessing_Market: the same for all products
+    # with the same get_PreProcessingKey (see BookPreProcessing.py)
+    list_MarketAttributes = [ 'spotDate'                ,
+                              'settlementDate'          ,
+                              'fixingDate'              ,
+                              'T_RHP'                   ,
+                              'nTradingDaysRHP'         ,
+                              'list_requiredUnderlyers' ,
+                              'spot_rate'               ,
+                              'yield_FOR'               ,
+                              'yield_DOM'               ,
+                              'strike'                  ,
+                              'volatility_ATM'          ]
+
+    def get_PreProcessingKey(self):
+        return (self.product_type, self.tradeDate, self.ccy_FOR, self.ccy_DOM, self.ccy_SET, self.RHP_string)
+
     def preProcessing(self,
                       df_CurrentMarketData_Exchange ,
                       df_CurrentMarketData_Yield    ,
                       dict_YieldCcy_CurveName       ,
                       df_CurrentMarketData_FXATMVol ,
                       dict_FXATMVol_CurveName       ):
+        """
+        preProcessing_Market followed by preProcessing_Product
+        """
+        errorMessage = self.preProcessing_Market( df_CurrentMarketData_Exchange = df_CurrentMarketData_Exchange ,
+                                                  df_CurrentMarketData_Yield    = df_CurrentMarketData_Yield    ,
+                                                  dict_YieldCcy_CurveName       = dict_YieldCcy_CurveName       ,
+                                                  df_CurrentMarketData_FXATMVol = df_CurrentMarketData_FXATMVol ,
+                                                  dict_FXATMVol_CurveName       = dict_FXATMVol_CurveName       )
+
+        if errorMessage < 0:
+            return errorMessage
+
+        return self.preProcessing_Product()
+
+    ###########################################################################
+    #              PRE-PROCESSING (MARKET DATA)                               #
+    ###########################################################################
+    def preProcessing_Market(self,
+                             df_CurrentMarketData_Exchange ,
+                             df_CurrentMarketData_Yield    ,
+                             dict_YieldCcy_CurveName       ,
+                             df_CurrentMarketData_FXATMVol ,
+                             dict_FXATMVol_CurveName       ):
+        """
+        Dates, spot, yields, volatilities and strike: only depend on
+        get_PreProcessingKey and the market data
+        """
 
         #.....................................................................#
         #          calculate spot/fixing/settlement dates                     #
@@ -153,6 +199,40 @@ class class_FX_Option:
                                        T                    = self.T_RHP      , \
                                        n_compoundingPeriods = 1)
 
+        #.....................................................................#
+        #          get vol_ATM                                                #
+        #.....................................................................#
+        # the vol surface for XAUUSD is messed up (comes as USDXAU instead of XAUUSD)
+        if self.ccy_FOR == 'XAU':
+            ccy_name_counter = 'XAU'
+        else:
+            ccy_name_counter = self.ccy_DOM
+
+        volatility = get_FXATMVol( df_CurrentMarketData_FXATMVol = df_CurrentMarketData_FXATMVol , \
+                                   dict_FXATMVol_CurveName       = dict_FXATMVol_CurveName       , \
+                                   tenor_in_days                 = tenor_in_days                 , \
+                                   ccy_name                      = self.ccy_FOR                  , \
+                                   ccy_name_counter              = ccy_name_counter              )
+        self.volatility_ATM = volatility
+
+        #.....................................................................#
+        #          if no error encountered: return 0                          #
+        #.....................................................................#
+        return 0
+
+    ###########################################################################
+    #              PRE-PROCESSING (PER PRODUCT)                               #
+    ###########################################################################
+    def preProcessing_Product(self):
+        """
+        Part of the preProcessing that depends on the product itself
+        (amounts, position), run after preProcessing_Market.
+        """
+        spot_rate  = self.spot_rate
+        yield_FOR  = self.yield_FOR
+        yield_DOM  = self.yield_DOM
+        volatility = self.volatility_ATM
+
         #.....................................................................#
         #          calculate CallAmount & PutAmount                           #
         #.....................................................................#
@@ -209,19 +289,6 @@ class class_FX_Option:
         #.....................................................................#
         #          value the option                                           #
         #.....................................................................#
-        # the vol surface for XAUUSD is messed up (comes as USDXAU instead of XAUUSD)
-        if self.ccy_FOR == 'XAU':
-            ccy_name_counter = 'XAU'
-        else:
-            ccy_name_counter = self.ccy_DOM
-
-        volatility = get_FXATMVol( df_CurrentMarketData_FXATMVol = df_CurrentMarketData_FXATMVol , \
-                                   dict_FXATMVol_CurveName       = dict_FXATMVol_CurveName       , \
-                                   tenor_in_days                 = tenor_in_days                 , \
-                                   ccy_name                      = self.ccy_FOR                  , \
-                                   ccy_name_counter              = ccy_name_counter              )
-        self.volatility_ATM = volatility
-
         OptionValue = value_FX_Option_GarmanKohlhagen( spot       = spot_rate       , \
                                                        strike     = self.strike     , \
                                                        volatility = volatility      , \
@@ -261,6 +328,16 @@ class class_FX_Option:
     def get_requiredUnderlyers(self):
         return self.list_requiredUnderlyers
 
+    ###########################################################################
+    #              RETURN LIST WITH REQUIRED OBSERVATION DAYS                 #
+    ###########################################################################
+    def get_requiredObservationDays(self):
+        """
+        trading days (counted from tradeDate, starting at 1) on which
+        calculate_payoff reads the underlying
+        """
+        return [self.nTradingDaysRHP]
+
     ###########################################################################
     #              SET THE FAV / MOD / UNFAV PAYOFFS                          #
     ###########################################################################
@@ -410,7 +487,8 @@ class class_FX_Option:
             df_path = dict_paths[underlyer]
 
             # pick the underlying timepoint for payoff evaluation
-            arr_underlying = df_path.iloc[self.nTradingDaysRHP-1]
+            # (row label = trading day - 1, paths may only contain the observation days)
+            arr_underlying = df_path.loc[self.nTradingDaysRHP-1]
 
             # note:
             # applying the max(arg, 0) function won't work, because it is not a vectorized operation
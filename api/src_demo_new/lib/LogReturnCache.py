@@ -0,0 +1,159 @@
+import os
+import numpy as np
+
+from .Cache import class_LRUCache
+
+from .Bootstrap import calculate_LogReturns_FX , \
+                       calculate_stressed_vol
+
+###############################################################################
+#        LOG RETURN CACHE                                                     #
+###############################################################################
+# FX pair + history (first date, last date, #observations) --> dict_logReturns
+# held in memory and, with flag_persist, as npz file per key
+logReturn_cache_dir = os.path.join(os.path.dirname(__file__), "LogReturnCache")
+
+cache_LogReturns = class_LRUCache(maxsize = 64)
+
+# window of the stressed volatility (<= 1Y products, see Simulation.py)
+stressed_vol_window = 21
+
+def get_LogReturnCacheFilename(key):
+    FX_rate, str_firstDate, str_lastDate, nObservations = key
+    return os.path.join(logReturn_cache_dir, FX_rate + "-" + str_firstDate.replace("/", "") + "-" + \
+                                             str_lastDate.replace("/", "") + "-" + str(nObservations) + ".npz")
+
+###############################################################################
+#        COMPUTE LOG RETURNS AND STATISTICS                                   #
+###############################################################################
+def calculate_LogReturnStatistics_FX( df_HistoricalMarketData_Exchange,
+                                      ccy_FOR                         ,
+                                      ccy_DOM                         ):
+    """
+    Log returns of the FX pair and the statistics the bootstrap needs:
+      std           ... population std (Ito term)
+      stressed_vol  ... stressed volatility, None if too few returns
+      mean_rescaled ... mean of the returns rescaled to stressed_vol (shift term)
+
+    Return value: dict_logReturns, None if there is no historical data
+    """
+    arr_logReturns = calculate_LogReturns_FX( df_HistoricalMarketData_Exchange = df_HistoricalMarketData_Exchange,
+                                              ccy_FOR                          = ccy_FOR                         ,
+                                              ccy_DOM                          = ccy_DOM                         )
+    if arr_logReturns.size == 0:
+        return None
+
+    std = np.std(arr_logReturns)
+
+    stressed_vol = calculate_stressed_vol( arr_returns   = arr_logReturns     , \
+                                           window_length = stressed_vol_window )
+
+    if stressed_vol is None:
+        mean_rescaled = None
+    else:
+        mean_rescaled = np.mean(arr_logReturns * (stressed_vol / std))
+
+    return { 'arr_logReturns' : arr_logReturns ,
+             'std'            : std            ,
+             'stressed_vol'   : stressed_vol   ,
+             'mean_rescaled'  : mean_rescaled  }
+
+###############################################################################
+#        CACHED LOG RETURNS                                                   #
+###############################################################################
+def get_LogReturns_FX( df_HistoricalMarketData_Exchange,
+                       ccy_FOR                         ,
+                       ccy_DOM                         ,
+                       flag_persist = False            ):
+    """
+    Cached version of calculate_LogReturnStatistics_FX. The key is the FX pair
+    and the first/last date and number of its historical observations, so a
+    new observation (or another lookback) gives a new entry.
+
+    Return value: dict_logReturns, None if there is no historical data
+    """
+    arr_isPair = ((df_HistoricalMarketData_Exchange['ccy_FOR'] == ccy_FOR) & \
+                  (df_HistoricalMarketData_Exchange['ccy_DOM'] == ccy_DOM)).values
+
+    if not arr_isPair.any():
+        print('[ERROR]. Could not read Historical Market Data (FX) for:' + ccy_FOR+ccy_DOM)
+        return None
+
+    # dates are YYYY/MM/DD strings: min/max without parsing
+    arr_dates = df_HistoricalMarketData_Exchange['date'].values[arr_isPair].astype(str)
+    key       = (ccy_FOR + ccy_DOM, arr_dates.min(), arr_dates.max(), int(arr_dates.size))
+
+    #-------------------------------------------------------------------------#
+    #    memory                                                               #
+    #-------------------------------------------------------------------------#
+    dict_logReturns = cache_LogReturns.get(key)
+    if dict_logReturns is not None:
+        return dict_logReturns
+
+    #-------------------------------------------------------------------------#
+    #    disk                                                                 #
+    #-------------------------------------------------------------------------#
+    filename = get_LogReturnCacheFilename(key)
+
+    if flag_persist == True and os.path.isfile(filename):
+        try:
+            with np.load(filename, allow_pickle=False) as npz_logReturns:
+                dict_logReturns = { 'arr_logReturns' : npz_logReturns['arr_logReturns'] ,
+                                    'std'            : npz_logReturns['std'][()]        ,
+                                    'stressed_vol'   : npz_logReturns['stressed_vol'][()] ,
+                                    'mean_rescaled'  : npz_logReturns['mean_rescaled'][()] }
+
+            # NaN marks "not enough returns for the stressed volatility"
+            if np.isnan(dict_logReturns['stressed_vol']):
+                dict_logReturns['stressed_vol']  = None
+                dict_logReturns['mean_rescaled'] = None
+        except (OSError, KeyError, ValueError) as e:
+            print('[WARNING]. Could not read cached log returns, recomputing: ', filename)
+            print('           ', e)
+            dict_logReturns = None
+
+    #-------------------------------------------------------------------------#
+    #    compute                                                              #
+    #-------------------------------------------------------------------------#
+    if dict_logReturns is None:
+        dict_logReturns = calculate_LogReturnStatistics_FX( df_HistoricalMarketData_Exchange = df_HistoricalMarketData_Exchange,
+                                                            ccy_FOR                          = ccy_FOR                         ,
+                                                            ccy_DOM                          = ccy_DOM                         )
+        if dict_logReturns is None:
+            return None
+
+        if flag_persist == True:
+            write_LogReturnCache(filename = filename, dict_logReturns = dict_logReturns)
+
+    cache_LogReturns.put(key, dict_logReturns)
+
+    return dict_logReturns
+
+def write_LogReturnCache(filename, dict_logReturns):
+    filename_tmp = filename + "." + str(os.getpid()) + ".tmp"
+
+    try:
+        os.makedirs(logReturn_cache_dir, exist_ok=True)
+        with open(filename_tmp, 'wb') as f:
+            np.savez( f                                                                                                      ,
+                      arr_logReturns = dict_logReturns['arr_logReturns']                                                     ,
+                      std            = np.float64(dict_logReturns['std'])                                                    ,
+                      stressed_vol   = np.float64(np.nan if dict_logReturns['stressed_vol']  is None else dict_logReturns['stressed_vol'])  ,
+                      mean_rescaled  = np.float64(np.nan if dict_logReturns['mean_rescaled'] is None else dict_logReturns['mean_rescaled']) )
+        os.replace(filename_tmp, filename)
+    except OSError as e:
+        print('[WARNING]. Could not write cached log returns: ', filename)
+        print('           ', e)
+
+def invalidate_LogReturnCache():
+    """
+    Empty the memory cache and delete the persisted log returns.
+    """
+    cache_LogReturns.clear()
+
+    if not os.path.isdir(logReturn_cache_dir):
+        return
+
+    for filename in os.listdir(logReturn_cache_dir):
+        if filename.endswith(".npz"):
+            os.remove(os.path.join(logReturn_cache_dir, filename))
@@ -0,0 +1,290 @@
+import numpy as np
+
+###############################################################################
+#        PAYOFFS OF ALL PRODUCTS OF ONE TYPE ON ONE UNDERLYER                 #
+###############################################################################
+# The functions below evaluate the payoff of nProducts products in one pass:
+#   arr_underlying ... (nProducts x nSims), row i = path values at the payoff
+#                      day of product i
+#   arr_strike, ...  ... (nProducts,)
+# Return value: (nProducts x nSims), row i = calculate_payoff of product i
+# (same operations in the same order, so the rows are bitwise equal)
+
+###############################################################################
+#        UNDERLYING AT THE PAYOFF DAYS                                        #
+###############################################################################
+def get_UnderlyingMatrix(df_path, arr_nTradingDays):
+    """
+    Return value: (nProducts x nSims), row i = df_path.loc[arr_nTradingDays[i]-1]
+                  (row label = trading day - 1)
+    """
+    return df_path.loc[np.asarray(arr_nTradingDays)-1].values
+
+###############################################################################
+#        FORWARD / SWAP (far leg)                                             #
+###############################################################################
+def calculate_Payoffs_Linear( arr_underlying ,
+                              arr_strike     ,
+                              arr_amount     ,
+                              arr_isShort    ,
+                              arr_isSET_FOR  ):
+    """
+      arr_amount    ... ReceiveAmount (Forward, ODF) or ReceiveAmountFarLeg (Swap)
+      arr_isSET_FOR ... True: ccy_SET == ccy_FOR (EURUSD, ...),
+                        False: ccy_SET == ccy_DOM (XAUUSD)
+    """
+    arr_strike = arr_strike[:, np.newaxis]
+    arr_amount = np.where(arr_isShort, (-1)*arr_amount, arr_amount)[:, np.newaxis]
+
+    arr_payoff = np.empty(arr_underlying.shape)
+
+    # EURUSD, EURGBP, USDINR, ...
+    arr_rows = arr_isSET_FOR
+    arr_payoff[arr_rows] = arr_amount[arr_rows] / arr_underlying[arr_rows] * (arr_underlying[arr_rows] - arr_strike[arr_rows])
+
+    # XAUUSD
+    arr_rows = ~arr_isSET_FOR
+    arr_payoff[arr_rows] = arr_amount[arr_rows] * (arr_underlying[arr_rows] - arr_strike[arr_rows])
+
+    return arr_payoff
+
+###############################################################################
+#        OPTION / DCI (short Call)                                            #
+###############################################################################
+def calculate_Payoffs_Option( arr_underlying ,
+                              arr_strike     ,
+                              arr_CallAmount ,
+                              arr_isShort    ,
+                              arr_isPut      ,
+                              arr_isSET_FOR  ):
+    """
+    max(+-CallAmount ... (underlying - strike), 0), times (-1) for short positions
+    """
+    arr_payoff = calculate_Payoffs_Linear( arr_underlying = arr_underlying ,
+                                           arr_strike     = arr_strike     ,
+                                           arr_amount     = arr_CallAmount ,
+                                           arr_isShort    = arr_isPut      ,
+                                           arr_isSET_FOR  = arr_isSET_FOR  )
+
+    arr_payoff[arr_payoff < 0.0] = 0.0
+
+    arr_payoff[arr_isShort] = arr_payoff[arr_isShort] * (-1)
+
+    return arr_payoff
+
+###############################################################################
+#        ODF                                                                  #
+###############################################################################
+def calculate_Payoffs_ODF( arr_underlying_Intermediate ,
+                           arr_underlying_RHP          ,
+                           arr_strike                  ,
+                           arr_amount                  ,
+                           arr_isShort                 ,
+                           arr_isSET_FOR               ,
+                           arr_ForwardAccrualFactor    ):
+    """
+    Worse of the payoff at the intermediate day (gains accrued with the
+    Forward rate) and the payoff at the RHP
+    """
+    arr_payoff_Intermediate = calculate_Payoffs_Linear( arr_underlying = arr_underlying_Intermediate ,
+                                                        arr_strike     = arr_strike                  ,
+                                                        arr_amount     = arr_amount                  ,
+                                                        arr_isShort    = arr_isShort                 ,
+                                                        arr_isSET_FOR  = arr_isSET_FOR               )
+
+    # if investor made a loss --> keep flat
+    arr_payoff_Intermediate = np.where( arr_payoff_Intermediate > 0.0                                  ,
+                                        arr_payoff_Intermediate * arr_ForwardAccrualFactor[:, np.newaxis] ,
+                                        arr_payoff_Intermediate                                           )
+
+    arr_payoff_RHP = calculate_Payoffs_Linear( arr_underlying = arr_underlying_RHP ,
+                                               arr_strike     = arr_strike         ,
+                                               arr_amount     = arr_amount         ,
+                                               arr_isShort    = arr_isShort        ,
+                                               arr_isSET_FOR  = arr_isSET_FOR      )
+
+    # pick smaller payoff
+    return np.where(arr_payoff_Intermediate > arr_payoff_RHP, arr_payoff_RHP, arr_payoff_Intermediate)
+
+###############################################################################
+#        ROWS OF A PRODUCT TABLE                                              #
+###############################################################################
+# product_type --> (amount column, option types the batched payoff covers,
+#                   position types the batched payoff covers)
+dict_PayoffColumns = { 'FX_Forward' : ('ReceiveAmount'       , None            , ['long', 'short']) ,
+                       'FX_Swap'    : ('ReceiveAmountFarLeg' , None            , ['long', 'short']) ,
+                       'FX_ODF'     : ('ReceiveAmount'       , None            , ['long', 'short']) ,
+                       'FX_Option'  : ('CallAmount'          , ['Call', 'Put'] , ['long', 'short']) ,
+                       'FX_DCI'     : ('CallAmount'          , ['Call']        , ['short']        ) }
+
+def get_FloatColumn(obj_table, name, arr_rows):
+    """
+    Return value: (values as float64, mask of the rows with a numeric value)
+    """
+    arr_column = obj_table.get_Column(name)[arr_rows]
+    arr_isNone = obj_table.dict_isNone[name][arr_rows]
+
+    if arr_column.dtype.kind in 'iuf':
+        return arr_column.astype(np.float64), ~arr_isNone
+
+    arr_isNumber = np.array([ isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, (bool, np.bool_)) \
+                              for value in arr_column ], dtype=bool) & ~arr_isNone
+    arr_values   = np.where(arr_isNumber, arr_column, np.nan).astype(np.float64)
+
+    return arr_values, arr_isNumber
+
+def get_SupportedRows(obj_table, arr_rows):
+    """
+    Rows the batched payoff can evaluate: known settlement currency,
+    position and option type, numeric strike/amount. All other rows keep
+    the per-product calculate_payoff (NaN payoffs, error messages, ...).
+
+    Return value: mask over arr_rows
+    """
+    amount_column, list_optionTypes, list_positionTypes = dict_PayoffColumns[obj_table.product_type]
+
+    if amount_column not in obj_table.dict_columns or 'strike' not in obj_table.dict_columns:
+        return np.zeros(len(arr_rows), dtype=bool)
+
+    arr_ccy_SET = obj_table.get_Column('ccy_SET')[arr_rows]
+
+    arr_isSupported = (arr_ccy_SET == obj_table.get_Column('ccy_FOR')[arr_rows]) | \
+                      (arr_ccy_SET == obj_table.get_Column('ccy_DOM')[arr_rows])
+
+    arr_isSupported = arr_isSupported & np.isin(obj_table.get_Column('positionType')[arr_rows], list_positionTypes)
+
+    if list_optionTypes is not None:
+        arr_isSupported = arr_isSupported & np.isin(obj_table.get_Column('optionType')[arr_rows], list_optionTypes)
+
+    for name in [amount_column, 'strike']:
+        _, arr_isNumber = get_FloatColumn(obj_table, name, arr_rows)
+        arr_isSupported = arr_isSupported & arr_isNumber
+
+    if obj_table.product_type == 'FX_ODF':
+        if 'ForwardAccrualFactor' not in obj_table.dict_columns:
+            return np.zeros(len(arr_rows), dtype=bool)
+
+        _, arr_isNumber = get_FloatColumn(obj_table, 'ForwardAccrualFactor', arr_rows)
+        arr_isSupported = arr_isSupported & arr_isNumber
+
+    return arr_isSupported
+
+def calculate_Payoffs_ProductTable(obj_table, arr_rows, df_path):
+    """
+    Payoffs of the rows arr_rows of a class_ProductTable, all on the
+    underlyer of df_path. The rows must be supported (get_SupportedRows).
+
+    Return value: (len(arr_rows) x nSims)
+    """
+    product_type  = obj_table.product_type
+    amount_column = dict_PayoffColumns[product_type][0]
+
+    arr_strike, _ = get_FloatColumn(obj_table, 'strike'     , arr_rows)
+    arr_amount, _ = get_FloatColumn(obj_table, amount_column, arr_rows)
+
+    arr_isShort   = obj_table.get_Column('positionType')[arr_rows] == 'short'
+    arr_isSET_FOR = obj_table.get_Column('ccy_SET')[arr_rows] == obj_table.get_Column('ccy_FOR')[arr_rows]
+
+    arr_underlying = get_UnderlyingMatrix( df_path          = df_path                                           ,
+                                           arr_nTradingDays = obj_table.get_Column('nTradingDaysRHP')[arr_rows] )
+
+    if product_type in ['FX_Forward', 'FX_Swap']:
+        return calculate_Payoffs_Linear( arr_underlying = arr_underlying ,
+                                         arr_strike     = arr_strike     ,
+                                         arr_amount     = arr_amount     ,
+                                         arr_isShort    = arr_isShort    ,
+                                         arr_isSET_FOR  = arr_isSET_FOR  )
+
+    if product_type in ['FX_Option', 'FX_DCI']:
+        return calculate_Payoffs_Option( arr_underlying = arr_underlying                                         ,
+                                         arr_strike     = arr_strike                                             ,
+                                         arr_CallAmount = arr_amount                                             ,
+                                         arr_isShort    = arr_isShort                                            ,
+                                         arr_isPut      = obj_table.get_Column('optionType')[arr_rows] == 'Put' ,
+                                         arr_isSET_FOR  = arr_isSET_FOR                                          )
+
+    if product_type == 'FX_ODF':
+        arr_ForwardAccrualFactor, _ = get_FloatColumn(obj_table, 'ForwardAccrualFactor', arr_rows)
+
+        arr_underlying_Intermediate = get_UnderlyingMatrix( df_path          = df_path                                                    ,
+                                                            arr_nTradingDays = obj_table.get_Column('nTradingDaysIntermediate')[arr_rows] )
+
+        return calculate_Payoffs_ODF( arr_underlying_Intermediate = arr_underlying_Intermediate ,
+                                      arr_underlying_RHP          = arr_underlying              ,
+                                      arr_strike                  = arr_strike                  ,
+                                      arr_amount                  = arr_amount                  ,
+                                      arr_isShort                 = arr_isShort                 ,
+                                      arr_isSET_FOR               = arr_isSET_FOR               ,
+                                      arr_ForwardAccrualFactor    = arr_ForwardAccrualFactor    )
+
+    return None
+
+###############################################################################
+#        PAYOFFS OF THE WHOLE PRODUCT BOOK                                    #
+###############################################################################
+def update_Payoffs_ProductBook( obj_ProductBook ,
+                                dict_paths_FMU  ,
+                                dict_paths_S    ):
+    """
+    Evaluate the Favourable/Moderate/Unfavourable and Stressed payoffs of
+    the book with one batched pass per (product type, underlyer) and set
+    them on the products (update_payoff_FMU / update_payoff_S).
+
+    Products that are not covered (type/position/settlement currency not
+    supported, no paths for the underlyer, ...) are left untouched and
+    keep going through calculate_payoff.
+
+    Return value: set with the products whose payoffs were set
+    """
+    set_productsEvaluated = set()
+
+    for product_type in obj_ProductBook.get_ProductTypes():
+        if product_type not in dict_PayoffColumns:
+            continue
+
+        obj_table = obj_ProductBook.get_Table(product_type)
+
+        #-------------------------------------------------------------------------#
+        #         rows per underlyer                                              #
+        #-------------------------------------------------------------------------#
+        dict_rowsByUnderlyer = dict()
+        for i_row, product in enumerate(obj_table.list_products):
+            if product.flag_error_encountered == True:
+                continue
+
+            list_requiredUnderlyers = product.get_requiredUnderlyers()
+            if len(list_requiredUnderlyers) != 1:
+                continue
+
+            underlyer = list_requiredUnderlyers[0]
+            if underlyer not in dict_paths_FMU or underlyer not in dict_paths_S:
+                continue
+
+            dict_rowsByUnderlyer.setdefault(underlyer, []).append(i_row)
+
+        #-------------------------------------------------------------------------#
+        #         one payoff block per underlyer                                  #
+        #-------------------------------------------------------------------------#
+        for underlyer, list_rows in dict_rowsByUnderlyer.items():
+            arr_rows = np.array(list_rows)
+            arr_rows = arr_rows[get_SupportedRows(obj_table, arr_rows)]
+
+            if arr_rows.size == 0:
+                continue
+
+            arr_payoffs_FMU = calculate_Payoffs_ProductTable( obj_table = obj_table                 ,
+                                                              arr_rows  = arr_rows                  ,
+                                                              df_path   = dict_paths_FMU[underlyer] )
+            arr_payoffs_S   = calculate_Payoffs_ProductTable( obj_table = obj_table                 ,
+                                                              arr_rows  = arr_rows                  ,
+                                                              df_path   = dict_paths_S[underlyer]   )
+
+            for i_block, i_row in enumerate(arr_rows):
+                product = obj_table.list_products[i_row]
+
+                product.update_payoff_FMU(arr_payoffs_FMU[i_block])
+                product.update_payoff_S(arr_payoffs_S[i_block])
+
+                set_productsEvaluated.add(product)
+
+    return set_productsEvaluated
@@ -2,6 +2,8 @@ import numpy as np
 import pandas as pd
 from scipy import interpolate
 
+from .VolSurface import class_VolSurface
+
 ###############################################################################
 #        INTERPOLATE IN ONE DIMENSION                                         #
 ###############################################################################
@@ -82,6 +84,65 @@ def get_SpotRate(df_CurrentMarketData_Exchange, \
         return spot_rate
 
 
+###############################################################################
+#        YIELD CURVE REGISTRY                                                 #
+###############################################################################
+class class_YieldCurveRegistry:
+    """
+    Yield curves of df_CurrentMarketData_Yield, grouped once by curvename
+    into tenor-sorted numpy arrays, so that a lookup does not filter the
+    whole frame again.
+
+    Interpolation is linear between tenor points, tenors outside the curve
+    raise a ValueError (same as interpolate_1D).
+    """
+    def __init__(self, df_CurrentMarketData_Yield):
+
+        # curvename --> (arr_tenor, arr_yield), sorted by tenor
+        self.dict_curves = dict()
+
+        if df_CurrentMarketData_Yield is None or df_CurrentMarketData_Yield.empty:
+            return
+
+        arr_curvename = df_CurrentMarketData_Yield['curvename'].values
+        arr_tenor     = df_CurrentMarketData_Yield['tenor'].values.astype(np.float64)
+        arr_yield     = df_CurrentMarketData_Yield['yield'].values.astype(np.float64)
+
+        # one stable sort by (curvename, tenor) instead of one mask per curve
+        arr_order     = np.lexsort((arr_tenor, arr_curvename))
+        arr_curvename = arr_curvename[arr_order]
+        arr_tenor     = arr_tenor[arr_order]
+        arr_yield     = arr_yield[arr_order]
+
+        arr_start = np.flatnonzero(np.r_[True, arr_curvename[1:] != arr_curvename[:-1]])
+        arr_end   = np.r_[arr_start[1:], arr_curvename.size]
+
+        for i_start, i_end in zip(arr_start, arr_end):
+            self.dict_curves[arr_curvename[i_start]] = (arr_tenor[i_start:i_end], arr_yield[i_start:i_end])
+
+    def has_Curve(self, curvename):
+        return curvename in self.dict_curves
+
+    def interpolate(self, curvename, tenor_in_days):
+        """
+        Return value: yield of curvename at tenor_in_days, scalar for a scalar
+                      tenor, numpy array for an array of tenors
+        """
+        if curvename not in self.dict_curves:
+            raise KeyError('Yield curve not found: ' + str(curvename))
+
+        arr_tenor, arr_yield = self.dict_curves[curvename]
+
+        arr_tenor_interpolate = np.asarray(tenor_in_days, dtype=np.float64)
+        if np.any(arr_tenor_interpolate < arr_tenor[0]) or np.any(arr_tenor_interpolate > arr_tenor[-1]):
+            raise ValueError('Tenor outside of yield curve ' + str(curvename) + ': ' + str(tenor_in_days))
+
+        yield_interpolated = np.interp(arr_tenor_interpolate, arr_tenor, arr_yield)
+
+        if yield_interpolated.ndim == 0:
+            return float(yield_interpolated)
+        return yield_interpolated
+
 ###############################################################################
 #        EXTRACT YIELD                                                        #
 ###############################################################################
@@ -92,7 +153,14 @@ def get_Yield( df_CurrentMarketData_Yield , \
                ccy_name                   ):
     """
     interpolation between tenor points is done linearly
+
+    df_CurrentMarketData_Yield can also be a class_YieldCurveRegistry
+    (no filtering of the frame per call)
     """
+    if isinstance(df_CurrentMarketData_Yield, class_YieldCurveRegistry):
+        return df_CurrentMarketData_Yield.interpolate( curvename     = dict_YieldCcy_CurveName[ccy_pair][ccy_name] ,
+                                                       tenor_in_days = tenor_in_days                               )
+
     # pick currency pair
     df_yieldcurve = df_CurrentMarketData_Yield[ df_CurrentMarketData_Yield['curvename']  == \
                                                 dict_YieldCcy_CurveName[ccy_pair][ccy_name] ]
@@ -126,7 +194,15 @@ def get_FXATMVol( df_CurrentMarketData_FXATMVol , \
                   ccy_name_counter              ):
     """
     interpolate between tenors using cubic splines
-    """    
+
+    df_CurrentMarketData_FXATMVol can also be a class_VolSurface
+    (prebuilt splines, no filtering of the frame per call)
+    """
+    if isinstance(df_CurrentMarketData_FXATMVol, class_VolSurface):
+        return df_CurrentMarketData_FXATMVol.get_ATMVol( curvename     = dict_FXATMVol_CurveName[ccy_name] ,
+                                                         ccy_counter   = ccy_name_counter                  ,
+                                                         tenor_in_days = tenor_in_days                     )
+
     # pick currency pair
     df_FXATMcurve = df_CurrentMarketData_FXATMVol[ (df_CurrentMarketData_FXATMVol['curvename']   == \
                                                     dict_FXATMVol_CurveName[ccy_name]) &            \
@@ -152,8 +228,17 @@ def get_FX_MS_Vol( df_CurrentMarketData_FXDeltaVol , \
                    DeltaValue                       ):
     """
     interpolate between tenors using cubic splines
+
+    df_CurrentMarketData_FXDeltaVol can also be a class_VolSurface
+    (prebuilt splines, no filtering of the frame per call)
     """
-    
+    if isinstance(df_CurrentMarketData_FXDeltaVol, class_VolSurface):
+        return df_CurrentMarketData_FXDeltaVol.get_DeltaVol( curvename     = dict_FXDeltaVol_CurveName[ccy_name] ,
+                                                             ccy_counter   = ccy_name_counter                    ,
+                                                             optionType    = 'MS'                                ,
+                                                             DeltaValue    = DeltaValue                          ,
+                                                             tenor_in_days = tenor_in_days                       )
+
     # pick currency pair and Delta value
     df_FXDeltacurve = df_CurrentMarketData_FXDeltaVol[ (df_CurrentMarketData_FXDeltaVol['curvename']   == \
                                                         dict_FXDeltaVol_CurveName[ccy_name])            & \
@@ -182,8 +267,17 @@ def get_FX_RR_Vol( df_CurrentMarketData_FXDeltaVol , \
                    DeltaValue                       ):
     """
     interpolate between tenors using cubic splines
+
+    df_CurrentMarketData_FXDeltaVol can also be a class_VolSurface
+    (prebuilt splines, no filtering of the frame per call)
     """
-    
+    if isinstance(df_CurrentMarketData_FXDeltaVol, class_VolSurface):
+        return df_CurrentMarketData_FXDeltaVol.get_DeltaVol( curvename     = dict_FXDeltaVol_CurveName[ccy_name] ,
+                                                             ccy_counter   = ccy_name_counter                    ,
+                                                             optionType    = 'RR'                                ,
+                                                             DeltaValue    = DeltaValue                          ,
+                                                             tenor_in_days = tenor_in_days                       )
+
     # pick currency pair and Delta value
     df_FXDeltacurve = df_CurrentMarketData_FXDeltaVol[ (df_CurrentMarketData_FXDeltaVol['curvename']   == \
                                                         dict_FXDeltaVol_CurveName[ccy_name])            & \
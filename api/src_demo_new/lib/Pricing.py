@@ -1,6 +1,10 @@
 import numpy as np
 import scipy.stats as ss
+from scipy.special import ndtr, ndtri
 
+###############################################################################
+#        GARMAN-KOHLHAGEN: ONE OPTION                                         #
+###############################################################################
 def value_FX_Option_GarmanKohlhagen( spot, 
                                      strike, 
                                      volatility, 
@@ -12,7 +16,7 @@ def value_FX_Option_GarmanKohlhagen( spot,
                                      ccy_SET,
                                      optionType,
                                      CallAmount):
-                                     
+
         d1 =  (np.log(spot/strike) + (yield_DOM - yield_FOR + volatility**2 / 2) * T) / \
               (volatility * np.sqrt(T))
         d2 =  d1 - volatility*np.sqrt(T)
@@ -69,7 +73,85 @@ def value_FX_Option_GarmanKohlhagen( spot,
         else:
             print('[ERROR]. Unknown option type. Must be Call or Put, but received: ' + optionType )
             return None
- 
+
+###############################################################################
+#        GARMAN-KOHLHAGEN: ARRAY OF OPTIONS                                   #
+###############################################################################
+def value_FX_Option_GarmanKohlhagen_Array( spot              ,
+                                           strike            ,
+                                           volatility        ,
+                                           yield_FOR         ,
+                                           yield_DOM         ,
+                                           T                 ,
+                                           arr_isCall        ,
+                                           arr_isSET_FOR     ,
+                                           CallAmount        ,
+                                           flag_greeks = False ):
+    """
+    Garman-Kohlhagen values of many options in one call. All inputs are
+    scalars or arrays of the same shape (broadcast):
+
+      arr_isCall    ... True for Call, False for Put
+      arr_isSET_FOR ... True if settled in FOR (value * CallAmount / spot),
+                        False if settled in DOM (value * CallAmount)
+
+    The values agree with value_FX_Option_GarmanKohlhagen up to rounding,
+    not bit for bit (volatility**2 of a python float goes through pow, of
+    an array through a multiplication).
+
+    Return value: arr_value, or (arr_value, dict_greeks) with flag_greeks.
+                  The greeks (delta, gamma, vega, rho_DOM, rho_FOR, theta) are
+                  per unit of FOR currency, in DOM currency (before the
+                  CallAmount / settlement currency scaling).
+    """
+    spot       = np.asarray(spot      , dtype=np.float64)
+    strike     = np.asarray(strike    , dtype=np.float64)
+    volatility = np.asarray(volatility, dtype=np.float64)
+    yield_FOR  = np.asarray(yield_FOR , dtype=np.float64)
+    yield_DOM  = np.asarray(yield_DOM , dtype=np.float64)
+    T          = np.asarray(T         , dtype=np.float64)
+    arr_isCall = np.asarray(arr_isCall, dtype=bool)
+
+    sqrt_T = np.sqrt(T)
+
+    d1 =  (np.log(spot/strike) + (yield_DOM - yield_FOR + volatility**2 / 2) * T) / \
+          (volatility * sqrt_T)
+    d2 =  d1 - volatility*sqrt_T
+
+    df_FOR = np.exp(-yield_FOR*T)
+    df_DOM = np.exp(-yield_DOM*T)
+
+    # option value for one unit of FOR currency
+    arr_value = np.where( arr_isCall,
+                          spot * df_FOR * ndtr(d1) - strike * df_DOM * ndtr(d2),
+                          strike * df_DOM * ndtr(-d2) - spot * df_FOR * ndtr(-d1) )
+
+    # EURUSD, EURGBP, ... (FOR) / XAUUSD (DOM)
+    arr_value = np.where( arr_isSET_FOR,
+                          arr_value * CallAmount / spot,
+                          arr_value * CallAmount       )
+
+    if flag_greeks == False:
+        return arr_value
+
+    #-------------------------------------------------------------------------#
+    #          greeks                                                         #
+    #-------------------------------------------------------------------------#
+    pdf_d1 = np.exp(-0.5 * d1**2) / np.sqrt(2.0 * np.pi)
+    phi    = np.where(arr_isCall, 1.0, -1.0)
+
+    dict_greeks = dict()
+    dict_greeks['delta']   = phi * df_FOR * ndtr(phi * d1)
+    dict_greeks['gamma']   = df_FOR * pdf_d1 / (spot * volatility * sqrt_T)
+    dict_greeks['vega']    = spot * df_FOR * pdf_d1 * sqrt_T
+    dict_greeks['rho_DOM'] =  phi * strike * T * df_DOM * ndtr(phi * d2)
+    dict_greeks['rho_FOR'] = -phi * spot   * T * df_FOR * ndtr(phi * d1)
+    dict_greeks['theta']   = - spot * df_FOR * pdf_d1 * volatility / (2.0 * sqrt_T) \
+                             + phi * yield_FOR * spot   * df_FOR * ndtr(phi * d1)   \
+                             - phi * yield_DOM * strike * df_DOM * ndtr(phi * d2)
+
+    return arr_value, dict_greeks
+
 ############################################################################### 
 #        Calculate Strike & Vol of ItM / OtM Options                          #
 ###############################################################################  
@@ -181,4 +263,60 @@ class class_FX_Vol_Malz:
             else:
                 StrikeForDelta = self.MalzGetStrikeForForwardDelta(Spot, Vol, T, Rd, Rf, delta)
 
-        return StrikeForDelta
\ No newline at end of file
+        return StrikeForDelta
+
+###############################################################################
+#        Malz Volatility / Strike for arrays of deltas and tenors             #
+###############################################################################
+# DeltaFlag values the strike calculation knows
+list_DeltaFlags = ['SPOT', 'FORWARD', 'SPOT-719-FORWARD']
+
+def MalzGetVol_Array(RR_25, MS_25, VolAtm, delta):
+    """
+    class_FX_Vol_Malz.MalzGetVol for arrays (broadcast), e.g. a full smile:
+        MalzGetVol_Array(RR_25, MS_25, VolAtm, delta = np.arange(5, 100, 5))
+    """
+    beta0 =  1
+    beta1 = -2
+    beta2 = 16
+
+    delta = np.asarray(delta, dtype=np.float64)
+
+    Vol = beta0 * VolAtm + beta1 * RR_25 * (delta / 100 - 0.5) + beta2 * MS_25 * ((delta / 100 - 0.5) ** 2)
+    return Vol
+
+def MalzGetStrikeForDelta_Array(DeltaFlag, Spot, Vol, T, Rd, Rf, delta, TDays):
+    """
+    class_FX_Vol_Malz.MalzGetStrikeForDelta for arrays (broadcast).
+    DeltaFlag can be one string or an array of strings:
+      SPOT             ... spot delta
+      FORWARD          ... forward delta
+      SPOT-719-FORWARD ... spot delta up to 719 days (TDays), forward delta after
+
+    Return value: strikes, NaN where the DeltaFlag is not known
+    """
+    DeltaFlag = np.asarray(DeltaFlag)
+    Spot      = np.asarray(Spot , dtype=np.float64)
+    Vol       = np.asarray(Vol  , dtype=np.float64)
+    T         = np.asarray(T    , dtype=np.float64)
+    Rd        = np.asarray(Rd   , dtype=np.float64)
+    Rf        = np.asarray(Rf   , dtype=np.float64)
+    delta     = np.asarray(delta, dtype=np.float64)
+    TDays     = np.asarray(TDays)
+
+    arr_isSpotDelta  = (DeltaFlag == 'SPOT')    | ((DeltaFlag == 'SPOT-719-FORWARD') & (TDays <= 719))
+    arr_isKnownFlag  = np.isin(DeltaFlag, list_DeltaFlags)
+
+    # Call for delta < 50, Put otherwise
+    arr_isCall = delta < 50
+    phi        = np.where(arr_isCall, 1.0, -1.0)
+    v_delta    = np.where(arr_isCall, delta, -(100 - delta))
+
+    # spot delta: premium of the FOR leg is discounted
+    alpha = ndtri(phi * v_delta / 100 * np.where(arr_isSpotDelta, np.exp(Rf * T), 1.0))
+
+    Strike = np.where( delta == 50,
+                       Spot * np.exp((Rd - Rf) * T) * np.exp(0.5 * Vol * Vol * T),
+                       Spot * np.exp((Rd - Rf) * T) * np.exp(-phi * alpha * Vol * (T ** 0.5) + (0.5 * Vol * Vol * T)) )
+
+    return np.where(arr_isKnownFlag, Strike, np.nan)
@@ -0,0 +1,246 @@
+import numpy as np
+
+###############################################################################
+#        PRODUCT AS A VIEW OVER A ROW OF THE PRODUCT BOOK                     #
+###############################################################################
+class class_ProductRowView:
+    """
+    Base class of the class_FX_* products. As long as a product is not part
+    of a class_ProductBook it behaves like a plain object. Once it is
+    attached, its scalar attributes live in the typed columns of the book
+    and are read/written through this view (product.strike, product.T_RHP,
+    ... work as before).
+    """
+    # internal attributes, not part of the product (hidden from dir())
+    list_RowViewAttributes = ['_obj_ProductTable', '_i_row']
+
+    def __getattr__(self, name):
+        # only called if name is not a normal attribute
+        dict_instance = self.__dict__
+        obj_table     = dict_instance.get('_obj_ProductTable')
+
+        if obj_table is not None and name in obj_table.dict_columns:
+            return obj_table.get_Value(name, dict_instance['_i_row'])
+
+        raise AttributeError("'" + type(self).__name__ + "' object has no attribute '" + name + "'")
+
+    def __setattr__(self, name, value):
+        obj_table = self.__dict__.get('_obj_ProductTable')
+
+        if obj_table is not None and name in obj_table.dict_columns:
+            obj_table.set_Value(name, self.__dict__['_i_row'], value)
+        else:
+            object.__setattr__(self, name, value)
+
+    def __dir__(self):
+        # the class-level lists (list_RowViewAttributes, list_MarketAttributes)
+        # are bookkeeping, not attributes of the product (see LogInformation.py)
+        list_names = [ name for name in object.__dir__(self) \
+                       if name not in class_ProductRowView.list_RowViewAttributes and \
+                          not self.is_ClassList(name)                               ]
+
+        obj_table = self.__dict__.get('_obj_ProductTable')
+        if obj_table is not None:
+            list_names = list_names + list(obj_table.dict_columns.keys())
+
+        return sorted(set(list_names))
+
+    def is_ClassList(self, name):
+        if name in self.__dict__:
+            return False
+
+        for cls in type(self).__mro__:
+            if name in cls.__dict__:
+                return isinstance(cls.__dict__[name], list)
+
+        return False
+
+    def attach_ProductTable(self, obj_table, i_row):
+        object.__setattr__(self, '_obj_ProductTable', obj_table)
+        object.__setattr__(self, '_i_row'           , i_row    )
+
+###############################################################################
+#        TYPED COLUMNS OF ONE PRODUCT TYPE                                    #
+###############################################################################
+def get_ColumnKind(value):
+    """
+    Return value: 'None', 'bool', 'int', 'float', 'str', or None if the value
+                  cannot be stored in a column (arrays, lists, ...)
+    """
+    if value is None:
+        return 'None'
+    if isinstance(value, (bool, np.bool_)):
+        return 'bool'
+    if isinstance(value, (int, np.integer)):
+        return 'int'
+    if isinstance(value, (float, np.floating)):
+        return 'float'
+    if isinstance(value, str):
+        return 'str'
+    return None
+
+def is_ColumnCompatible(arr_column, value):
+    kind = get_ColumnKind(value)
+
+    if arr_column.dtype == object:
+        return True
+    if arr_column.dtype == np.bool_:
+        return kind == 'bool'
+    if np.issubdtype(arr_column.dtype, np.integer):
+        return kind == 'int'
+    if np.issubdtype(arr_column.dtype, np.floating):
+        return kind in ['int', 'float']
+    return False
+
+class class_ProductTable:
+    """
+    Scalar attributes of all products of one product type, one numpy column
+    per attribute:
+      bool          --> bool
+      int           --> int64
+      int / float   --> float64
+      str / mixed   --> object
+    None is kept in a separate mask per column (arr_isNone), and so are the
+    ints of an int / float column (arr_isInt), so the products read back
+    exactly what was stored.
+    """
+    def __init__(self, product_type, list_products):
+
+        self.product_type  = product_type
+        self.list_products = list_products
+        self.arr_productID = np.array([ product.product_id for product in list_products ])
+
+        self.dict_columns  = dict()
+        self.dict_isNone   = dict()
+        self.dict_isInt    = dict()
+
+        # attributes all products of the type have
+        set_names = set.intersection(*[ set(product.__dict__.keys()) for product in list_products ])
+        set_names = set_names - set(class_ProductRowView.list_RowViewAttributes)
+
+        for name in sorted(set_names):
+            list_values = [ product.__dict__[name] for product in list_products ]
+            set_kinds   = set( get_ColumnKind(value) for value in list_values )
+
+            # not a scalar attribute: stays on the product
+            if None in set_kinds:
+                continue
+
+            set_kinds.discard('None')
+
+            if   set_kinds == {'bool'}:
+                dtype = np.bool_
+            elif set_kinds == {'int'}:
+                dtype = np.int64
+            elif set_kinds <= {'int', 'float'}:
+                dtype = np.float64
+            else:
+                dtype = object
+
+            arr_isNone = np.array([ value is None for value in list_values ], dtype=bool)
+            arr_column = np.empty(len(list_values), dtype=dtype)
+
+            for i_row, value in enumerate(list_values):
+                if value is not None:
+                    arr_column[i_row] = value
+                elif dtype == np.float64:
+                    arr_column[i_row] = np.nan
+
+            self.dict_columns[name] = arr_column
+            self.dict_isNone[name]  = arr_isNone
+
+            if dtype == np.float64:
+                self.dict_isInt[name] = np.array([ get_ColumnKind(value) == 'int' for value in list_values ], dtype=bool)
+
+        # the values now live in the columns
+        for i_row, product in enumerate(list_products):
+            for name in self.dict_columns:
+                del product.__dict__[name]
+            product.attach_ProductTable(self, i_row)
+
+    ###########################################################################
+    #              ONE VALUE (row views)                                      #
+    ###########################################################################
+    def get_Value(self, name, i_row):
+        if self.dict_isNone[name][i_row]:
+            return None
+
+        value = self.dict_columns[name][i_row]
+
+        if name in self.dict_isInt and self.dict_isInt[name][i_row]:
+            return int(value)
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
+
+    def set_Value(self, name, i_row, value):
+        if value is None:
+            self.dict_isNone[name][i_row] = True
+            return
+
+        if not is_ColumnCompatible(self.dict_columns[name], value):
+            arr_column = self.dict_columns[name].astype(object)
+
+            # the ints of an int / float column are ints again
+            if name in self.dict_isInt:
+                for i in np.flatnonzero(self.dict_isInt.pop(name)):
+                    arr_column[i] = int(arr_column[i])
+
+            self.dict_columns[name] = arr_column
+
+        self.dict_columns[name][i_row] = value
+        self.dict_isNone[name][i_row]  = False
+
+        if name in self.dict_isInt:
+            self.dict_isInt[name][i_row] = get_ColumnKind(value) == 'int'
+
+    ###########################################################################
+    #              WHOLE COLUMNS                                              #
+    ###########################################################################
+    def get_Column(self, name):
+        """
+        Return value: the column (float columns: NaN where the value is None)
+        """
+        return self.dict_columns[name]
+
+###############################################################################
+#        PRODUCT BOOK                                                         #
+###############################################################################
+class class_ProductBook:
+    """
+    All products of a run without preProcessing error, stored per product
+    type as typed columns (class_ProductTable). The class_FX_* objects stay in list_products and
+    become views over their row, so code working on single products does
+    not change; code working on the whole book reads/writes the columns.
+    """
+    def __init__(self, list_products):
+
+        self.list_products = list_products
+
+        # product_type --> class_ProductTable
+        self.dict_tables = dict()
+
+        # products with an error keep their attributes (some were never set)
+        dict_productsByType = dict()
+        for product in list_products:
+            if product.flag_error_encountered == True:
+                continue
+            dict_productsByType.setdefault(product.product_type, []).append(product)
+
+        for product_type, list_productsOfType in dict_productsByType.items():
+            self.dict_tables[product_type] = class_ProductTable( product_type  = product_type        ,
+                                                                 list_products = list_productsOfType )
+
+    def get_ProductTypes(self):
+        return list(self.dict_tables.keys())
+
+    def get_Table(self, product_type):
+        return self.dict_tables[product_type]
+
+    def get_Column(self, product_type, name):
+        return self.dict_tables[product_type].get_Column(name)
+
+    def get_Statistics(self):
+        return { product_type : { "products" : len(obj_table.list_products) ,
+                                  "columns"  : len(obj_table.dict_columns)  } \
+                 for product_type, obj_table in self.dict_tables.items() }
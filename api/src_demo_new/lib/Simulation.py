@@ -0,0 +1,272 @@
+import numpy as np
+import multiprocessing.util
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from multiprocessing import shared_memory
+except ImportError: # python < 3.8: the matrix is copied into every worker
+    shared_memory = None
+
+from .Bootstrap import select_RandomIndices                  , \
+                       calculate_ItoTerm                     , \
+                       calculate_ShiftTerm                   , \
+                       calculate_PRIIPsPaths_Matrix          , \
+                       calculate_PRIIPsPaths_ObservationDays , \
+                       calculate_stressed_vol
+
+###############################################################################
+#        RANDOM INDICES OF A POOL WORKER                                      #
+###############################################################################
+# set by init_SimulationWorker in the worker processes only:
+# n_logReturns --> int32 index matrix (nSims x nDays), a view on the shared
+# memory of the parent process
+dict_IndexMatrix_worker  = None
+list_SharedMemory_worker = []
+
+def init_SimulationWorker(dict_SharedIndexMatrices):
+    """
+    Initializer of the worker processes: attach to the index matrices the
+    parent process converted (one per n_logReturns), or take the copies that
+    were passed if shared memory is not available.
+
+      dict_SharedIndexMatrices ... n_logReturns --> (shm_name, shape, dtype)
+                                   or n_logReturns --> matrix
+    """
+    global dict_IndexMatrix_worker
+
+    dict_IndexMatrix_worker = dict()
+
+    for n_logReturns, item in dict_SharedIndexMatrices.items():
+        if isinstance(item, np.ndarray):
+            dict_IndexMatrix_worker[n_logReturns] = item
+            continue
+
+        shm_name, shape, dtype = item
+
+        # keep a reference, the buffer is only valid while the block is open
+        obj_SharedMemory = shared_memory.SharedMemory(name=shm_name)
+        list_SharedMemory_worker.append(obj_SharedMemory)
+
+        dict_IndexMatrix_worker[n_logReturns] = np.ndarray(shape, dtype=dtype, buffer=obj_SharedMemory.buf)
+
+    # pool workers leave via os._exit (no atexit): multiprocessing finalizer
+    multiprocessing.util.Finalize(None, close_SimulationWorker, exitpriority=10)
+
+def close_SimulationWorker():
+    """
+    Drop the views and close the shared memory handles of the worker
+    (the parent unlinks the blocks).
+    """
+    global dict_IndexMatrix_worker
+
+    dict_IndexMatrix_worker = None
+
+    while len(list_SharedMemory_worker) != 0:
+        list_SharedMemory_worker.pop().close()
+
+###############################################################################
+#        SIMULATE PRIIPs PATHS OF ONE FX PAIR                                 #
+###############################################################################
+def simulate_PRIIPsPaths_FXpair( FX_rate                  ,
+                                 spot_rate                ,
+                                 arr_logReturns           ,
+                                 nTradingDaysRHP_max      ,
+                                 list_observationDays     ,
+                                 dict_settings            ,
+                                 obj_RandomIndices = None ,
+                                 std               = None ,
+                                 stressed_vol      = None ,
+                                 mean_rescaled     = None ):
+    """
+    Simulate the Favourable/Moderate/Unfavourable and the Stressed PRIIPs
+    paths of one FX pair. Runs in the parent process or in a pool worker.
+
+    With dict_settings['readRandomIndices'] the indices come from
+    obj_RandomIndices (parent process) or from the index matrices the
+    worker was initialized with (pool worker, obj_RandomIndices None).
+
+    std, stressed_vol and mean_rescaled of the log returns are computed here
+    unless they are passed (see LogReturnCache.py).
+
+    Return value: tuple (FX_rate, arr_rowIndex, arr_paths_FMU, arr_paths_S),
+                  arr_rowIndex = trading day - 1 of each row of the paths,
+                  None if the FX pair could not be simulated
+    """
+    #-------------------------------------------------------------------------#
+    #    Random indices (nSims x nDays)                                       #
+    #-------------------------------------------------------------------------#
+    if dict_settings['readRandomIndices'] == True:
+        # converted once per number of log returns for the whole file,
+        # shared by all scenarios
+        if obj_RandomIndices is not None:
+            arr_randomIndices = obj_RandomIndices.get_IndexMatrix( n_logReturns  = arr_logReturns.size                 ,
+                                                                   n_simulations = dict_settings['nPRIIPsSimulations'] )
+        else:
+            # converted by the parent process (errors were reported there)
+            arr_randomIndices = dict_IndexMatrix_worker.get(arr_logReturns.size)
+
+        if arr_randomIndices is None:
+            print('   Continue to next underlyer (' + FX_rate + ')')
+            return None
+
+        nTradingDaysRHP_max = arr_randomIndices.shape[1]
+
+        arr_randomIndices_S = arr_randomIndices
+    else:
+        # one independent stream per (randomSeed, FX_rate, scenario)
+        arr_randomIndices   = select_RandomIndices( n_indices     = nTradingDaysRHP_max                 ,
+                                                    n_LogReturns  = arr_logReturns.size                 ,
+                                                    n_simulations = dict_settings['nPRIIPsSimulations'] ,
+                                                    randomSeed    = dict_settings['randomSeed']         ,
+                                                    FX_rate       = FX_rate                             ,
+                                                    scenario      = 'FMU'                               )
+
+        arr_randomIndices_S = select_RandomIndices( n_indices     = nTradingDaysRHP_max                 ,
+                                                    n_LogReturns  = arr_logReturns.size                 ,
+                                                    n_simulations = dict_settings['nPRIIPsSimulations'] ,
+                                                    randomSeed    = dict_settings['randomSeed']         ,
+                                                    FX_rate       = FX_rate                             ,
+                                                    scenario      = 'S'                                 )
+
+    #-------------------------------------------------------------------------#
+    #    PRIIPs sampling - Favourable/Moderate/Unfavourable                   #
+    #-------------------------------------------------------------------------#
+    # calculate Ito term
+    if std is None:
+        std = np.std(arr_logReturns)
+
+    arr_ItoTerm = calculate_ItoTerm( arr_logReturns = arr_logReturns     ,
+                                     n              = nTradingDaysRHP_max,
+                                     std            = std                )
+
+    # calculate paths
+    if dict_settings['PRIIPsPathMode'] == 'observationDays':
+        arr_observationDays, \
+        arr_paths_FMU = calculate_PRIIPsPaths_ObservationDays( arr_randomIndices    = arr_randomIndices    ,
+                                                               arr_logReturns       = arr_logReturns       ,
+                                                               arr_driftTerm        = arr_ItoTerm          ,
+                                                               spot_rate            = spot_rate            ,
+                                                               list_observationDays = list_observationDays )
+
+        # row label = trading day - 1 (same as the row position in the full paths)
+        arr_rowIndex = arr_observationDays-1
+    else:
+        arr_paths_FMU = calculate_PRIIPsPaths_Matrix( arr_randomIndices = arr_randomIndices ,
+                                                      arr_logReturns    = arr_logReturns    ,
+                                                      arr_driftTerm     = arr_ItoTerm       ,
+                                                      spot_rate         = spot_rate         )
+
+        arr_rowIndex = np.arange(arr_paths_FMU.shape[0])
+
+    #-------------------------------------------------------------------------#
+    #    PRIIPs sampling - Stressed                                           #
+    #-------------------------------------------------------------------------#
+    #TODO only <= 1Y products in scope, if onboarding of more products: UPDATE!
+    if stressed_vol is None:
+        stressed_vol = calculate_stressed_vol( arr_returns   = arr_logReturns, \
+                                               window_length = 21              )
+    if stressed_vol == None:
+        print('   Continue to next underlyer (' + FX_rate + ')')
+        return None
+
+    # calculate rescaled returns
+    arr_logReturnsRescaled = arr_logReturns * (stressed_vol / std)
+
+    # calculate shift
+    arr_shiftTerm = calculate_ShiftTerm( arr_logReturnsRescaled = arr_logReturnsRescaled,
+                                         stressed_vol           = stressed_vol,
+                                         n                      = nTradingDaysRHP_max,
+                                         mean_rescaled          = mean_rescaled)
+
+    # calculate stressed paths
+    if dict_settings['PRIIPsPathMode'] == 'observationDays':
+        arr_observationDays, \
+        arr_paths_S = calculate_PRIIPsPaths_ObservationDays( arr_randomIndices    = arr_randomIndices_S    ,
+                                                             arr_logReturns       = arr_logReturnsRescaled ,
+                                                             arr_driftTerm        = arr_shiftTerm          ,
+                                                             spot_rate            = spot_rate              ,
+                                                             list_observationDays = list_observationDays   )
+    else:
+        arr_paths_S = calculate_PRIIPsPaths_Matrix( arr_randomIndices = arr_randomIndices_S    ,
+                                                    arr_logReturns    = arr_logReturnsRescaled ,
+                                                    arr_driftTerm     = arr_shiftTerm          ,
+                                                    spot_rate         = spot_rate              )
+
+    # [DEBUG] print('Memory: ' , arr_paths_FMU.nbytes/1e6 , ' MB')
+
+    return (FX_rate, arr_rowIndex, arr_paths_FMU, arr_paths_S)
+
+###############################################################################
+#        SIMULATE PRIIPs PATHS OF ALL FX PAIRS                                #
+###############################################################################
+def simulate_PRIIPsPaths( list_tasks        ,
+                          obj_RandomIndices ,
+                          dict_settings     ):
+    """
+    Simulate the PRIIPs paths of all FX pairs.
+
+    list_tasks holds one dict per FX pair with the keyword arguments of
+    simulate_PRIIPsPaths_FXpair (except dict_settings). With
+    dict_settings['nSimulationWorkers'] > 1 the FX pairs are distributed over
+    a process pool; the index matrices (if read from file) are converted once
+    per number of log returns and put into shared memory instead of being
+    sent with every FX pair.
+
+    Return value: list of the results of simulate_PRIIPsPaths_FXpair (same
+                  order as list_tasks, None for FX pairs that failed)
+    """
+    nWorkers = min(dict_settings['nSimulationWorkers'], len(list_tasks))
+
+    #-------------------------------------------------------------------------#
+    #    Sequential                                                           #
+    #-------------------------------------------------------------------------#
+    if nWorkers <= 1:
+        # obj_RandomIndices is passed (may be shared by concurrent requests)
+        return [ simulate_PRIIPsPaths_FXpair( dict_settings     = dict_settings     ,
+                                              obj_RandomIndices = obj_RandomIndices ,
+                                              **dict_task                           ) for dict_task in list_tasks ]
+
+    #-------------------------------------------------------------------------#
+    #    Process pool                                                         #
+    #-------------------------------------------------------------------------#
+    print('       (*) Distributing ' + str(len(list_tasks)) + ' FX pairs over ' + str(nWorkers) + ' processes')
+
+    # the index matrices are converted once here (one per n_logReturns) and
+    # put into shared memory, the workers only attach to them
+    list_SharedMemory        = []
+    dict_SharedIndexMatrices = dict()
+
+    try:
+        if dict_settings['readRandomIndices'] == True:
+            for n_logReturns in sorted(set( dict_task['arr_logReturns'].size for dict_task in list_tasks )):
+                arr_indices = obj_RandomIndices.get_IndexMatrix( n_logReturns  = n_logReturns                        ,
+                                                                 n_simulations = dict_settings['nPRIIPsSimulations'] )
+                if arr_indices is None:
+                    continue
+
+                if shared_memory is None:
+                    dict_SharedIndexMatrices[n_logReturns] = np.ascontiguousarray(arr_indices)
+                    continue
+
+                obj_SharedMemory = shared_memory.SharedMemory(create=True, size=max(arr_indices.nbytes, 1))
+                list_SharedMemory.append(obj_SharedMemory)
+
+                arr_shared    = np.ndarray(arr_indices.shape, dtype=arr_indices.dtype, buffer=obj_SharedMemory.buf)
+                arr_shared[:] = arr_indices
+
+                dict_SharedIndexMatrices[n_logReturns] = (obj_SharedMemory.name, arr_indices.shape, arr_indices.dtype.str)
+
+                del arr_shared
+
+        with ProcessPoolExecutor( max_workers = nWorkers                    ,
+                                  initializer = init_SimulationWorker       ,
+                                  initargs    = (dict_SharedIndexMatrices,) ) as executor:
+
+            list_futures = [ executor.submit(simulate_PRIIPsPaths_FXpair, dict_settings = dict_settings, **dict_task) \
+                             for dict_task in list_tasks ]
+
+            return [ future.result() for future in list_futures ]
+    finally:
+        for obj_SharedMemory in list_SharedMemory:
+            obj_SharedMemory.close()
+            obj_SharedMemory.unlink()
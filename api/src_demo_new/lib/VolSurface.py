@@ -0,0 +1,104 @@
+import numpy as np
+from scipy import interpolate
+
+###############################################################################
+#        FX VOLATILITY SURFACE                                                #
+###############################################################################
+class class_VolSurface:
+    """
+    ATM and Delta volatilities of one market snapshot
+    (df_CurrentMarketData_FXATMVol, df_CurrentMarketData_FXDeltaVol).
+
+    Both frames are grouped once into tenor curves:
+      ATM   ... (curvename, ccy_counter)
+      Delta ... (curvename, ccy_counter, optionType, DeltaValue)
+    and every curve gets one cubic spline over the tenor (fitted on first
+    use, then kept). Tenor queries can be scalars or arrays; tenors outside
+    the curve raise a ValueError (same as interpolate_1D).
+    """
+    def __init__(self, df_CurrentMarketData_FXATMVol, df_CurrentMarketData_FXDeltaVol):
+
+        # key --> (arr_tenor, arr_volatility)
+        self.dict_curves_ATM   = self.group_Curves( df_MarketData = df_CurrentMarketData_FXATMVol   ,
+                                                    list_keys     = ['curvename', 'ccy_counter']  )
+        self.dict_curves_Delta = self.group_Curves( df_MarketData = df_CurrentMarketData_FXDeltaVol ,
+                                                    list_keys     = ['curvename', 'ccy_counter', 'optionType', 'DeltaValue'] )
+
+        # (curvename, ccy_counter, optionType, DeltaValue) --> DeltaFlag
+        self.dict_DeltaFlag = dict()
+        if df_CurrentMarketData_FXDeltaVol is not None and not df_CurrentMarketData_FXDeltaVol.empty:
+            for key, arr_index in df_CurrentMarketData_FXDeltaVol.groupby(['curvename', 'ccy_counter', 'optionType', 'DeltaValue'],
+                                                                          sort=False).indices.items():
+                self.dict_DeltaFlag[key] = df_CurrentMarketData_FXDeltaVol['DeltaFlag'].values[arr_index[0]]
+
+        # key --> fitted spline
+        self.dict_splines_ATM   = dict()
+        self.dict_splines_Delta = dict()
+
+    @staticmethod
+    def group_Curves(df_MarketData, list_keys):
+        dict_curves = dict()
+
+        if df_MarketData is None or df_MarketData.empty:
+            return dict_curves
+
+        arr_tenor      = df_MarketData['tenor'].values
+        arr_volatility = df_MarketData['volatility'].values
+
+        for key, arr_index in df_MarketData.groupby(list_keys, sort=False).indices.items():
+            dict_curves[key] = (arr_tenor[arr_index], arr_volatility[arr_index])
+
+        return dict_curves
+
+    ###########################################################################
+    #              SPLINES                                                    #
+    ###########################################################################
+    @staticmethod
+    def get_Spline(dict_curves, dict_splines, key):
+        obj_spline = dict_splines.get(key)
+
+        if obj_spline is None:
+            if key not in dict_curves:
+                raise KeyError('Volatility curve not found: ' + str(key))
+
+            arr_tenor, arr_volatility = dict_curves[key]
+            obj_spline = interpolate.interp1d(arr_tenor, arr_volatility, kind='cubic')
+
+            dict_splines[key] = obj_spline
+
+        return obj_spline
+
+    @staticmethod
+    def evaluate(obj_spline, tenor_in_days):
+        vol_interpolated = obj_spline(tenor_in_days)
+
+        if np.ndim(vol_interpolated) == 0:
+            return vol_interpolated.item()
+        return vol_interpolated
+
+    ###########################################################################
+    #              QUERIES                                                    #
+    ###########################################################################
+    def get_ATMVol(self, curvename, ccy_counter, tenor_in_days):
+        """
+        Return value: ATM volatility, scalar for a scalar tenor, numpy array
+                      for an array of tenors
+        """
+        obj_spline = self.get_Spline( dict_curves  = self.dict_curves_ATM      ,
+                                      dict_splines = self.dict_splines_ATM     ,
+                                      key          = (curvename, ccy_counter)  )
+        return self.evaluate(obj_spline, tenor_in_days)
+
+    def get_DeltaVol(self, curvename, ccy_counter, optionType, DeltaValue, tenor_in_days):
+        """
+        optionType ... 'MS' (MarketStrangle) or 'RR' (RiskReversal)
+
+        Return value: (volatility, DeltaFlag), volatility is a scalar for a
+                      scalar tenor, numpy array for an array of tenors
+        """
+        key = (curvename, ccy_counter, optionType, DeltaValue)
+
+        obj_spline = self.get_Spline( dict_curves  = self.dict_curves_Delta  ,
+                                      dict_splines = self.dict_splines_Delta ,
+                                      key          = key                     )
+        return self.evaluate(obj_spline, tenor_in_days), self.dict_DeltaFlag[key]
@@ -0,0 +1,246 @@
+import threading
+import timeit
+
+from .Cache import class_LRUCache
+
+from .readData import readSettings             , \
+                      readMapping              , \
+                      readRandomIndexFile      , \
+                      readCurrentMarketData    , \
+                      readHistoricalMarketData
+
+from .DBConnection import configure_ConnectionPool
+
+from .LogReturnCache import invalidate_LogReturnCache
+
+from .PreProcessing import getStrDateIdentifier , \
+                           class_YieldCurveRegistry
+
+from .VolSurface import class_VolSurface
+
+###############################################################################
+#        SETTINGS FILE OF THE WORKFLOW                                        #
+###############################################################################
+settingsFilename_default = "Settings_20180625.json"
+
+###############################################################################
+#        PROCESS-LEVEL CACHE OF THE WORKFLOW INPUTS                           #
+###############################################################################
+# (tradeDate, settings file) --> dict_inputs, see load_WorkflowInputs
+# created on first use with the size/ttl of the SettingsFile
+cache_WorkflowInputs = None
+lock_WorkflowInputs  = threading.Lock()
+
+# (tradeDate, settings file) --> lock held while the inputs of the key are loaded
+dict_LoadLocks_WorkflowInputs = dict()
+
+def get_WorkflowInputsCache(dict_settings):
+    global cache_WorkflowInputs
+
+    with lock_WorkflowInputs:
+        if cache_WorkflowInputs is None:
+            cache_WorkflowInputs = class_LRUCache( maxsize = dict_settings["inputCacheSize"] ,
+                                                   ttl     = dict_settings["inputCacheTTL"]  )
+    return cache_WorkflowInputs
+
+###############################################################################
+#        LOAD THE WORKFLOW INPUTS                                             #
+###############################################################################
+def load_WorkflowInputs( dict_settings      ,
+                         str_dateIdentifier ,
+                         list_FX_rates      ,
+                         dict_timer = None  ):
+    """
+    Read everything the workflow needs besides the products:
+      current and historical market data, random indices and mappings.
+
+      list_FX_rates ... FX pairs whose historical data is read
+                        (None ... all pairs, [] ... no historical data)
+      dict_timer    ... filled with the timers of the read steps
+
+    Return value: dict_inputs, None if one of the inputs could not be read
+    """
+    if dict_timer is None:
+        dict_timer = dict()
+
+    dict_inputs = dict()
+
+    #-----------------------------------------------------------------------------#
+    #             Current Market Data                                             #
+    #-----------------------------------------------------------------------------#
+    print('   (+) Current Market Data ...')
+    completedNoError                , \
+    df_CurrentMarketData_Exchange   , \
+    df_CurrentMarketData_Yield      , \
+    df_CurrentMarketData_FXATMVol   , \
+    df_CurrentMarketData_FXDeltaVol = readCurrentMarketData( str_dateIdentifier = str_dateIdentifier,
+                                                              filenameSuffix     = "-BARC-CurrentMarketData",
+                                                              fileFormat         = "csv",
+                                                              useSnapshot        = dict_settings["useMarketDataSnapshot"])
+
+    # if there was just one error reading the files --> abort run
+    if completedNoError == False:
+        return None
+
+    dict_inputs['df_CurrentMarketData_Exchange']   = df_CurrentMarketData_Exchange
+    dict_inputs['df_CurrentMarketData_Yield']      = df_CurrentMarketData_Yield
+    dict_inputs['df_CurrentMarketData_FXATMVol']   = df_CurrentMarketData_FXATMVol
+    dict_inputs['df_CurrentMarketData_FXDeltaVol'] = df_CurrentMarketData_FXDeltaVol
+
+    # yield curves grouped once for all products
+    dict_inputs['obj_YieldCurves'] = class_YieldCurveRegistry(df_CurrentMarketData_Yield)
+
+    # ATM and Delta vol curves grouped once, splines kept for all products
+    dict_inputs['obj_VolSurface']  = class_VolSurface( df_CurrentMarketData_FXATMVol   = df_CurrentMarketData_FXATMVol   ,
+                                                       df_CurrentMarketData_FXDeltaVol = df_CurrentMarketData_FXDeltaVol )
+
+    # add timer
+    dict_timer['readCurrentMarketData'] = timeit.default_timer()
+
+    #-----------------------------------------------------------------------------#
+    #             Historical Market Data                                          #
+    #-----------------------------------------------------------------------------#
+    dict_inputs['df_HistoricalMarketData_Exchange'] = None
+
+    if list_FX_rates is None or len(list_FX_rates) != 0:
+        print('   (+) Historical Market Data ...')
+
+        completedNoError                   , \
+        df_HistoricalMarketData_Exchange   , \
+        df_HistoricalMarketData_Yield      , \
+        df_HistoricalMarketData_FXATMVol   , \
+        df_HistoricalMarketData_FXDeltaVol = readHistoricalMarketData( str_dateIdentifier = str_dateIdentifier,
+                                                                       filenameSuffix     = "-BARC-HistoricalMarketData",
+                                                                       fileFormat         = "csv",
+                                                                       list_typesToRead   = ["Exchange"],
+                                                                       list_FX_rates      = list_FX_rates,
+                                                                       nYearsLookback     = dict_settings["nYearsHistoricalData"],
+                                                                       useStore           = dict_settings["incrementalHistoricalData"],
+                                                                       flag_rebuildStore  = dict_settings["rebuildHistoricalData"] )
+
+        # if there was just one error reading the files (all 4 are None) --> abort run
+        if completedNoError == False:
+            return None
+
+        # the history was fetched again: drop the log returns of the old one
+        if dict_settings["rebuildHistoricalData"] == True:
+            invalidate_LogReturnCache()
+
+        dict_inputs['df_HistoricalMarketData_Exchange'] = df_HistoricalMarketData_Exchange
+
+    # add timer
+    dict_timer['readHistoricalMarketData'] = timeit.default_timer()
+
+    #-----------------------------------------------------------------------------#
+    #             Read Random Indices                                             #
+    #-----------------------------------------------------------------------------#
+    if dict_settings['readRandomIndices'] == True:
+        obj_RandomIndices = readRandomIndexFile(filename = dict_settings["readRandomIndicesFilename"])
+
+        if obj_RandomIndices is None:
+            return None
+    else:
+        obj_RandomIndices = None
+
+    dict_inputs['obj_RandomIndices'] = obj_RandomIndices
+
+    # add timer
+    dict_timer['readRandomIndices'] = timeit.default_timer()
+
+    #-----------------------------------------------------------------------------#
+    #             Read Mappings: CurrencyName to CurveName                        #
+    #-----------------------------------------------------------------------------#
+    dict_inputs['dict_Mapping'] = readMapping(filename=dict_settings["filename_Mapping"])
+
+    # add timer
+    dict_timer['readMappings'] = timeit.default_timer()
+
+    return dict_inputs
+
+###############################################################################
+#        CACHED WORKFLOW INPUTS                                               #
+###############################################################################
+def get_WorkflowInputs( dict_settings      ,
+                        settingsFilename   ,
+                        str_dateIdentifier ,
+                        dict_timer = None  ):
+    """
+    Return the inputs of (tradeDate, settings file) from the process-level
+    cache, loading them (historical data of all FX pairs) on a miss.
+
+    Return value: dict_inputs, None if the inputs could not be read
+    """
+    obj_cache = get_WorkflowInputsCache(dict_settings)
+    key       = (dict_settings["tradeDate"], settingsFilename)
+
+    # the module lock only guards the lookup, not the (slow) load
+    with lock_WorkflowInputs:
+        dict_inputs = obj_cache.get(key)
+
+        if dict_inputs is None:
+            lock_load = dict_LoadLocks_WorkflowInputs.setdefault(key, threading.Lock())
+
+    if dict_inputs is None:
+        # one load per key, concurrent requests for the same key wait for it,
+        # requests for other keys go on
+        with lock_load:
+            dict_inputs = obj_cache.get(key)
+
+            if dict_inputs is None:
+                try:
+                    dict_inputs = load_WorkflowInputs( dict_settings      = dict_settings      ,
+                                                       str_dateIdentifier = str_dateIdentifier ,
+                                                       list_FX_rates      = None               ,
+                                                       dict_timer         = dict_timer         )
+                    if dict_inputs is not None:
+                        obj_cache.put(key, dict_inputs)
+                finally:
+                    # later requests find the inputs in the cache, or load
+                    # again after a failed load (the lock is not kept forever)
+                    with lock_WorkflowInputs:
+                        if dict_LoadLocks_WorkflowInputs.get(key) is lock_load:
+                            del dict_LoadLocks_WorkflowInputs[key]
+            else:
+                print('   (+) Inputs of ' + dict_settings["tradeDate"] + ' loaded by a concurrent request ' + str(obj_cache.get_Statistics()))
+    else:
+        print('   (+) Inputs of ' + dict_settings["tradeDate"] + ' served from the input cache ' + str(obj_cache.get_Statistics()))
+
+    # cache hit: no read steps
+    if dict_timer is not None:
+        for key_timer in ['readCurrentMarketData', 'readHistoricalMarketData', 'readRandomIndices', 'readMappings']:
+            dict_timer.setdefault(key_timer, timeit.default_timer())
+
+    return dict_inputs
+
+###############################################################################
+#        PRELOAD AT WORKER STARTUP                                            #
+###############################################################################
+def preload_WorkflowInputs(settingsFilename = settingsFilename_default):
+    """
+    Fill the input cache for the tradeDate of the SettingsFile, if the
+    SettingsFile enables it (useInputCache and preloadInputCache).
+    Called from ApiConfig.ready(); errors are reported, not raised, so the
+    API still starts (the inputs are then loaded by the first request).
+    """
+    try:
+        dict_settings = readSettings(filename=settingsFilename)
+        if dict_settings == None:
+            return
+
+        if dict_settings["useInputCache"] != True or dict_settings["preloadInputCache"] != True:
+            return
+
+        str_dateIdentifier = getStrDateIdentifier(dict_settings["tradeDate"])
+        if str_dateIdentifier == None:
+            return
+
+        print('[PRELOADING WORKFLOW INPUTS] ' + dict_settings["tradeDate"])
+
+        configure_ConnectionPool( connection_string = dict_settings["dbConnectionString"] ,
+                                  pool_size         = dict_settings["dbPoolSize"]         )
+
+        get_WorkflowInputs( dict_settings      = dict_settings      ,
+                            settingsFilename   = settingsFilename   ,
+                            str_dateIdentifier = str_dateIdentifier )
+    except Exception as e:
+        print('[WARNING]. Could not preload the workflow inputs: ', e)
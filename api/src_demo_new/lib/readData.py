@@ -2,8 +2,12 @@ import pandas as pd
 import numpy as np
 import json
 import datetime
-import pyodbc
 import os
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+
+from .Bootstrap import class_RandomIndices
+from .DBConnection import get_ConnectionPool
 
 ###############################################################################
 #        READ RANDOM INDICES                                                  #
@@ -11,50 +15,441 @@ import os
 def readRandomIndexFile(filename):
     script_dir = os.path.dirname(__file__)
     """
-    Read the RandomIndices from a file.
+    Read the RandomIndices from a file (one column per simulation, one row
+    per trading day).
 
     There's two choices for the RandomIndex file:
-        [1] Read Integers (Return Picks)
+        [1] Read Integers (Return Picks), starting at 1
         [2] Read Uniform distribution in [0,1] that needs to be converted to [1]
-    This function reads either of them, and returns them as DataFrame.
-    There's a function in Bootstrap.py that converts indices if necessary.
+    The content is validated once for the whole file, and stored as
+    (nSims x nDays) matrix. The conversion to indices is done (once per
+    number of log returns) by class_RandomIndices in Bootstrap.py.
+
+    The space-separated file is only parsed once: a binary companion
+    <name>.npy (nSims x nDays) plus header <name>.npy.json (shape, dtype,
+    uniform/picks) is written next to it and memory-mapped on later runs.
+    The companion is rebuilt whenever the text file is newer.
 
-    Return value: DataFrame with indices
+    Return value: class_RandomIndices, None if the file content is invalid
     """
-    df_RandomIndices = pd.read_csv( os.path.join(script_dir, filename)       , \
+    filename_csv    = os.path.join(script_dir, filename)
+    filename_npy    = os.path.splitext(filename_csv)[0] + '.npy'
+    filename_header = filename_npy + '.json'
+
+    #-------------------------------------------------------------------------#
+    #    Binary companion is up to date: memory map it                        #
+    #-------------------------------------------------------------------------#
+    obj_RandomIndices = readRandomIndexBinary( filename_npy    = filename_npy    ,
+                                               filename_header = filename_header ,
+                                               filename_csv    = filename_csv    )
+    if obj_RandomIndices is not None:
+        return obj_RandomIndices
+
+    #-------------------------------------------------------------------------#
+    #    Parse the text file and write the binary companion                   #
+    #-------------------------------------------------------------------------#
+    df_RandomIndices = pd.read_csv( filename_csv , \
                                     sep      = ' ' , \
                                     header   = None  )
 
-    return df_RandomIndices
+    arr_RandomValues = np.ascontiguousarray(df_RandomIndices.values.T)
+
+    obj_RandomIndices = validate_RandomIndices(arr_RandomValues = arr_RandomValues, filename = filename)
+
+    if obj_RandomIndices is not None:
+        writeRandomIndexBinary( obj_RandomIndices = obj_RandomIndices ,
+                                filename_npy      = filename_npy      ,
+                                filename_header   = filename_header   ,
+                                filename_csv      = filename_csv      )
+
+    return obj_RandomIndices
+
+###############################################################################
+#        READ RANDOM INDICES - BINARY COMPANION                               #
+###############################################################################
+def readRandomIndexBinary(filename_npy, filename_header, filename_csv):
+    """
+    Memory map the binary companion of the RandomIndex file.
+
+    Return value: class_RandomIndices, None if the companion is missing,
+                  older than the text file or does not match its header
+    """
+    if not os.path.isfile(filename_npy) or not os.path.isfile(filename_header):
+        return None
+
+    if os.path.isfile(filename_csv) and \
+       os.path.getmtime(filename_csv) > os.path.getmtime(filename_npy):
+        return None
+
+    try:
+        with open(filename_header) as f:
+            dict_header = json.load(f)
+
+        # a header of an older or broken write may lack keys
+        list_shape   = dict_header['shape']
+        str_dtype    = dict_header['dtype']
+        flag_uniform = dict_header['type'] == 'uniform'
+
+        arr_RandomValues = np.load(filename_npy, mmap_mode='r')
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print('[WARNING]. Could not read binary RandomIndex file, will re-read text file: ', filename_npy)
+        print('           ', e)
+        return None
+
+    if list(arr_RandomValues.shape) != list_shape or \
+       str(arr_RandomValues.dtype)  != str_dtype:
+        print('[WARNING]. Binary RandomIndex file does not match its header, will re-read text file: ', filename_npy)
+        return None
+
+    return class_RandomIndices( arr_RandomValues = arr_RandomValues ,
+                                flag_uniform     = flag_uniform     )
+
+###############################################################################
+#        WRITE RANDOM INDICES - BINARY COMPANION                              #
+###############################################################################
+def writeRandomIndexBinary(obj_RandomIndices, filename_npy, filename_header, filename_csv):
+    """
+    Write the validated RandomIndex matrix as .npy plus a small json header.
+    Failing to write (e.g. read-only directory) is not an error, the text
+    file is simply parsed again on the next run.
+    """
+    arr_RandomValues = obj_RandomIndices.arr_RandomValues
+
+    dict_header = { "shape"  : list(arr_RandomValues.shape)                            ,
+                    "dtype"  : str(arr_RandomValues.dtype)                             ,
+                    "type"   : "uniform" if obj_RandomIndices.flag_uniform else "picks" ,
+                    "layout" : "nSims x nDays"                                         ,
+                    "source" : os.path.basename(filename_csv)                          }
+
+    # other workers may memory map the files at any time: write temporary
+    # files and move them in place (a reader sees the old or the new file)
+    filename_npy_tmp    = filename_npy    + "." + str(os.getpid()) + ".tmp"
+    filename_header_tmp = filename_header + "." + str(os.getpid()) + ".tmp"
+
+    try:
+        with open(filename_npy_tmp, 'wb') as f:
+            np.save(f, arr_RandomValues)
+
+        with open(filename_header_tmp, 'w') as f:
+            json.dump(dict_header, f, indent=2)
+
+        os.replace(filename_npy_tmp   , filename_npy   )
+        os.replace(filename_header_tmp, filename_header)
+    except OSError as e:
+        print('[WARNING]. Could not write binary RandomIndex file: ', filename_npy)
+        print('           ', e)
+
+        for filename_tmp in [filename_npy_tmp, filename_header_tmp]:
+            if os.path.isfile(filename_tmp):
+                os.remove(filename_tmp)
+
+###############################################################################
+#        VALIDATE RANDOM INDICES                                              #
+###############################################################################
+def validate_RandomIndices(arr_RandomValues, filename):
+    """
+    Check that the RandomIndex file holds either uniforms in [0,1) or
+    integer return picks >= 1, and wrap it into class_RandomIndices.
+
+    Return value: class_RandomIndices, None if the content is invalid
+    """
+    if arr_RandomValues.size == 0 or np.isnan(arr_RandomValues).any():
+        print('[ERROR]. The RandomIndex file is empty or contains missing values: ', filename)
+        print('---------- Aborting Run ----------')
+        return None
+
+    min_RandomValue = arr_RandomValues.min()
+    max_RandomValue = arr_RandomValues.max()
+
+    #----------------#
+    # float values   #
+    #----------------#
+    if min_RandomValue >= 0.0 and max_RandomValue < 1.0:
+        flag_uniform = True
+
+    #----------------#
+    # integer values #
+    #----------------#
+    elif min_RandomValue >= 1 and np.all(np.floor(arr_RandomValues) == arr_RandomValues):
+        flag_uniform = False
+
+    else:
+        print('[ERROR]. The RandomIndex file needs to contain either uniforms in [0,1) or integers >= 1: ', filename)
+        print('         min value: ', min_RandomValue)
+        print('         max value: ', max_RandomValue)
+        print('---------- Aborting Run ----------')
+        return None
+
+    return class_RandomIndices( arr_RandomValues = arr_RandomValues ,
+                                flag_uniform     = flag_uniform     )
+
+###############################################################################
+#        MARKETDATA COLUMNS                                                   #
+###############################################################################
+# column names (in the order of the SQL queries) per MarketData type
+list_columns_Exchange   = [ 'type'        ,
+                            'ccy_FOR'     ,
+                            'date'        ,
+                            'ccy_DOM'     ,
+                            'rate'        ]
+
+list_columns_Yield      = [ 'type'        ,
+                            'curvename'   ,
+                            'date'        ,
+                            'ccy_yield'   ,
+                            'ignore1'     ,
+                            'ignore2'     ,
+                            'ignore3'     ,
+                            'ignore4'     ,
+                            'tenor'       ,
+                            'yield'       ]
+
+list_columns_FXATMVol   = [ 'type'        ,
+                            'curvename'   ,
+                            'date'        ,
+                            'ccy_counter' ,
+                            'ignore1'     ,
+                            'ignore2'     ,
+                            'ignore3'     ,
+                            'ignore4'     ,
+                            'ignore5'     ,
+                            'ignore6'     ,
+                            'ignore7'     ,
+                            'ignore8'     ,
+                            'ignore9'     ,
+                            'ignore10'    ,
+                            'tenor'       ,
+                            'volatility'  ]
+
+list_columns_FXDeltaVol = [ 'type'        ,
+                            'curvename'   ,
+                            'date'        ,
+                            'ccy_counter' ,
+                            'ignore1'     ,
+                            'ignore2'     ,
+                            'ignore3'     ,
+                            'ignore4'     ,
+                            'optionType'  ,
+                            'DeltaFlag'   ,
+                            'ignore5'     ,
+                            'ignore6'     ,
+                            'ignore7'     ,
+                            'ignore8'     ,
+                            'ignore9'     ,
+                            'ignore10'    ,
+                            'ignore11'    ,
+                            'DeltaValue'  ,
+                            'tenor'       ,
+                            'volatility'  ]
+
+dict_MarketDataColumns      = { "Exchange"      : list_columns_Exchange   ,
+                                "Yield"         : list_columns_Yield      ,
+                                "FXATMVol"      : list_columns_FXATMVol   ,
+                                "FXDeltaVolMtx" : list_columns_FXDeltaVol }
+
+dict_MarketDataFloatColumns = { "Exchange"      : ['rate']                              ,
+                                "Yield"         : ['tenor', 'yield']                    ,
+                                "FXATMVol"      : ['tenor', 'volatility']               ,
+                                "FXDeltaVolMtx" : ['DeltaValue', 'tenor', 'volatility'] }
+
+###############################################################################
+#        PARSE MARKETDATA QUERY                                               #
+###############################################################################
+def clean_MarketDataColumn(sr_column):
+    """
+    Remove all quote characters of a text column (numeric columns are
+    returned unchanged).
+    """
+    if pd.api.types.is_numeric_dtype(sr_column.dtype):
+        return sr_column
+
+    return sr_column.astype(str).str.replace(r"[\"\']", "", regex=True)
+
+def parse_MarketDataQuery(df_query, str_type):
+    """
+    Parse the result of one MarketData query column by column:
+      [1] check the number of columns and name them
+      [2] remove the quote characters
+      [3] date: YYYY-MM-DD hh:mm:ss --> YYYY/MM/DD
+      [4] cast the numeric columns to float
+
+    Return value: DataFrame, None if the query result is not of type str_type
+    """
+    list_columns = dict_MarketDataColumns[str_type]
+
+    if df_query.shape[1] != len(list_columns):
+        print('[ERROR - readMarketData]. Could not read ' + str_type + ' data, expecting ' + str(len(list_columns)) + ' columns')
+        print('    --------- Aborting ----------')
+        return None
+
+    df_MarketData = pd.DataFrame({ column : clean_MarketDataColumn(df_query.iloc[:, i_column]).values \
+                                   for i_column, column in enumerate(list_columns) }, columns = list_columns)
+
+    arr_isUnknownType = (df_MarketData['type'] != str_type).values
+    if arr_isUnknownType.any():
+        print('[ERROR - readMarketData]. Unknown MarketData type:')
+        print(df_MarketData[arr_isUnknownType].iloc[0].tolist())
+        return None
+
+    df_MarketData['date'] = df_MarketData['date'].astype(str).str.replace("-", "/", regex=False).str.split(" ").str[0]
+
+    for column in dict_MarketDataFloatColumns[str_type]:
+        df_MarketData[column] = df_MarketData[column].astype(np.float64)
+
+    return df_MarketData
+
+###############################################################################
+#        RUN MARKETDATA QUERIES                                               #
+###############################################################################
+def run_MarketDataQuery(sql_query, list_params):
+    """
+    Run one query on its own pooled connection.
+
+    Return value: tuple (DataFrame, seconds)
+    """
+    time_start = timeit.default_timer()
+
+    with get_ConnectionPool().connection() as cnxn:
+        df_query = pd.read_sql(sql_query, cnxn, params = list_params)
+
+    return df_query, timeit.default_timer() - time_start
+
+def run_MarketDataQueries(list_queries):
+    """
+    Run the MarketData queries concurrently (one thread and one pooled
+    connection per query) and wait for all of them.
+
+    list_queries: list of tuples (str_type, sql_query, list_params)
+
+    Return value: dict str_type --> DataFrame (raw query result)
+    """
+    dict_futures = dict()
+
+    with ThreadPoolExecutor(max_workers = max(len(list_queries), 1)) as executor:
+        for str_type, sql_query, list_params in list_queries:
+            dict_futures[str_type] = executor.submit(run_MarketDataQuery, sql_query, list_params)
+
+    dict_queryResults = dict()
+
+    for str_type, future in dict_futures.items():
+        dict_queryResults[str_type], time_query = future.result()
+        print('       (*) Query %-14s: %06.3f seconds [%d rows]' % (str_type, time_query, dict_queryResults[str_type].shape[0]))
+
+    return dict_queryResults
+
+###############################################################################
+#        MARKETDATA SNAPSHOTS                                                 #
+###############################################################################
+# parsed CurrentMarketData per observation date, one npz file per date
+# (arrays "<type>__<column>"), so re-runs of a date skip the database
+snapshot_dir = os.path.join(os.path.dirname(__file__), "MarketDataSnapshots")
+
+# order of the DataFrames in the return value of readCurrentMarketData
+list_snapshotTypes = ["Exchange", "Yield", "FXATMVol", "FXDeltaVolMtx"]
+
+def get_MarketDataSnapshotFilename(str_dateIdentifier):
+    return os.path.join(snapshot_dir, str_dateIdentifier + "-CurrentMarketData.npz")
+
+def readMarketDataSnapshot(str_dateIdentifier):
+    """
+    Return value: tuple of the four DataFrames (Exchange, Yield, FXATMVol,
+                  FXDeltaVol), None if there is no (readable) snapshot
+    """
+    filename = get_MarketDataSnapshotFilename(str_dateIdentifier)
+    if not os.path.isfile(filename):
+        return None
+
+    try:
+        with np.load(filename, allow_pickle=False) as npz_snapshot:
+            list_MarketData = []
+            for str_type in list_snapshotTypes:
+                list_columns = dict_MarketDataColumns[str_type]
+                list_MarketData.append(pd.DataFrame({ column : npz_snapshot[str_type + "__" + column] \
+                                                      for column in list_columns }, columns = list_columns))
+    except (OSError, KeyError, ValueError) as e:
+        print('[WARNING]. Could not read MarketData snapshot, reading from database: ', filename)
+        print('           ', e)
+        return None
+
+    return tuple(list_MarketData)
+
+def writeMarketDataSnapshot(str_dateIdentifier, tuple_MarketData):
+    """
+    Write the four parsed DataFrames (same order as list_snapshotTypes).
+    The file is written to a temporary name first, so concurrent readers
+    never see a half written snapshot.
+    """
+    filename     = get_MarketDataSnapshotFilename(str_dateIdentifier)
+    filename_tmp = filename + "." + str(os.getpid()) + ".tmp"
+
+    dict_arrays = dict()
+    for str_type, df_MarketData in zip(list_snapshotTypes, tuple_MarketData):
+        for column in dict_MarketDataColumns[str_type]:
+            if column in dict_MarketDataFloatColumns[str_type]:
+                dict_arrays[str_type + "__" + column] = df_MarketData[column].values.astype(np.float64)
+            else:
+                dict_arrays[str_type + "__" + column] = np.array(df_MarketData[column].astype(str).tolist(), dtype=str)
+
+    try:
+        os.makedirs(snapshot_dir, exist_ok=True)
+        with open(filename_tmp, 'wb') as f:
+            np.savez(f, **dict_arrays)
+        os.replace(filename_tmp, filename)
+    except OSError as e:
+        print('[WARNING]. Could not write MarketData snapshot: ', filename)
+        print('           ', e)
+
+def invalidateMarketDataSnapshot(str_dateIdentifier = None):
+    """
+    Delete the snapshot of one observation date (YYYYMMDD), or all snapshots
+    if str_dateIdentifier is None.
+
+    Return value: list of the deleted files
+    """
+    if not os.path.isdir(snapshot_dir):
+        return []
+
+    if str_dateIdentifier is None:
+        list_filenames = [ os.path.join(snapshot_dir, filename) for filename in sorted(os.listdir(snapshot_dir)) \
+                           if filename.endswith("-CurrentMarketData.npz") ]
+    else:
+        list_filenames = [ get_MarketDataSnapshotFilename(str_dateIdentifier) ]
+
+    list_deleted = []
+    for filename in list_filenames:
+        if os.path.isfile(filename):
+            os.remove(filename)
+            list_deleted.append(filename)
+
+    return list_deleted
 
 ###############################################################################
 #        READ CURRENT MARKETDATA                                              #
 ###############################################################################
 def readCurrentMarketData( str_dateIdentifier,
                            filenameSuffix = "-BARC-CurrentMarketData",
-                           fileFormat     = "csv"):
+                           fileFormat     = "csv",
+                           useSnapshot    = False):
     """
     Read in CurrentMarketData.csv as it comes from MDM process.
       [1] Split it into four sections: Exchange, Yield, FXDeltaVol, FXATMVol
       [2] Read each of the four files into a DataFrame
 
+    The observation date is taken from str_dateIdentifier (YYYYMMDD).
+    With useSnapshot the parsed DataFrames are served from the local
+    snapshot of that date if it exists, and written to it otherwise.
+
     Return value: five values:
       1       ... completedNoError [True/False]
       2,3,4,5 ... DataFrames containing MarketData
     """
+    if useSnapshot == True:
+        tuple_MarketData = readMarketDataSnapshot(str_dateIdentifier = str_dateIdentifier)
 
-
-    connection_string = 'DRIVER={ODBC Driver 13 for SQL Server};SERVER=127.0.0.1,1433;DATABASE=rh01;UID=sa;PWD=Darqube17;TDS_Version=8.0;'
-
-    cnxn = pyodbc.connect(
-                         # r'DRIVER={SQL Server};'
-                         # r'SERVER=DESKTOP-8CBSCDJ;'
-                         # r'DATABASE=rh01;'
-                         # r'Trusted_Connection=yes;'
-                         connection_string
-                         )
-    #create cursor
-    cursor = cnxn.cursor()
+        if tuple_MarketData is not None:
+            print('       (*) Read from snapshot ' + get_MarketDataSnapshotFilename(str_dateIdentifier))
+            completedNoError=True
+            return (completedNoError,) + tuple_MarketData
 
     #EQUITY Query
     sql_Equity        = """select ["type"],
@@ -71,7 +466,7 @@ def readCurrentMarketData( str_dateIdentifier,
                                  ["currencyID"],
                                  ["exchangeRate"]
                          from [dbo].[mdm.rate]
-                         where ["observationDate"] like '"2018-05-31%"' """
+                         where ["observationDate"] like ? """
     #FXAtmVol Query
     sql_FXATMVol      = """select ["curvetype"],
                                  ["curveID"] + '-' + 'ATM' as 'curveID',
@@ -90,7 +485,7 @@ def readCurrentMarketData( str_dateIdentifier,
                                  ["expiry"],
                                  ["vol"]
                         from [dbo].[mdm.surfaceATM]
-                        where ["observationDate"] like '"2018-05-31%"' """
+                        where ["observationDate"] like ? """
     #FXNonAtmVol Query
     sql_FXDeltaVolMtx = """select ["curvetype"],
                                      ["curveID"] + '-' + ["quoteInstrumentType"] as 'curveID',
@@ -113,7 +508,7 @@ def readCurrentMarketData( str_dateIdentifier,
                                      ["expiry"],
                                      ["vol"]
                              from [dbo].[mdm.surfaceOTM]
-                             where ["observationDate"] like '"2018-05-31%"' """
+                             where ["observationDate"] like ? """
     #Yield Curves Query
     sql_Yield        = """select 'Yield' as 'Yield',
                                   [dbo].[mdm.curve].["curveID"],
@@ -128,212 +523,36 @@ def readCurrentMarketData( str_dateIdentifier,
                                     from
                                     [dbo].[mdm.curve] inner join [dbo].[mdm.curvepoint]
                                     on [dbo].[mdm.curve].["ID"]=[dbo].[mdm.curvepoint].["ID"]
-                                    where ["observationDate"] like '"2018-05-31%"' """
-
-
-
-    df_CurrentMarketData_Exchange     = pd.DataFrame( columns = [ 'type'    ,
-                                                                  'ccy_FOR' ,
-                                                                  'date'    ,
-                                                                  'ccy_DOM' ,
-                                                                  'rate'    ] )
-
-    df_CurrentMarketData_Yield        = pd.DataFrame( columns = [ 'type'      ,
-                                                                  'curvename' ,
-                                                                  'date'      ,
-                                                                  'ccy_yield' ,
-                                                                  'ignore1'   ,
-                                                                  'ignore2'   ,
-                                                                  'ignore3'   ,
-                                                                  'ignore4'   ,
-                                                                  'tenor'     ,
-                                                                  'yield'     ] )
-
-    df_CurrentMarketData_FXATMVol     = pd.DataFrame( columns = [ 'type'        ,
-                                                                  'curvename'   ,
-                                                                  'date'        ,
-                                                                  'ccy_counter' ,
-                                                                  'ignore1'     ,
-                                                                  'ignore2'     ,
-                                                                  'ignore3'     ,
-                                                                  'ignore4'     ,
-                                                                  'ignore5'     ,
-                                                                  'ignore6'     ,
-                                                                  'ignore7'     ,
-                                                                  'ignore8'     ,
-                                                                  'ignore9'     ,
-                                                                  'ignore10'    ,
-                                                                  'tenor'       ,
-                                                                  'volatility'  ] )
-
-    df_CurrentMarketData_FXDeltaVol     = pd.DataFrame( columns = [ 'type'        ,
-                                                                    'curvename'   ,
-                                                                    'date'        ,
-                                                                    'ccy_counter' ,
-                                                                    'ignore1'     ,
-                                                                    'ignore2'     ,
-                                                                    'ignore3'     ,
-                                                                    'ignore4'     ,
-                                                                    'optionType'  ,
-                                                                    'DeltaFlag'   ,
-                                                                    'ignore5'     ,
-                                                                    'ignore6'     ,
-                                                                    'ignore7'     ,
-                                                                    'ignore8'     ,
-                                                                    'ignore9'     ,
-                                                                    'ignore10'    ,
-                                                                    'ignore11'    ,
-                                                                    'DeltaValue'  ,
-                                                                    'tenor'       ,
-                                                                    'volatility'  ] )
+                                    where ["observationDate"] like ? """
+
+
+
+    df_CurrentMarketData_Exchange   = pd.DataFrame( columns = list_columns_Exchange   )
+    df_CurrentMarketData_Yield      = pd.DataFrame( columns = list_columns_Yield      )
+    df_CurrentMarketData_FXATMVol   = pd.DataFrame( columns = list_columns_FXATMVol   )
+    df_CurrentMarketData_FXDeltaVol = pd.DataFrame( columns = list_columns_FXDeltaVol )
 
     filename = str_dateIdentifier + filenameSuffix + "." + fileFormat
 
+    #-------------------------------------------------------------------------#
+    #    queries run concurrently, one DataFrame per query parsed by column   #
+    #-------------------------------------------------------------------------#
+    dict_MarketData = dict()
 
-    main_list = []
-    df = pd.read_sql(sql_Exchange, cnxn)
-    main_list.extend(df.values.tolist())
-    df = pd.read_sql(sql_FXATMVol, cnxn)
-    main_list.extend(df.values.tolist())
-    df = pd.read_sql(sql_Yield, cnxn)
-    main_list.extend(df.values.tolist())
-    df = pd.read_sql(sql_FXDeltaVolMtx, cnxn)
-    main_list.extend(df.values.tolist())
-
-#     print(len(main_list))
-    Exc = []
-    Yld = []
-    FXAtm = []
-    FXDelta = []
-    for line in main_list:
-        line[0] = line[0].replace("\"", "")
-        if line[0] == "Exchange":
-            if len(line) != 5:
-                print('[ERROR - readMarketData]. Could not read Exchange data, expecting 5 columns')
-                print('    --------- Aborting ----------')
-                completedNoError=False
-                return completedNoError, \
-                    df_CurrentMarketData_Exchange, \
-                    df_CurrentMarketData_Yield, \
-                    df_CurrentMarketData_FXATMVol, \
-                    df_CurrentMarketData_FXDeltaVol
-
-            dict_Exchange = dict()
-            dict_Exchange["type"]    = line[0].replace("\"", "").replace("\'", "")
-            dict_Exchange["ccy_FOR"] = line[1].replace("\"", "").replace("\'", "")
-            dict_Exchange["date"]    = line[2].replace("-", "/").replace("\"", "").replace("\'", "").split(" ")[0]
-            dict_Exchange["ccy_DOM"] = line[3].replace("\"", "").replace("\'", "")
-            dict_Exchange["rate"]    = float(line[4].replace("\"", "").replace("\'", ""))
-            Exc.append(dict_Exchange)
-
-
-        #---------------------------------------------------------------------#
-        #          READ YIELD DATA                                            #
-        #---------------------------------------------------------------------#
-
-        elif line[0] == "Yield":
-            if len(line) != 10:
-                print('[ERROR - readMarketData]. Could not read Yield data, expecting 10 columns')
-                print('    --------- Aborting ----------')
-                completedNoError=False
-                return completedNoError, \
-                    df_CurrentMarketData_Exchange, \
-                    df_CurrentMarketData_Yield, \
-                    df_CurrentMarketData_FXATMVol, \
-                    df_CurrentMarketData_FXDeltaVol
-
-            dict_Yield = dict()
-            dict_Yield["type"]      = line[0].replace("\"", "").replace("\'", "")
-            dict_Yield["curvename"] = line[1].replace("\"", "").replace("\'", "")
-            dict_Yield["date"]      = line[2].replace("-", "/").replace("\"", "").replace("\'", "").split(" ")[0]
-            dict_Yield["ccy_yield"] = line[3].replace("\"", "").replace("\'", "")
-            dict_Yield["ignore1"]   = line[4].replace("\"", "").replace("\'", "")
-            dict_Yield["ignore2"]   = line[5].replace("\"", "").replace("\'", "")
-            dict_Yield["ignore3"]   = line[6].replace("\"", "").replace("\'", "")
-            dict_Yield["ignore4"]   = line[7].replace("\"", "").replace("\'", "")
-            dict_Yield["tenor"]     = np.float64(line[8].replace("\"", "").replace("\'", ""))
-            dict_Yield["yield"]     = np.float64(line[9].replace("\"", "").replace("\'", ""))
-            Yld.append(dict_Yield)
-            #df_CurrentMarketData_Yield = df_CurrentMarketData_Yield.append(dict_Yield, ignore_index=True)
-
-        #---------------------------------------------------------------------#
-        #          READ FX ATM VOLATILITY DATA                                #
-        #---------------------------------------------------------------------#
-        elif line[0] == "FXATMVol":
-            if len(line) != 16:
-                print('[ERROR - readMarketData]. Could not read FXATMVol data, expecting 16 columns')
-                print('    --------- Aborting ----------')
-                completedNoError=False
-                return completedNoError, \
-                    df_CurrentMarketData_Exchange, \
-                    df_CurrentMarketData_Yield, \
-                    df_CurrentMarketData_FXATMVol, \
-                    df_CurrentMarketData_FXDeltaVol
-
-            dict_ATMVol = dict()
-            dict_ATMVol['type']        = line[0]
-            dict_ATMVol['curvename']   = line[1].replace("\"", "").replace("\'", "")
-            dict_ATMVol['date']        = line[2].replace("-", "/").replace("\"", "").replace("\'", "").split(" ")[0]
-            dict_ATMVol['ccy_counter'] = line[3].replace("\"", "").replace("\'", "")
-            dict_ATMVol['ignore1']     = line[4].replace("\"", "").replace("\'", "")
-            dict_ATMVol['ignore2']     = line[5].replace("\"", "").replace("\'", "")
-            dict_ATMVol['ignore3']     = line[6].replace("\"", "").replace("\'", "")
-            dict_ATMVol['ignore4']     = line[7].replace("\"", "").replace("\'", "")
-            dict_ATMVol['ignore5']     = line[8].replace("\"", "").replace("\'", "")
-            dict_ATMVol['ignore6']     = line[9].replace("\"", "").replace("\'", "")
-            dict_ATMVol['ignore7']     = line[10].replace("\"", "").replace("\'", "")
-            dict_ATMVol['ignore8']     = line[11].replace("\"", "").replace("\'", "")
-            dict_ATMVol['ignore9']     = line[12].replace("\"", "").replace("\'", "")
-            dict_ATMVol['ignore10']    = line[13].replace("\"", "").replace("\'", "")
-            dict_ATMVol['tenor']       = np.float64(line[14].replace("\"", "").replace("\'", ""))
-            dict_ATMVol['volatility']  = np.float64(line[15].replace("\"", "").replace("\'", ""))
-            FXAtm.append(dict_ATMVol)
-
-            #df_CurrentMarketData_FXATMVol = df_CurrentMarketData_FXATMVol.append(dict_ATMVol, ignore_index=True)
-
-
-        #---------------------------------------------------------------------#
-        #          READ FX DELTA VOLATILITY DATA                              #
-        #---------------------------------------------------------------------#
-
-        elif line[0] == "FXDeltaVolMtx":
-            if len(line) != 20:
-                print('[ERROR - readMarketData]. Could not read FXDeltaVolMtx data, expecting 20 columns')
-                print('    --------- Aborting ----------')
-                completedNoError=False
-                return completedNoError, \
-                    df_CurrentMarketData_Exchange, \
-                    df_CurrentMarketData_Yield, \
-                    df_CurrentMarketData_FXATMVol, \
-                    df_CurrentMarketData_FXDeltaVol
-
-            dict_DeltaVol = dict()
-            dict_DeltaVol['type']        = line[0].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['curvename']   = line[1].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['date']        = line[2].replace("-", "/").replace("\"", "").replace("\'", "").split(" ")[0]
-            dict_DeltaVol['ccy_counter'] = line[3].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['ignore1']     = line[4].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['ignore2']     = line[5].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['ignore3']     = line[6].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['ignore4']     = line[7].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['optionType']  = line[8].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['DeltaFlag']   = line[9].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['ignore5']     = line[10].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['ignore6']     = line[11].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['ignore7']     = line[12].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['ignore8']     = line[13].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['ignore9']     = line[14].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['ignore10']    = line[15].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['ignore11']    = line[16].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['DeltaValue']  = np.float64(line[17].replace("\"", "").replace("\'", ""))
-            dict_DeltaVol['tenor']       = np.float64(line[18].replace("\"", "").replace("\'", ""))
-            dict_DeltaVol['volatility']  = np.float64(line[19].replace("\"", "").replace("\'", ""))
-            FXDelta.append(dict_DeltaVol)
-            #df_CurrentMarketData_FXDeltaVol = df_CurrentMarketData_FXDeltaVol.append(dict_DeltaVol, ignore_index=True)
+    # '"YYYY-MM-DD%"', the dates are stored as quoted strings
+    str_observationDate = '"' + datetime.datetime.strptime(str_dateIdentifier, '%Y%m%d').strftime('%Y-%m-%d') + '%"'
 
-        else:
-            print('[ERROR - readCurrentMarketData]. Unknown MarketData type:')
-            print(line)
+    list_queries = [ ("Exchange"     , sql_Exchange     , [str_observationDate]) ,
+                     ("FXATMVol"     , sql_FXATMVol     , [str_observationDate]) ,
+                     ("Yield"        , sql_Yield        , [str_observationDate]) ,
+                     ("FXDeltaVolMtx", sql_FXDeltaVolMtx, [str_observationDate]) ]
+
+    dict_queryResults = run_MarketDataQueries(list_queries)
+
+    for str_type, sql_query, list_params in list_queries:
+        df_MarketData = parse_MarketDataQuery( df_query = dict_queryResults[str_type] ,
+                                               str_type = str_type                    )
+        if df_MarketData is None:
             completedNoError=False
             return completedNoError, \
                 df_CurrentMarketData_Exchange, \
@@ -341,47 +560,244 @@ def readCurrentMarketData( str_dateIdentifier,
                 df_CurrentMarketData_FXATMVol, \
                 df_CurrentMarketData_FXDeltaVol
 
-    df_CurrentMarketData_Exchange = df_CurrentMarketData_Exchange.append(Exc, ignore_index=False)
-    df_CurrentMarketData_Yield = df_CurrentMarketData_Yield.append(Yld, ignore_index=False)
-    df_CurrentMarketData_FXATMVol = df_CurrentMarketData_FXATMVol.append(FXAtm, ignore_index=False)
-    df_CurrentMarketData_FXDeltaVol = df_CurrentMarketData_FXDeltaVol.append(FXDelta, ignore_index=False)
+        dict_MarketData[str_type] = df_MarketData
+
+    df_CurrentMarketData_Exchange   = dict_MarketData["Exchange"]
+    df_CurrentMarketData_Yield      = dict_MarketData["Yield"]
+    df_CurrentMarketData_FXATMVol   = dict_MarketData["FXATMVol"]
+    df_CurrentMarketData_FXDeltaVol = dict_MarketData["FXDeltaVolMtx"]
+
+    if useSnapshot == True:
+        writeMarketDataSnapshot( str_dateIdentifier = str_dateIdentifier              ,
+                                 tuple_MarketData   = ( df_CurrentMarketData_Exchange   ,
+                                                        df_CurrentMarketData_Yield      ,
+                                                        df_CurrentMarketData_FXATMVol   ,
+                                                        df_CurrentMarketData_FXDeltaVol ) )
 
     completedNoError=True
-#     print(df_CurrentMarketData_Yield.head())
     return completedNoError, \
         df_CurrentMarketData_Exchange, \
         df_CurrentMarketData_Yield, \
-        df_CurrentMarketData_FXATMVol,\
+        df_CurrentMarketData_FXATMVol, \
         df_CurrentMarketData_FXDeltaVol
+
+###############################################################################
+#        HISTORICAL MARKETDATA STORE (APPEND-ONLY)                            #
+###############################################################################
+# one csv per FX pair (date YYYY/MM/DD, rate), sorted by date; only the
+# observations newer than the last stored date are fetched from the database
+historical_store_dir = os.path.join(os.path.dirname(__file__), "HistoricalMarketData")
+
+def get_HistoricalStoreFilename(FX_rate):
+    return os.path.join(historical_store_dir, FX_rate + "-Exchange.csv")
+
+def get_HistoricalStorePairs():
+    if not os.path.isdir(historical_store_dir):
+        return []
+
+    return [ filename[:-len("-Exchange.csv")] for filename in sorted(os.listdir(historical_store_dir)) \
+             if filename.endswith("-Exchange.csv") ]
+
+def get_HistoricalStoreLastDate(FX_rate):
+    """
+    Return value: last stored date (YYYY/MM/DD) of the FX pair, None if
+                  nothing is stored yet
+    """
+    filename = get_HistoricalStoreFilename(FX_rate)
+    if not os.path.isfile(filename):
+        return None
+
+    # the file is sorted by date: only the tail is needed
+    with open(filename, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(f.tell() - 256, 0))
+        list_lines = f.read().decode().strip().split('\n')
+
+    str_lastDate = list_lines[-1].split(',')[0]
+    if str_lastDate == 'date':
+        return None
+
+    return str_lastDate
+
+def get_SQLDateAfter(str_date):
+    # YYYY/MM/DD --> '"YYYY-MM-DD' of the next day (dates are stored as quoted strings)
+    date_next = datetime.datetime.strptime(str_date, '%Y/%m/%d') + datetime.timedelta(days=1)
+    return '"' + date_next.strftime('%Y-%m-%d')
+
+def updateHistoricalStore_Exchange( sql_Exchange      ,
+                                    list_FX_rates     ,
+                                    flag_rebuild      ):
+    """
+    Fetch the Exchange observations that are newer than the store and append
+    them. flag_rebuild deletes the store (of list_FX_rates, or everything if
+    None) first, so the full history is fetched again.
+
+    Return value: True if the store is up to date, False on errors
+    """
+    list_FX_rates_store = None if list_FX_rates is None else sorted(set(list_FX_rates))
+
+    if flag_rebuild == True:
+        print('       (*) Rebuilding the historical MarketData store')
+        for FX_rate in (get_HistoricalStorePairs() if list_FX_rates_store is None else list_FX_rates_store):
+            if os.path.isfile(get_HistoricalStoreFilename(FX_rate)):
+                os.remove(get_HistoricalStoreFilename(FX_rate))
+
+    #-------------------------------------------------------------------------#
+    #    delta query: per FX pair from its last stored date                   #
+    #-------------------------------------------------------------------------#
+    list_sqlPairs  = []
+    list_sqlParams = []
+
+    if list_FX_rates_store is None:
+        list_FX_rates_delta = get_HistoricalStorePairs()
+    else:
+        if len(list_FX_rates_store) == 0:
+            return True
+
+        list_FX_rates_delta = list_FX_rates_store
+
+    for FX_rate in list_FX_rates_delta:
+        str_lastDate = get_HistoricalStoreLastDate(FX_rate)
+
+        if str_lastDate is None:
+            list_sqlPairs.append('(["curveID"] = ? and ["currencyID"] = ?)')
+            list_sqlParams.extend([ '"' + FX_rate[0:3] + '"', '"' + FX_rate[3:6] + '"' ])
+        else:
+            list_sqlPairs.append('(["curveID"] = ? and ["currencyID"] = ? and ["observationDate"] >= ?)')
+            list_sqlParams.extend([ '"' + FX_rate[0:3] + '"', '"' + FX_rate[3:6] + '"', get_SQLDateAfter(str_lastDate) ])
+
+    list_sqlWhere = []
+
+    if list_FX_rates_store is None:
+        # all FX pairs: the full history of the pairs that are not stored yet
+        if len(list_FX_rates_delta) != 0:
+            list_sqlPairs.append('not (' + ' or '.join([ '(["curveID"] = ? and ["currencyID"] = ?)' ] * len(list_FX_rates_delta)) + ')')
+            for FX_rate in list_FX_rates_delta:
+                list_sqlParams.extend([ '"' + FX_rate[0:3] + '"', '"' + FX_rate[3:6] + '"' ])
+
+            list_sqlWhere.append('(' + ' or '.join(list_sqlPairs) + ')')
+    else:
+        list_sqlWhere.append('(' + ' or '.join(list_sqlPairs) + ')')
+
+    sql_query = sql_Exchange
+    if len(list_sqlWhere) != 0:
+        sql_query = sql_query + '\n where ' + ' and '.join(list_sqlWhere)
+
+    df_delta = parse_MarketDataQuery( df_query = run_MarketDataQueries([("Exchange", sql_query, list_sqlParams)])["Exchange"] ,
+                                      str_type = "Exchange"                                                                 )
+    if df_delta is None:
+        return False
+
+    #-------------------------------------------------------------------------#
+    #    append the new observations per FX pair                              #
+    #-------------------------------------------------------------------------#
+    os.makedirs(historical_store_dir, exist_ok=True)
+
+    # YYYY/MM/DD sorts like the date
+    df_delta = df_delta.sort_values(by='date', kind='mergesort')
+
+    nRowsAppended = 0
+    for (ccy_FOR, ccy_DOM), df_pair in df_delta.groupby(['ccy_FOR', 'ccy_DOM'], sort=True):
+        FX_rate      = ccy_FOR + ccy_DOM
+        str_lastDate = get_HistoricalStoreLastDate(FX_rate)
+
+        df_pair = df_pair.drop_duplicates(subset='date', keep='last')
+        if str_lastDate is not None:
+            df_pair = df_pair[df_pair['date'] > str_lastDate]
+
+        if df_pair.empty:
+            continue
+
+        filename = get_HistoricalStoreFilename(FX_rate)
+        df_pair[['date', 'rate']].to_csv( filename                              ,
+                                          mode   = 'a'                          ,
+                                          header = not os.path.isfile(filename) ,
+                                          index  = False                        )
+        nRowsAppended += df_pair.shape[0]
+
+    print('       (*) Historical MarketData store: appended ' + str(nRowsAppended) + ' observations')
+
+    return True
+
+def loadHistoricalStore_Exchange( list_FX_rates      ,
+                                  str_dateIdentifier ,
+                                  nYearsLookback     ):
+    """
+    Read the stored Exchange observations of list_FX_rates (None ... all
+    stored pairs), within nYearsLookback years up to the tradeDate.
+
+    Return value: DataFrame with the columns of readHistoricalMarketData
+    """
+    list_MarketData = []
+
+    for FX_rate in (get_HistoricalStorePairs() if list_FX_rates is None else sorted(set(list_FX_rates))):
+        filename = get_HistoricalStoreFilename(FX_rate)
+        if not os.path.isfile(filename):
+            continue
+
+        df_pair = pd.read_csv( filename                          ,
+                               dtype           = {'date' : str}  ,
+                               float_precision = 'round_trip'    )
+
+        if nYearsLookback is not None:
+            date_end   = pd.Timestamp(datetime.datetime.strptime(str_dateIdentifier, '%Y%m%d'))
+            date_start = date_end - pd.DateOffset(years = nYearsLookback)
+
+            df_pair = df_pair[ (df_pair['date'] >= date_start.strftime('%Y/%m/%d')) & \
+                               (df_pair['date'] <= date_end.strftime('%Y/%m/%d'))     ]
+
+        list_MarketData.append(pd.DataFrame({ 'type'    : 'Exchange'              ,
+                                              'ccy_FOR' : FX_rate[0:3]            ,
+                                              'date'    : df_pair['date'].values  ,
+                                              'ccy_DOM' : FX_rate[3:6]            ,
+                                              'rate'    : df_pair['rate'].values  }, columns = list_columns_Exchange))
+
+    if len(list_MarketData) == 0:
+        return pd.DataFrame( columns = list_columns_Exchange )
+
+    return pd.concat(list_MarketData, ignore_index=True)
+
 ###############################################################################
 #        READ HISTORICAL MARKETDATA                                           #
 ###############################################################################
 def readHistoricalMarketData( str_dateIdentifier                              ,
                               filenameSuffix    = "-BARC-HistoricalMarketData",
                               fileFormat        = "csv"                       ,
-                              list_typesToRead  = ["Exchange"]                ):
+                              list_typesToRead  = ["Exchange"]                ,
+                              list_FX_rates     = None                        ,
+                              nYearsLookback    = None                        ,
+                              useStore          = False                       ,
+                              flag_rebuildStore = False                       ):
     """
     Read in HistoricalMarketData.csv as it comes from MDM process.
       [1] Split it into four sections: Exchange, Yield, FXDeltaVol, FXATMVol
       [2] Read only the data that is listed in list_typesToRead
+          (the queries of the other types are not executed)
+
+    The rows are restricted in SQL:
+      list_FX_rates  ... only Exchange rows of these pairs (e.g. ["EURUSD"]),
+                         None reads all pairs
+      nYearsLookback ... only rows within nYearsLookback years up to the
+                         tradeDate (str_dateIdentifier), None reads everything
+
+    With useStore the Exchange data is served from the append-only local
+    store (one csv per FX pair): only observations newer than the stored
+    ones are queried. flag_rebuildStore fetches the full history again.
 
     Return value: five values:
       1       ... completedNoError [True/False]
-      2,3,4,5 ... DataFrames containing MarketData
+      2,3,4,5 ... DataFrames containing MarketData (empty if not requested)
     """
-    db_name = os.environ.get('DB_NAME')
-    pwd = os.environ.get('SA_PASSWORD')
-    connection_string = 'DRIVER={ODBC Driver 13 for SQL Server};SERVER=127.0.0.1,1433;DATABASE=rh01;UID=sa;PWD=Darqube17;TDS_Version=8.0;'
-
-    cnxn = pyodbc.connect(
-                         # r'DRIVER={FreeTDS};'
-                         # r'SERVER=DESKTOP-8CBSCDJ;'
-                         # r'DATABASE=rh01;'
-                         # r'Trusted_Connection=yes;'
-                         connection_string
-                         )
-    #create cursor
-    cursor = cnxn.cursor()
+    for str_type in list_typesToRead:
+        if str_type not in dict_MarketDataColumns:
+            print('[ERROR - readHistoricalMarketData]. Unknown MarketData type: ', str_type)
+            print('    --------- Aborting ----------')
+            completedNoError=False
+            return completedNoError, \
+                pd.DataFrame( columns = list_columns_Exchange   ), \
+                pd.DataFrame( columns = list_columns_Yield      ), \
+                pd.DataFrame( columns = list_columns_FXATMVol   ), \
+                pd.DataFrame( columns = list_columns_FXDeltaVol )
 
     #EQUITY Query
     sql_Equity        = """select ["type"],
@@ -455,210 +871,88 @@ def readHistoricalMarketData( str_dateIdentifier                              ,
 
 
 
-    df_HistoricalMarketData_Exchange     = pd.DataFrame( columns = [ 'type'    ,
-                                                                  'ccy_FOR' ,
-                                                                  'date'    ,
-                                                                  'ccy_DOM' ,
-                                                                  'rate'    ] )
-
-    df_HistoricalMarketData_Yield        = pd.DataFrame( columns = [ 'type'      ,
-                                                                  'curvename' ,
-                                                                  'date'      ,
-                                                                  'ccy_yield' ,
-                                                                  'ignore1'   ,
-                                                                  'ignore2'   ,
-                                                                  'ignore3'   ,
-                                                                  'ignore4'   ,
-                                                                  'tenor'     ,
-                                                                  'yield'     ] )
-
-    df_HistoricalMarketData_FXATMVol     = pd.DataFrame( columns = [ 'type'        ,
-                                                                  'curvename'   ,
-                                                                  'date'        ,
-                                                                  'ccy_counter' ,
-                                                                  'ignore1'     ,
-                                                                  'ignore2'     ,
-                                                                  'ignore3'     ,
-                                                                  'ignore4'     ,
-                                                                  'ignore5'     ,
-                                                                  'ignore6'     ,
-                                                                  'ignore7'     ,
-                                                                  'ignore8'     ,
-                                                                  'ignore9'     ,
-                                                                  'ignore10'    ,
-                                                                  'tenor'       ,
-                                                                  'volatility'  ] )
-
-    df_HistoricalMarketData_FXDeltaVol     = pd.DataFrame( columns = [ 'type'        ,
-                                                                    'curvename'   ,
-                                                                    'date'        ,
-                                                                    'ccy_counter' ,
-                                                                    'ignore1'     ,
-                                                                    'ignore2'     ,
-                                                                    'ignore3'     ,
-                                                                    'ignore4'     ,
-                                                                    'optionType'  ,
-                                                                    'DeltaFlag'   ,
-                                                                    'ignore5'     ,
-                                                                    'ignore6'     ,
-                                                                    'ignore7'     ,
-                                                                    'ignore8'     ,
-                                                                    'ignore9'     ,
-                                                                    'ignore10'    ,
-                                                                    'ignore11'    ,
-                                                                    'DeltaValue'  ,
-                                                                    'tenor'       ,
-                                                                    'volatility'  ] )
+    df_HistoricalMarketData_Exchange   = pd.DataFrame( columns = list_columns_Exchange   )
+    df_HistoricalMarketData_Yield      = pd.DataFrame( columns = list_columns_Yield      )
+    df_HistoricalMarketData_FXATMVol   = pd.DataFrame( columns = list_columns_FXATMVol   )
+    df_HistoricalMarketData_FXDeltaVol = pd.DataFrame( columns = list_columns_FXDeltaVol )
 
     filename = str_dateIdentifier + filenameSuffix + "." + fileFormat
 
+    #-------------------------------------------------------------------------#
+    #    restrict the rows in SQL                                             #
+    #-------------------------------------------------------------------------#
+    dict_sqlQuery = { "Exchange"      : sql_Exchange      ,
+                      "FXATMVol"      : sql_FXATMVol      ,
+                      "Yield"         : sql_Yield         ,
+                      "FXDeltaVolMtx" : sql_FXDeltaVolMtx }
+
+    dict_sqlDateColumn = { "Exchange"      : '["observationDate"]'                   ,
+                           "FXATMVol"      : '["observationDate"]'                   ,
+                           "Yield"         : '[dbo].[mdm.curve].["observationDate"]' ,
+                           "FXDeltaVolMtx" : '["observationDate"]'                   }
+
+    dict_sqlWhere  = { str_type : [] for str_type in dict_sqlQuery }
+    dict_sqlParams = { str_type : [] for str_type in dict_sqlQuery }
+
+    # lookback window, the dates are stored as quoted strings "YYYY-MM-DD hh:mm:ss"
+    if nYearsLookback is not None:
+        date_end   = pd.Timestamp(datetime.datetime.strptime(str_dateIdentifier, '%Y%m%d'))
+        date_start = date_end - pd.DateOffset(years = nYearsLookback)
+
+        for str_type in dict_sqlQuery:
+            dict_sqlWhere[str_type].append(dict_sqlDateColumn[str_type] + ' >= ? and ' + \
+                                           dict_sqlDateColumn[str_type] + ' < ?')
+            dict_sqlParams[str_type].extend([ '"' + date_start.strftime('%Y-%m-%d')                         ,
+                                              '"' + (date_end + pd.Timedelta(days=1)).strftime('%Y-%m-%d') ])
+
+    # currency pairs of the product book
+    if list_FX_rates is not None:
+        list_sqlPairs = []
+        for FX_rate in sorted(set(list_FX_rates)):
+            list_sqlPairs.append('(["curveID"] = ? and ["currencyID"] = ?)')
+            dict_sqlParams["Exchange"].extend([ '"' + FX_rate[0:3] + '"', '"' + FX_rate[3:6] + '"' ])
+
+        dict_sqlWhere["Exchange"].append('(' + ' or '.join(list_sqlPairs) + ')' if len(list_sqlPairs) != 0 else '1 = 0')
+
+    #-------------------------------------------------------------------------#
+    #    requested queries run concurrently, parsed column by column          #
+    #-------------------------------------------------------------------------#
+    dict_MarketData = dict()
 
-    main_list = []
-    df = pd.read_sql(sql_Exchange, cnxn)
-    main_list.extend(df.values.tolist())
-    df = pd.read_sql(sql_FXATMVol, cnxn)
-    main_list.extend(df.values.tolist())
-    df = pd.read_sql(sql_Yield, cnxn)
-    main_list.extend(df.values.tolist())
-    df = pd.read_sql(sql_FXDeltaVolMtx, cnxn)
-    main_list.extend(df.values.tolist())
-
-#     print(len(main_list))
-    Exc = []
-    Yld = []
-    FXAtm = []
-    FXDelta = []
-
-
-    for line in main_list:
-        line[0] = line[0].replace("\"", "")
-        if line[0] == "Exchange":
-            if len(line) != 5:
-                print('[ERROR - readMarketData]. Could not read Exchange data, expecting 5 columns')
-                print('    --------- Aborting ----------')
-                completedNoError=False
-                return completedNoError, \
-                    df_HistoricalMarketData_Exchange, \
-                    df_HistoricalMarketData_Yield, \
-                    df_HistoricalMarketData_FXATMVol, \
-                    df_HistoricalMarketData_FXDeltaVol
-
-            dict_Exchange = dict()
-            dict_Exchange["type"]    = line[0].replace("\"", "").replace("\'", "")
-            dict_Exchange["ccy_FOR"] = line[1].replace("\"", "").replace("\'", "")
-            dict_Exchange["date"]    = line[2].replace("-", "/").replace("\"", "").replace("\'", "").split(" ")[0]
-            dict_Exchange["ccy_DOM"] = line[3].replace("\"", "").replace("\'", "")
-            dict_Exchange["rate"]    = float(line[4].replace("\"", "").replace("\'", ""))
-            Exc.append(dict_Exchange)
-
-
-        #---------------------------------------------------------------------#
-        #          READ YIELD DATA                                            #
-        #---------------------------------------------------------------------#
-
-        elif line[0] == "Yield":
-            if len(line) != 10:
-                print('[ERROR - readMarketData]. Could not read Yield data, expecting 10 columns')
-                print('    --------- Aborting ----------')
-                completedNoError=False
-                return completedNoError, \
-                    df_HistoricalMarketData_Exchange, \
-                    df_HistoricalMarketData_Yield, \
-                    df_HistoricalMarketData_FXATMVol, \
-                    df_HistoricalMarketData_FXDeltaVol
-
-            dict_Yield = dict()
-            dict_Yield["type"]      = line[0].replace("\"", "").replace("\'", "")
-            dict_Yield["curvename"] = line[1].replace("\"", "").replace("\'", "")
-            dict_Yield["date"]      = line[2].replace("-", "/").replace("\"", "").replace("\'", "").split(" ")[0]
-            dict_Yield["ccy_yield"] = line[3].replace("\"", "").replace("\'", "")
-            dict_Yield["ignore1"]   = line[4].replace("\"", "").replace("\'", "")
-            dict_Yield["ignore2"]   = line[5].replace("\"", "").replace("\'", "")
-            dict_Yield["ignore3"]   = line[6].replace("\"", "").replace("\'", "")
-            dict_Yield["ignore4"]   = line[7].replace("\"", "").replace("\'", "")
-            dict_Yield["tenor"]     = np.float64(line[8].replace("\"", "").replace("\'", ""))
-            dict_Yield["yield"]     = np.float64(line[9].replace("\"", "").replace("\'", ""))
-            Yld.append(dict_Yield)
-            #df_CurrentMarketData_Yield = df_CurrentMarketData_Yield.append(dict_Yield, ignore_index=True)
-
-        #---------------------------------------------------------------------#
-        #          READ FX ATM VOLATILITY DATA                                #
-        #---------------------------------------------------------------------#
-        elif line[0] == "FXATMVol":
-            if len(line) != 16:
-                print('[ERROR - readMarketData]. Could not read FXATMVol data, expecting 16 columns')
-                print('    --------- Aborting ----------')
-                completedNoError=False
-                return completedNoError, \
-                    df_HistoricalMarketData_Exchange, \
-                    df_HistoricalMarketData_Yield, \
-                    df_HistoricalMarketData_FXATMVol, \
-                    df_HistoricalMarketData_FXDeltaVol
-
-            dict_ATMVol = dict()
-            dict_ATMVol['type']        = line[0]
-            dict_ATMVol['curvename']   = line[1].replace("\"", "").replace("\'", "")
-            dict_ATMVol['date']        = line[2].replace("-", "/").replace("\"", "").replace("\'", "").split(" ")[0]
-            dict_ATMVol['ccy_counter'] = line[3].replace("\"", "").replace("\'", "")
-            dict_ATMVol['ignore1']     = line[4].replace("\"", "").replace("\'", "")
-            dict_ATMVol['ignore2']     = line[5].replace("\"", "").replace("\'", "")
-            dict_ATMVol['ignore3']     = line[6].replace("\"", "").replace("\'", "")
-            dict_ATMVol['ignore4']     = line[7].replace("\"", "").replace("\'", "")
-            dict_ATMVol['ignore5']     = line[8].replace("\"", "").replace("\'", "")
-            dict_ATMVol['ignore6']     = line[9].replace("\"", "").replace("\'", "")
-            dict_ATMVol['ignore7']     = line[10].replace("\"", "").replace("\'", "")
-            dict_ATMVol['ignore8']     = line[11].replace("\"", "").replace("\'", "")
-            dict_ATMVol['ignore9']     = line[12].replace("\"", "").replace("\'", "")
-            dict_ATMVol['ignore10']    = line[13].replace("\"", "").replace("\'", "")
-            dict_ATMVol['tenor']       = np.float64(line[14].replace("\"", "").replace("\'", ""))
-            dict_ATMVol['volatility']  = np.float64(line[15].replace("\"", "").replace("\'", ""))
-            FXAtm.append(dict_ATMVol)
-
-            #df_CurrentMarketData_FXATMVol = df_CurrentMarketData_FXATMVol.append(dict_ATMVol, ignore_index=True)
-
-
-        #---------------------------------------------------------------------#
-        #          READ FX DELTA VOLATILITY DATA                              #
-        #---------------------------------------------------------------------#
-
-        elif line[0] == "FXDeltaVolMtx":
-            if len(line) != 20:
-                print('[ERROR - readMarketData]. Could not read FXDeltaVolMtx data, expecting 20 columns')
-                print('    --------- Aborting ----------')
-                completedNoError=False
-                return completedNoError, \
-                    df_HistoricalMarketData_Exchange, \
-                    df_HistoricalMarketData_Yield, \
-                    df_HistoricalMarketData_FXATMVol, \
-                    df_HistoricalMarketData_FXDeltaVol
-
-            dict_DeltaVol = dict()
-            dict_DeltaVol['type']        = line[0].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['curvename']   = line[1].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['date']        = line[2].replace("-", "/").replace("\"", "").replace("\'", "").split(" ")[0]
-            dict_DeltaVol['ccy_counter'] = line[3].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['ignore1']     = line[4].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['ignore2']     = line[5].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['ignore3']     = line[6].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['ignore4']     = line[7].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['optionType']  = line[8].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['DeltaFlag']   = line[9].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['ignore5']     = line[10].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['ignore6']     = line[11].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['ignore7']     = line[12].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['ignore8']     = line[13].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['ignore9']     = line[14].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['ignore10']    = line[15].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['ignore11']    = line[16].replace("\"", "").replace("\'", "")
-            dict_DeltaVol['DeltaValue']  = np.float64(line[17].replace("\"", "").replace("\'", ""))
-            dict_DeltaVol['tenor']       = np.float64(line[18].replace("\"", "").replace("\'", ""))
-            dict_DeltaVol['volatility']  = np.float64(line[19].replace("\"", "").replace("\'", ""))
-            FXDelta.append(dict_DeltaVol)
-            #df_CurrentMarketData_FXDeltaVol = df_CurrentMarketData_FXDeltaVol.append(dict_DeltaVol, ignore_index=True)
+    list_queries = []
+    for str_type in list_typesToRead:
+        # served from the local store below
+        if str_type == "Exchange" and useStore == True:
+            continue
 
-        else:
-            print('[ERROR - readCurrentMarketData]. Unknown MarketData type:')
-            print(line)
+        sql_query = dict_sqlQuery[str_type]
+        if len(dict_sqlWhere[str_type]) != 0:
+            sql_query = sql_query + '\n where ' + ' and '.join(dict_sqlWhere[str_type])
+
+        list_queries.append((str_type, sql_query, dict_sqlParams[str_type]))
+
+    dict_queryResults = run_MarketDataQueries(list_queries)
+
+    for str_type, sql_query, list_params in list_queries:
+        df_MarketData = parse_MarketDataQuery( df_query = dict_queryResults[str_type] ,
+                                               str_type = str_type                    )
+        if df_MarketData is None:
+            completedNoError=False
+            return completedNoError, \
+                df_HistoricalMarketData_Exchange, \
+                df_HistoricalMarketData_Yield, \
+                df_HistoricalMarketData_FXATMVol, \
+                df_HistoricalMarketData_FXDeltaVol
+
+        dict_MarketData[str_type] = df_MarketData
+
+    #-------------------------------------------------------------------------#
+    #    Exchange: fetch the delta into the local store, then read the store  #
+    #-------------------------------------------------------------------------#
+    if "Exchange" in list_typesToRead and useStore == True:
+        if updateHistoricalStore_Exchange( sql_Exchange  = sql_Exchange      ,
+                                           list_FX_rates = list_FX_rates     ,
+                                           flag_rebuild  = flag_rebuildStore ) == False:
             completedNoError=False
             return completedNoError, \
                 df_HistoricalMarketData_Exchange, \
@@ -666,20 +960,23 @@ def readHistoricalMarketData( str_dateIdentifier                              ,
                 df_HistoricalMarketData_FXATMVol, \
                 df_HistoricalMarketData_FXDeltaVol
 
-    df_HistoricalMarketData_Exchange = df_HistoricalMarketData_Exchange.append(Exc, ignore_index=False)
-    df_HistoricalMarketData_Yield = df_HistoricalMarketData_Yield.append(Yld, ignore_index=False)
-    df_HistoricalMarketData_FXATMVol = df_HistoricalMarketData_FXATMVol.append(FXAtm, ignore_index=False)
-    df_HistoricalMarketData_FXDeltaVol = df_HistoricalMarketData_FXDeltaVol.append(FXDelta, ignore_index=False)
+        dict_MarketData["Exchange"] = loadHistoricalStore_Exchange( list_FX_rates      = list_FX_rates      ,
+                                                                    str_dateIdentifier = str_dateIdentifier ,
+                                                                    nYearsLookback     = nYearsLookback     )
 
+    df_HistoricalMarketData_Exchange   = dict_MarketData.get("Exchange"     , df_HistoricalMarketData_Exchange  )
+    df_HistoricalMarketData_Yield      = dict_MarketData.get("Yield"        , df_HistoricalMarketData_Yield     )
+    df_HistoricalMarketData_FXATMVol   = dict_MarketData.get("FXATMVol"     , df_HistoricalMarketData_FXATMVol  )
+    df_HistoricalMarketData_FXDeltaVol = dict_MarketData.get("FXDeltaVolMtx", df_HistoricalMarketData_FXDeltaVol)
 
     completedNoError=True
-#     print(df_CurrentMarketData_Yield.head())
     return completedNoError, \
         df_HistoricalMarketData_Exchange, \
         df_HistoricalMarketData_Yield, \
         df_HistoricalMarketData_FXATMVol, \
         df_HistoricalMarketData_FXDeltaVol
- ###############################################################################
+
+###############################################################################
 #        READ SETTINGS FILE                                                   #
 ###############################################################################
 def readSettings(filename="Settings.json"):
@@ -770,6 +1067,64 @@ def readSettings(filename="Settings.json"):
         print('---------- Aborting Run ----------')
         return None
 
+    #-------------------------------------------------------------------------#
+    # optional keywords: fill in default values                               #
+    #-------------------------------------------------------------------------#
+    # full            ... simulate every trading day of the PRIIPs paths
+    # observationDays ... only simulate the days that are read by the payoffs
+    dict_settingsInfo.setdefault("PRIIPsPathMode", "full")
+
+    if dict_settingsInfo["PRIIPsPathMode"] not in ["full", "observationDays"]:
+        print('[ERROR]. The keyword PRIIPsPathMode needs to be full or observationDays')
+        print('Found: ', dict_settingsInfo["PRIIPsPathMode"])
+        print('---------- Aborting Run ----------')
+        return None
+
+    # number of processes the FX pairs are simulated on (1 ... sequential)
+    dict_settingsInfo.setdefault("nSimulationWorkers", 1)
+
+    if not isinstance(dict_settingsInfo["nSimulationWorkers"], int) or dict_settingsInfo["nSimulationWorkers"] < 1:
+        print('[ERROR]. The keyword nSimulationWorkers needs to be an integer >= 1')
+        print('Found: ', dict_settingsInfo["nSimulationWorkers"])
+        print('---------- Aborting Run ----------')
+        return None
+
+    # years of historical market data read up to the tradeDate (None ... all)
+    dict_settingsInfo.setdefault("nYearsHistoricalData", None)
+
+    if dict_settingsInfo["nYearsHistoricalData"] is not None and \
+       (not isinstance(dict_settingsInfo["nYearsHistoricalData"], int) or dict_settingsInfo["nYearsHistoricalData"] < 1):
+        print('[ERROR]. The keyword nYearsHistoricalData needs to be an integer >= 1 or null')
+        print('Found: ', dict_settingsInfo["nYearsHistoricalData"])
+        print('---------- Aborting Run ----------')
+        return None
+
+    # historical Exchange data from the append-only local store (see readData.py)
+    #   incrementalHistoricalData ... only fetch observations newer than the store
+    #   rebuildHistoricalData     ... fetch the full history into the store again
+    dict_settingsInfo.setdefault("incrementalHistoricalData", False)
+    dict_settingsInfo.setdefault("rebuildHistoricalData"    , False)
+
+    # keep the log returns and their statistics per FX pair in memory and on disk (see LogReturnCache.py)
+    dict_settingsInfo.setdefault("useLogReturnCache", False)
+
+    # serve CurrentMarketData of the tradeDate from the local snapshot (see readData.py)
+    dict_settingsInfo.setdefault("useMarketDataSnapshot", False)
+
+    # process-level cache of the workflow inputs (see WorkflowInputs.py)
+    #   useInputCache     ... keep market data, random indices and mappings in memory
+    #   preloadInputCache ... load them when the API worker starts
+    #   inputCacheSize    ... number of (tradeDate, SettingsFile) entries
+    #   inputCacheTTL     ... seconds until an entry is read again
+    dict_settingsInfo.setdefault("useInputCache"    , False)
+    dict_settingsInfo.setdefault("preloadInputCache", False)
+    dict_settingsInfo.setdefault("inputCacheSize"   , 4)
+    dict_settingsInfo.setdefault("inputCacheTTL"    , 3600)
+
+    # database connection pool (None ... taken from the environment, see DBConnection.py)
+    dict_settingsInfo.setdefault("dbConnectionString", None)
+    dict_settingsInfo.setdefault("dbPoolSize"        , None)
+
     return dict_settingsInfo
 
 ###############################################################################
@@ -1,3 +1,1301 @@
+import os
+import json
+import sqlite3
+import tempfile
+import threading
+from unittest import mock
+import numpy as np
+import pandas as pd
+import scipy.stats as ss
+from datetime import datetime, timedelta
+
 from django.test import TestCase
 
-# Create your tests here.
+from .src_demo_new.lib.Pricing import value_FX_Option_GarmanKohlhagen       , \
+                                      value_FX_Option_GarmanKohlhagen_Array , \
+                                      class_FX_Vol_Malz                     , \
+                                      MalzGetVol_Array                      , \
+                                      MalzGetStrikeForDelta_Array
+
+from .src_demo_new.lib.DateLogic import networkdays                  , \
+                                        addTenor                     , \
+                                        getHolidaysBetween           , \
+                                        getYearFraction              , \
+                                        clear_DateLogicCache         , \
+                                        networkdays_Array            , \
+                                        addTenor_Array               , \
+                                        convertDatetime64_toStrDates
+
+from .src_demo_new.lib.FX_Forward import class_FX_Forward
+from .src_demo_new.lib.FX_Swap import class_FX_Swap
+from .src_demo_new.lib.FX_Option import class_FX_Option
+from .src_demo_new.lib.FX_DCI import class_FX_DCI
+from .src_demo_new.lib.FX_ODF import class_FX_ODF
+from .src_demo_new.lib.ProductBook import class_ProductBook
+from .src_demo_new.lib.LogInformation import getAllClassAttributes
+from .src_demo_new.lib.Payoffs import update_Payoffs_ProductBook
+from .src_demo_new.lib.Bootstrap import select_RandomIndices                  , \
+                                        calculate_ItoTerm                     , \
+                                        calculate_ShiftTerm                   , \
+                                        calculate_PRIIPsPaths_Matrix          , \
+                                        calculate_PRIIPsPaths_ObservationDays , \
+                                        calculate_stressed_vol
+from .src_demo_new.lib.DBConnection import class_ConnectionPool
+from .src_demo_new.lib import readData
+from .src_demo_new.lib import LogReturnCache
+from .src_demo_new.lib import WorkflowInputs
+from .src_demo_new.lib.Cache import class_LRUCache, memoize_LRU
+
+###############################################################################
+#        GARMAN-KOHLHAGEN                                                     #
+###############################################################################
+def value_GarmanKohlhagen_Reference(spot, strike, volatility, yield_FOR, yield_DOM, T, isCall, isSET_FOR, CallAmount):
+    """
+    Garman-Kohlhagen formula as it was written before the array pricer
+    (option value for one unit of FOR, scaled to the settlement currency)
+    """
+    d1 =  (np.log(spot/strike) + (yield_DOM - yield_FOR + volatility**2 / 2) * T) / \
+          (volatility * np.sqrt(T))
+    d2 =  d1 - volatility*np.sqrt(T)
+
+    if isCall:
+        value = spot * np.exp(-yield_FOR*T) * ss.norm.cdf(d1) - \
+                strike * np.exp(-yield_DOM*T) * ss.norm.cdf(d2)
+    else:
+        value = strike * np.exp(-yield_DOM*T) * ss.norm.cdf(-d2) - \
+                spot * np.exp(-yield_FOR*T) * ss.norm.cdf(-d1)
+
+    if isSET_FOR:
+        return value * CallAmount / spot
+    return value * CallAmount
+
+class class_Test_GarmanKohlhagen(TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(2018)
+
+        nOptions = 2000
+
+        self.arr_spot       = rng.uniform(0.5, 2.0, nOptions)
+        self.arr_strike     = self.arr_spot * rng.uniform(0.7, 1.3, nOptions)
+        self.arr_volatility = rng.uniform(0.03, 0.40, nOptions)
+        self.arr_yield_FOR  = rng.uniform(-0.01, 0.05, nOptions)
+        self.arr_yield_DOM  = rng.uniform(-0.01, 0.08, nOptions)
+        self.arr_T          = rng.uniform(0.01, 2.0, nOptions)
+        self.arr_isCall     = np.arange(nOptions) % 2 == 0
+        self.arr_isSET_FOR  = np.arange(nOptions) % 4 < 2
+        self.arr_CallAmount = np.where(np.arange(nOptions) % 8 < 4, 10000.0, 12345.67)
+
+    def get_ScalarArguments(self, i):
+        return ( float(self.arr_spot[i])       ,
+                 float(self.arr_strike[i])     ,
+                 float(self.arr_volatility[i]) ,
+                 float(self.arr_yield_FOR[i])  ,
+                 float(self.arr_yield_DOM[i])  ,
+                 float(self.arr_T[i])          )
+
+    def test_scalar_matches_reference(self):
+        # the scalar pricer feeds the DCI OptionValue (REO InvestmentAmount): bit for bit
+        for i in range(self.arr_spot.size):
+            spot, strike, volatility, yield_FOR, yield_DOM, T = self.get_ScalarArguments(i)
+
+            ccy_SET = 'EUR' if self.arr_isSET_FOR[i] else 'USD'
+            optionType = 'Call' if self.arr_isCall[i] else 'Put'
+
+            value = value_FX_Option_GarmanKohlhagen( spot, strike, volatility, yield_FOR, yield_DOM, T,
+                                                     'EUR', 'USD', ccy_SET, optionType,
+                                                     float(self.arr_CallAmount[i]) )
+
+            value_reference = value_GarmanKohlhagen_Reference( spot, strike, volatility, yield_FOR, yield_DOM, T,
+                                                               self.arr_isCall[i], self.arr_isSET_FOR[i],
+                                                               float(self.arr_CallAmount[i]) )
+            self.assertEqual(value, value_reference)
+
+    def test_scalar_errors(self):
+        self.assertIsNone(value_FX_Option_GarmanKohlhagen(1.1, 1.1, 0.1, 0.0, 0.01, 0.5, 'EUR', 'USD', 'GBP', 'Call', 10000))
+        self.assertIsNone(value_FX_Option_GarmanKohlhagen(1.1, 1.1, 0.1, 0.0, 0.01, 0.5, 'EUR', 'USD', 'EUR', 'Straddle', 10000))
+
+    def test_array_matches_scalar(self):
+        arr_value = value_FX_Option_GarmanKohlhagen_Array( spot          = self.arr_spot       ,
+                                                           strike        = self.arr_strike     ,
+                                                           volatility    = self.arr_volatility ,
+                                                           yield_FOR     = self.arr_yield_FOR  ,
+                                                           yield_DOM     = self.arr_yield_DOM  ,
+                                                           T             = self.arr_T          ,
+                                                           arr_isCall    = self.arr_isCall     ,
+                                                           arr_isSET_FOR = self.arr_isSET_FOR  ,
+                                                           CallAmount    = self.arr_CallAmount )
+
+        arr_reference = np.array([ value_GarmanKohlhagen_Reference( *self.get_ScalarArguments(i),
+                                                                    self.arr_isCall[i], self.arr_isSET_FOR[i],
+                                                                    float(self.arr_CallAmount[i]) ) \
+                                   for i in range(self.arr_spot.size) ])
+
+        np.testing.assert_allclose(arr_value, arr_reference, rtol=1e-12, atol=1e-9)
+
+###############################################################################
+#        MALZ SMILE / DELTA-TO-STRIKE                                         #
+###############################################################################
+class class_Test_Malz(TestCase):
+
+    def setUp(self):
+        self.RR_25  = -0.0065
+        self.MS_25  =  0.0021
+        self.VolAtm =  0.0815
+
+        self.Spot   = 1.1634
+        self.Rd     = 0.0231
+        self.Rf     = -0.0035
+
+        # deltas on both sides of the ATM point, tenors around the 719 days switch
+        self.arr_delta = np.array([5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 75, 80, 85, 90, 95], dtype=float)
+        self.arr_TDays = np.array([2, 7, 30, 91, 182, 365, 540, 719, 720, 900, 1095])
+
+    def test_vol_matches_class(self):
+        MalzCalculator = class_FX_Vol_Malz('EUR', 'USD', self.RR_25, self.MS_25, self.VolAtm, 'SPOT')
+
+        arr_Vol = MalzGetVol_Array(self.RR_25, self.MS_25, self.VolAtm, self.arr_delta)
+
+        arr_reference = np.array([ MalzCalculator.MalzGetVol(self.RR_25, self.MS_25, self.VolAtm, delta) for delta in self.arr_delta ])
+
+        np.testing.assert_allclose(arr_Vol, arr_reference, rtol=1e-14, atol=0.0)
+
+    def test_strike_matches_class(self):
+        # (delta x tenor) grid, one call per DeltaFlag
+        arr_delta, arr_TDays = np.meshgrid(self.arr_delta, self.arr_TDays, indexing='ij')
+        arr_T   = arr_TDays / 365.0
+        arr_Vol = MalzGetVol_Array(self.RR_25, self.MS_25, self.VolAtm, arr_delta)
+
+        for DeltaFlag in ['SPOT', 'FORWARD', 'SPOT-719-FORWARD']:
+            MalzCalculator = class_FX_Vol_Malz('EUR', 'USD', self.RR_25, self.MS_25, self.VolAtm, DeltaFlag)
+
+            arr_Strike = MalzGetStrikeForDelta_Array( DeltaFlag = DeltaFlag  ,
+                                                      Spot      = self.Spot  ,
+                                                      Vol       = arr_Vol    ,
+                                                      T         = arr_T      ,
+                                                      Rd        = self.Rd    ,
+                                                      Rf        = self.Rf    ,
+                                                      delta     = arr_delta  ,
+                                                      TDays     = arr_TDays  )
+
+            arr_reference = np.empty(arr_delta.shape)
+            for index in np.ndindex(arr_delta.shape):
+                arr_reference[index] = MalzCalculator.MalzGetStrikeForDelta( DeltaFlag = DeltaFlag                 ,
+                                                                             Spot      = self.Spot                 ,
+                                                                             Vol       = float(arr_Vol[index])     ,
+                                                                             T         = float(arr_T[index])       ,
+                                                                             Rd        = self.Rd                   ,
+                                                                             Rf        = self.Rf                   ,
+                                                                             delta     = float(arr_delta[index])   ,
+                                                                             TDays     = int(arr_TDays[index])     )
+
+            np.testing.assert_allclose(arr_Strike, arr_reference, rtol=1e-13, atol=0.0, err_msg=DeltaFlag)
+
+    def test_strike_mixed_DeltaFlags(self):
+        # one DeltaFlag per option, unknown flags give NaN
+        arr_DeltaFlag = np.array(['SPOT', 'FORWARD', 'SPOT-719-FORWARD', 'SPOT-719-FORWARD', 'UNKNOWN'])
+        arr_TDays     = np.array([365, 365, 365, 900, 365])
+        arr_T         = arr_TDays / 365.0
+
+        arr_Strike = MalzGetStrikeForDelta_Array( DeltaFlag = arr_DeltaFlag ,
+                                                  Spot      = self.Spot     ,
+                                                  Vol       = self.VolAtm   ,
+                                                  T         = arr_T         ,
+                                                  Rd        = self.Rd       ,
+                                                  Rf        = self.Rf       ,
+                                                  delta     = 40.0          ,
+                                                  TDays     = arr_TDays     )
+
+        for i, DeltaFlag in enumerate(arr_DeltaFlag[:-1]):
+            MalzCalculator = class_FX_Vol_Malz('EUR', 'USD', self.RR_25, self.MS_25, self.VolAtm, DeltaFlag)
+            Strike = MalzCalculator.MalzGetStrikeForDelta(DeltaFlag, self.Spot, self.VolAtm, float(arr_T[i]), self.Rd, self.Rf, 40.0, int(arr_TDays[i]))
+
+            self.assertAlmostEqual(arr_Strike[i], Strike, places=12)
+
+        self.assertTrue(np.isnan(arr_Strike[-1]))
+
+###############################################################################
+#        DATE ARITHMETIC FOR ARRAYS OF DATES                                  #
+###############################################################################
+class class_Test_DateLogicArrays(TestCase):
+
+    def setUp(self):
+        # every day of 2017/2018: month ends (31/01, 28/02, 30/04, ...),
+        # Christmas, Easter (30/03/2018 - 02/04/2018), bank holidays, weekends
+        date_start = datetime(2017, 1, 1)
+        self.list_dates = [ (date_start + timedelta(days=i)).strftime('%d/%m/%Y') for i in range(730) ]
+
+        # plus the 29/02 of a leap year and the month ends around it
+        self.list_dates += ['31/01/2016', '29/02/2016', '31/03/2016', '31/08/2016', '30/12/2016']
+
+    def test_addTenor_matches_scalar(self):
+        for shift in ['2D', '-2D', '1W', '1M', '-1M', '3M', '6M', '12M', '1Y', '2Y']:
+            for flag_excludeNonBusinessDay in [True, False]:
+                list_scalar = [ addTenor(cdate, shift, flag_excludeNonBusinessDay=flag_excludeNonBusinessDay) for cdate in self.list_dates ]
+
+                arr_dates  = addTenor_Array(self.list_dates, shift, flag_excludeNonBusinessDay=flag_excludeNonBusinessDay)
+                list_array = convertDatetime64_toStrDates(arr_dates)
+
+                self.assertEqual(list_array, list_scalar, msg=shift + ' ' + str(flag_excludeNonBusinessDay))
+
+    def test_addTenor_shift_per_date(self):
+        list_shifts = ['2D', '1M', '-2D', '6M', '1Y'] * 2
+        list_dates  = self.list_dates[:len(list_shifts)]
+
+        list_scalar = [ addTenor(cdate, shift) for cdate, shift in zip(list_dates, list_shifts) ]
+
+        self.assertEqual(convertDatetime64_toStrDates(addTenor_Array(list_dates, list_shifts)), list_scalar)
+
+    def test_networkdays_matches_scalar(self):
+        for shift in ['2D', '1M', '3M', '6M', '1Y']:
+            list_end_dates = [ addTenor(cdate, shift) for cdate in self.list_dates ]
+
+            list_scalar = [ networkdays(start_date, end_date, getHolidaysBetween(start_date, end_date, COUNTRY_HOLIDAYS = 'England')) \
+                            for start_date, end_date in zip(self.list_dates, list_end_dates) ]
+
+            arr_networkdays = networkdays_Array(self.list_dates, list_end_dates, COUNTRY_HOLIDAYS = 'England')
+
+            self.assertEqual([ int(n) for n in arr_networkdays ], list_scalar, msg=shift)
+
+###############################################################################
+#        PRODUCT BOOK: PRODUCTS AS ROW VIEWS                                  #
+###############################################################################
+def setup_ForwardBook(list_ReceiveAmounts):
+    """
+    FX_Forwards with the attributes preProcessing would set (no market data needed)
+    """
+    list_products = []
+
+    for product_id, ReceiveAmount in enumerate(list_ReceiveAmounts):
+        product = class_FX_Forward( 'EUR', 'USD', 'EUR', 'EUR', ReceiveAmount, 'USD', None,
+                                    '6M', ['long', 'short'][product_id % 2], 0.01, 'deliverable', 1, 2, 3 )
+        product.set_productID(product_id)
+        product.set_tradeDate('25/06/2018')
+
+        product.strike                  = 1.1634 + 0.001*product_id
+        product.nTradingDaysRHP         = 125 + product_id
+        product.list_requiredUnderlyers = ['EURUSD']
+
+        list_products.append(product)
+
+    return list_products
+
+class class_Test_ProductBook(TestCase):
+
+    def setUp(self):
+        # ReceiveAmount: int and float in one column, PayAmount: always None
+        self.list_products = setup_ForwardBook([10000, 12345.5, 10000, 7500.25])
+
+        # strike: None for one product
+        self.list_products[2].strike = None
+
+        self.list_attributes = [ getAllClassAttributes(product) for product in self.list_products ]
+
+        self.obj_ProductBook = class_ProductBook(list_products = self.list_products)
+        self.obj_table       = self.obj_ProductBook.get_Table('FX_Forward')
+
+    def test_roundtrip(self):
+        # every attribute reads back with the same value and type
+        for product, dict_attributes in zip(self.list_products, self.list_attributes):
+            dict_attributes_book = getAllClassAttributes(product)
+
+            self.assertEqual(sorted(dict_attributes_book.keys()), sorted(dict_attributes.keys()))
+
+            for name, value in dict_attributes.items():
+                self.assertEqual(dict_attributes_book[name], value, msg=name)
+                self.assertIs(type(dict_attributes_book[name]), type(value), msg=name)
+
+    def test_log_attributes(self):
+        # the product log holds the attributes of the product only, no
+        # class-level lists and no internals of the row view
+        for product, dict_attributes in zip(self.list_products, self.list_attributes):
+            set_expected = set( name for name, value in product.__dict__.items() if not name.startswith('_') )
+            set_expected.update(self.obj_table.dict_columns.keys())
+
+            self.assertEqual(set(getAllClassAttributes(product).keys()), set_expected)
+            self.assertEqual(set(dict_attributes.keys())               , set_expected)
+
+    def test_columns(self):
+        self.assertEqual(self.obj_table.get_Column('nTradingDaysRHP').dtype, np.int64)
+        self.assertEqual(self.obj_table.get_Column('ReceiveAmount').dtype  , np.float64)
+        self.assertEqual(self.obj_table.get_Column('strike').dtype         , np.float64)
+        self.assertEqual(self.obj_table.get_Column('positionType').dtype   , object)
+
+        # lists stay on the product
+        self.assertNotIn('list_requiredUnderlyers', self.obj_table.dict_columns)
+        self.assertIn('list_requiredUnderlyers', self.list_products[0].__dict__)
+        self.assertNotIn('strike', self.list_products[0].__dict__)
+
+    def test_None(self):
+        self.assertIsNone(self.list_products[0].PayAmount)
+        self.assertIsNone(self.list_products[2].strike)
+        self.assertTrue(np.isnan(self.obj_table.get_Column('strike')[2]))
+
+        self.list_products[1].strike = None
+        self.assertIsNone(self.list_products[1].strike)
+
+        self.list_products[1].strike = 1.17
+        self.assertEqual(self.list_products[1].strike, 1.17)
+
+    def test_int_in_float_column(self):
+        self.assertEqual(self.list_products[0].ReceiveAmount, 10000)
+        self.assertIs(type(self.list_products[0].ReceiveAmount), int)
+        self.assertIs(type(self.list_products[1].ReceiveAmount), float)
+
+        self.list_products[1].ReceiveAmount = 20000
+        self.assertIs(type(self.list_products[1].ReceiveAmount), int)
+
+        self.list_products[0].ReceiveAmount = 20000.0
+        self.assertIs(type(self.list_products[0].ReceiveAmount), float)
+
+    def test_widening_to_object(self):
+        # a str in a float column --> object column, the other rows keep value and type
+        self.list_products[3].ReceiveAmount = 'n/a'
+
+        self.assertEqual(self.obj_table.get_Column('ReceiveAmount').dtype, object)
+        self.assertEqual(self.list_products[3].ReceiveAmount, 'n/a')
+        self.assertEqual(self.list_products[0].ReceiveAmount, 10000)
+        self.assertIs(type(self.list_products[0].ReceiveAmount), int)
+        self.assertEqual(self.list_products[1].ReceiveAmount, 12345.5)
+
+        # a float in an int column
+        self.list_products[0].nTradingDaysRHP = 62.5
+
+        self.assertEqual(self.list_products[0].nTradingDaysRHP, 62.5)
+        self.assertEqual(self.list_products[1].nTradingDaysRHP, 126)
+        self.assertIs(type(self.list_products[1].nTradingDaysRHP), int)
+
+    def test_write_through(self):
+        # writes go to the column and are seen by code working on the whole book
+        self.list_products[1].nTradingDaysRHP = 63
+
+        self.assertEqual(self.obj_table.get_Column('nTradingDaysRHP')[1], 63)
+        self.assertEqual(self.obj_ProductBook.get_Column('FX_Forward', 'nTradingDaysRHP').tolist(), [125, 63, 127, 128])
+        self.assertNotIn('nTradingDaysRHP', self.list_products[1].__dict__)
+
+        # new attributes stay on the product
+        self.list_products[1].GrossAmount_Test = 1.5
+        self.assertEqual(self.list_products[1].__dict__['GrossAmount_Test'], 1.5)
+
+    def test_products_with_error_are_not_in_the_book(self):
+        list_products = setup_ForwardBook([10000, 10000])
+        list_products[1].set_ErrorMessage()
+
+        obj_ProductBook = class_ProductBook(list_products = list_products)
+
+        self.assertEqual(obj_ProductBook.get_Statistics()['FX_Forward']['products'], 1)
+        self.assertIn('strike', list_products[1].__dict__)
+
+###############################################################################
+#        BATCHED PAYOFFS                                                      #
+###############################################################################
+def setup_PayoffBook():
+    """
+    Products of every type, long/short, Call/Put, settled in FOR (EURUSD)
+    and in DOM (XAUUSD), with the attributes preProcessing would set.
+    DCIs are short Calls (the only setup with a payoff).
+    """
+    rng = np.random.default_rng(25)
+
+    dict_spot = { 'EURUSD' : 1.1634, 'XAUUSD' : 1265.3 }
+
+    list_products = []
+
+    for FX_rate, ccy_SET in [('EURUSD', 'EUR'), ('EURUSD', 'USD'), ('XAUUSD', 'USD')]:
+        ccy_FOR, ccy_DOM = FX_rate[:3], FX_rate[3:]
+
+        for positionType in ['long', 'short']:
+            for optionType in ['Call', 'Put']:
+                for ReceiveAmount in [10000, 12345.67]:
+
+                    list_productsNew = [ class_FX_Forward( ccy_FOR, ccy_DOM, ccy_SET, ccy_FOR, ReceiveAmount, ccy_DOM, None,
+                                                           '6M', positionType, 0.01, 'deliverable', 1, 2, 3 )                 ,
+                                         class_FX_Swap( ccy_FOR, ccy_DOM, ccy_SET, ccy_FOR, ReceiveAmount, ccy_DOM, None,
+                                                        ccy_FOR, ReceiveAmount, ccy_DOM, None, '6M', positionType, 0.01, 1, 2, 3 ) ,
+                                         class_FX_Option( ccy_FOR, ccy_DOM, ccy_SET, ccy_FOR, ReceiveAmount, ccy_DOM, None,
+                                                          '6M', positionType, optionType, 0.01, 'deliverable', 1, 2, 3 )      ,
+                                         class_FX_ODF( ccy_FOR, ccy_DOM, ccy_SET, ccy_FOR, ReceiveAmount, ccy_DOM, None,
+                                                       '1M', '6M', positionType, 0.01, 'deliverable', 1, 2, 3 )               ]
+
+                    if positionType == 'short' and optionType == 'Call':
+                        product = class_FX_DCI( ccy_FOR, ccy_DOM, ccy_SET, ccy_FOR, ReceiveAmount, ccy_DOM, None,
+                                                '6M', 'InterestAtRisk', 0.01, 1, 2, 3 )
+                        product.positionType = positionType
+                        product.optionType   = optionType
+                        list_productsNew.append(product)
+
+                    for product in list_productsNew:
+                        product.set_productID(len(list_products))
+                        product.set_tradeDate('25/06/2018')
+
+                        product.strike                  = dict_spot[FX_rate] * rng.uniform(0.95, 1.05)
+                        product.nTradingDaysRHP         = int(rng.integers(60, 130))
+                        product.list_requiredUnderlyers = [FX_rate]
+
+                        if product.product_type == 'FX_ODF':
+                            product.nTradingDaysIntermediate = int(rng.integers(15, 25))
+                            product.ForwardAccrualFactor     = 1.0 + rng.uniform(0.0, 0.01)
+
+                        list_products.append(product)
+
+    return list_products, dict_spot
+
+def setup_PayoffPaths(list_products, dict_spot, nTradingDays, nSims, flag_observationDays):
+    """
+    Random paths per FX pair, rows = trading day - 1; only the payoff days
+    of the products with flag_observationDays (PRIIPsPathMode observationDays)
+    """
+    rng = np.random.default_rng(2018)
+
+    if flag_observationDays == True:
+        set_observationDays = set()
+        for product in list_products:
+            set_observationDays.update(product.get_requiredObservationDays())
+        arr_rowIndex = np.array(sorted(set_observationDays)) - 1
+    else:
+        arr_rowIndex = np.arange(nTradingDays)
+
+    dict_paths = dict()
+    for FX_rate, spot_rate in dict_spot.items():
+        arr_paths = spot_rate * np.exp(np.cumsum(rng.normal(0.0, 0.006, (nTradingDays, nSims)), axis=0))
+        dict_paths[FX_rate] = pd.DataFrame(arr_paths[arr_rowIndex], index=arr_rowIndex)
+
+    return dict_paths
+
+class class_Test_Payoffs(TestCase):
+
+    def check_PayoffsMatch(self, flag_observationDays):
+        list_products, dict_spot = setup_PayoffBook()
+
+        dict_paths_FMU = setup_PayoffPaths(list_products, dict_spot, 130, 500, flag_observationDays)
+        dict_paths_S   = setup_PayoffPaths(list_products, dict_spot, 130, 500, flag_observationDays)
+
+        # per product (as before the batched pass)
+        list_payoffs = [ ( np.asarray(product.calculate_payoff(dict_paths = dict_paths_FMU), dtype=np.float64) ,
+                           np.asarray(product.calculate_payoff(dict_paths = dict_paths_S)  , dtype=np.float64) ) \
+                         for product in list_products ]
+
+        obj_ProductBook = class_ProductBook(list_products = list_products)
+
+        set_productsEvaluated = update_Payoffs_ProductBook( obj_ProductBook = obj_ProductBook ,
+                                                            dict_paths_FMU  = dict_paths_FMU  ,
+                                                            dict_paths_S    = dict_paths_S    )
+
+        # every product of the book is covered
+        self.assertEqual(len(set_productsEvaluated), len(list_products))
+
+        for product, (arr_payoffs_FMU, arr_payoffs_S) in zip(list_products, list_payoffs):
+            msg = product.product_type + ' ' + product.positionType + ' ' + str(getattr(product, 'optionType', '')) + \
+                  ' ' + product.ccy_FOR + product.ccy_DOM + ' SET ' + product.ccy_SET
+
+            # bit for bit
+            np.testing.assert_array_equal(product.arr_payoffs_FMU, arr_payoffs_FMU, err_msg=msg)
+            np.testing.assert_array_equal(product.arr_payoffs_S  , arr_payoffs_S  , err_msg=msg)
+
+    def test_full_paths(self):
+        self.check_PayoffsMatch(flag_observationDays = False)
+
+    def test_observationDays(self):
+        self.check_PayoffsMatch(flag_observationDays = True)
+
+    def test_unsupported_products_are_left_out(self):
+        list_products, dict_spot = setup_PayoffBook()
+
+        # DCI that is not a short Call, unknown settlement currency
+        product_DCI = [ product for product in list_products if product.product_type == 'FX_DCI' ][0]
+        product_DCI.positionType = 'long'
+
+        list_products[0].ccy_SET = 'GBP'
+
+        dict_paths = setup_PayoffPaths(list_products, dict_spot, 130, 100, False)
+
+        obj_ProductBook = class_ProductBook(list_products = list_products)
+
+        set_productsEvaluated = update_Payoffs_ProductBook( obj_ProductBook = obj_ProductBook ,
+                                                            dict_paths_FMU  = dict_paths      ,
+                                                            dict_paths_S    = dict_paths      )
+
+        self.assertEqual(len(set_productsEvaluated), len(list_products) - 2)
+        self.assertNotIn(list_products[0], set_productsEvaluated)
+        self.assertNotIn(product_DCI     , set_productsEvaluated)
+
+###############################################################################
+#        DATABASE CONNECTION POOL                                             #
+###############################################################################
+class class_FakeCursor:
+    def execute(self, sql_query, *args):
+        # pd.read_sql wraps the driver error in pandas' DatabaseError
+        raise sqlite3.OperationalError('Communication link failure')
+
+    def close(self):
+        pass
+
+class class_FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def cursor(self):
+        return class_FakeCursor()
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+class class_FakeConnectionPool(class_ConnectionPool):
+    def open_connection(self):
+        return class_FakeConnection()
+
+class class_Test_ConnectionPool(TestCase):
+
+    def test_connection_is_reused(self):
+        obj_ConnectionPool = class_FakeConnectionPool('fake', pool_size = 2)
+
+        with obj_ConnectionPool.connection() as cnxn:
+            cnxn_first = cnxn
+
+        with obj_ConnectionPool.connection() as cnxn:
+            self.assertIs(cnxn, cnxn_first)
+
+        self.assertFalse(cnxn_first.closed)
+        self.assertEqual(obj_ConnectionPool.nConnections, 1)
+
+    def test_error_in_read_sql_discards_connection(self):
+        obj_ConnectionPool = class_FakeConnectionPool('fake', pool_size = 1)
+
+        with self.assertRaises(pd.errors.DatabaseError):
+            with obj_ConnectionPool.connection() as cnxn:
+                cnxn_broken = cnxn
+                pd.read_sql('select * from MarketData', cnxn)
+
+        # closed and not handed out again
+        self.assertTrue(cnxn_broken.closed)
+        self.assertEqual(obj_ConnectionPool.nConnections, 0)
+
+        with obj_ConnectionPool.connection(timeout = 0.1) as cnxn:
+            self.assertIsNot(cnxn, cnxn_broken)
+
+###############################################################################
+#        HISTORICAL MARKETDATA STORE                                          #
+###############################################################################
+sql_Exchange_Test = """select 'Exchange' as 'Exchange',
+                              ["curveID"],
+                              ["observationDate"],
+                              ["currencyID"],
+                              ["exchangeRate"]
+                       from [dbo].[mdm.rate]"""
+
+class class_Test_HistoricalStore(TestCase):
+    """
+    Exchange table in sqlite (quoted strings as in the MarketData database),
+    the store in a temp dir
+    """
+    def setUp(self):
+        self.cnxn = sqlite3.connect(':memory:')
+        self.cnxn.execute("attach database ':memory:' as dbo")
+        self.cnxn.execute('create table [dbo].[mdm.rate] (["curveID"] text, ["observationDate"] text, ["currencyID"] text, ["exchangeRate"] real)')
+
+        self.dir_temp = tempfile.TemporaryDirectory()
+        self.patch_dir     = mock.patch.object(readData, 'historical_store_dir', self.dir_temp.name)
+        self.patch_queries = mock.patch.object(readData, 'run_MarketDataQueries', self.run_MarketDataQueries)
+        self.patch_dir.start()
+        self.patch_queries.start()
+
+    def tearDown(self):
+        self.patch_queries.stop()
+        self.patch_dir.stop()
+        self.dir_temp.cleanup()
+        self.cnxn.close()
+
+    def run_MarketDataQueries(self, list_queries):
+        return { str_type : pd.read_sql(sql_query, self.cnxn, params = list_params) \
+                 for str_type, sql_query, list_params in list_queries }
+
+    def insert_Rates(self, FX_rate, list_dates):
+        self.cnxn.executemany('insert into [dbo].[mdm.rate] values (?, ?, ?, ?)',
+                              [ ( '"' + FX_rate[0:3] + '"', '"' + str_date + ' 00:00:00"', '"' + FX_rate[3:6] + '"', 1.0 + 0.01*i ) \
+                                for i, str_date in enumerate(list_dates) ])
+
+    def get_StoredDates(self, FX_rate):
+        return pd.read_csv(readData.get_HistoricalStoreFilename(FX_rate), dtype = {'date' : str})['date'].tolist()
+
+    def test_delta_per_FX_pair(self):
+        self.insert_Rates('EURUSD', ['2018-06-20', '2018-06-21'])
+        self.insert_Rates('USDJPY', ['2018-06-20'])
+
+        self.assertTrue(readData.updateHistoricalStore_Exchange(sql_Exchange_Test, None, False))
+        self.assertEqual(readData.get_HistoricalStoreLastDate('EURUSD'), '2018/06/21')
+        self.assertEqual(readData.get_HistoricalStoreLastDate('USDJPY'), '2018/06/20')
+
+        # USDJPY lags behind EURUSD, GBPUSD is new (with older history)
+        self.cnxn.execute('delete from [dbo].[mdm.rate]')
+        self.insert_Rates('EURUSD', ['2018-06-20', '2018-06-21', '2018-06-22'])
+        self.insert_Rates('USDJPY', ['2018-06-20', '2018-06-21', '2018-06-22'])
+        self.insert_Rates('GBPUSD', ['2018-06-01', '2018-06-22'])
+
+        self.assertTrue(readData.updateHistoricalStore_Exchange(sql_Exchange_Test, None, False))
+
+        self.assertEqual(self.get_StoredDates('EURUSD'), ['2018/06/20', '2018/06/21', '2018/06/22'])
+        self.assertEqual(self.get_StoredDates('USDJPY'), ['2018/06/20', '2018/06/21', '2018/06/22'])
+        self.assertEqual(self.get_StoredDates('GBPUSD'), ['2018/06/01', '2018/06/22'])
+
+    def test_rebuild_list_FX_rates(self):
+        self.insert_Rates('EURUSD', ['2018-06-20', '2018-06-21'])
+        self.insert_Rates('USDJPY', ['2018-06-20'])
+
+        self.assertTrue(readData.updateHistoricalStore_Exchange(sql_Exchange_Test, ['EURUSD'], False))
+        self.assertFalse(os.path.isfile(readData.get_HistoricalStoreFilename('USDJPY')))
+
+        self.assertTrue(readData.updateHistoricalStore_Exchange(sql_Exchange_Test, ['EURUSD'], True))
+        self.assertEqual(self.get_StoredDates('EURUSD'), ['2018/06/20', '2018/06/21'])
+
+###############################################################################
+#        BOOTSTRAP: PRIIPs PATHS, STRESSED VOLATILITY, RANDOM INDICES         #
+###############################################################################
+def calculate_PRIIPsPath_Reference(arr_randomIndices, arr_logReturns, arr_driftTerm, spot_rate):
+    """
+    One PRIIPs path as it was computed per simulation before the matrix engine
+    """
+    arr_returns        = arr_logReturns[arr_randomIndices]
+    arr_returns_cumsum = np.cumsum(arr_returns)
+    arr_underlying     = spot_rate*np.exp(arr_returns_cumsum + arr_driftTerm)
+
+    return arr_underlying
+
+def calculate_stressed_vol_Reference(arr_returns, window_length):
+    """
+    Stressed volatility as it was computed from the explicit rolling windows
+    """
+    arr_rolling_vol = np.array([ np.std(arr_returns[idx_windowStart : idx_windowStart+window_length+1]) \
+                                 for idx_windowStart in range(arr_returns.size - window_length) ])
+
+    if window_length in [12, 16, 63]:
+        return np.percentile(arr_rolling_vol, 90)
+
+    if window_length in [6, 8, 21]:
+        return np.percentile(arr_rolling_vol, 99)
+
+    return None
+
+class class_Test_Bootstrap(TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(2018)
+
+        self.nSims, self.nDays = 300, 260
+        self.spot_rate         = 1.1634
+
+        self.arr_logReturns    = rng.normal(0.0002, 0.006, 1300)
+        self.arr_randomIndices = rng.integers(0, self.arr_logReturns.size, (self.nSims, self.nDays), dtype=np.int32)
+
+        stressed_vol                = calculate_stressed_vol(self.arr_logReturns, 21)
+        self.arr_logReturnsRescaled = self.arr_logReturns * (stressed_vol / np.std(self.arr_logReturns))
+
+        self.arr_ItoTerm   = calculate_ItoTerm(self.arr_logReturns, self.nDays)
+        self.arr_shiftTerm = calculate_ShiftTerm(self.arr_logReturnsRescaled, stressed_vol, self.nDays)
+
+    def test_PRIIPsPaths_Matrix(self):
+        for arr_logReturns, arr_driftTerm in [ (self.arr_logReturns        , self.arr_ItoTerm  ) ,
+                                               (self.arr_logReturnsRescaled, self.arr_shiftTerm) ]:
+
+            arr_paths = calculate_PRIIPsPaths_Matrix( arr_randomIndices = self.arr_randomIndices ,
+                                                      arr_logReturns    = arr_logReturns         ,
+                                                      arr_driftTerm     = arr_driftTerm          ,
+                                                      spot_rate         = self.spot_rate         )
+
+            self.assertEqual(arr_paths.shape, (self.nDays, self.nSims))
+
+            # bit for bit, column by column
+            for i_sim in range(self.nSims):
+                np.testing.assert_array_equal(arr_paths[:, i_sim],
+                                              calculate_PRIIPsPath_Reference( self.arr_randomIndices[i_sim] ,
+                                                                              arr_logReturns                ,
+                                                                              arr_driftTerm                 ,
+                                                                              self.spot_rate                ))
+
+    def test_PRIIPsPaths_ObservationDays(self):
+        arr_paths = calculate_PRIIPsPaths_Matrix( arr_randomIndices = self.arr_randomIndices ,
+                                                  arr_logReturns    = self.arr_logReturns    ,
+                                                  arr_driftTerm     = self.arr_ItoTerm       ,
+                                                  spot_rate         = self.spot_rate         )
+
+        # unsorted, duplicates, first and last day, a day on a chunk border
+        list_observationDays = [ 260, 1, 125, 21, 125, 42, 259 ]
+
+        arr_observationDays, \
+        arr_paths_obs = calculate_PRIIPsPaths_ObservationDays( arr_randomIndices    = self.arr_randomIndices ,
+                                                               arr_logReturns       = self.arr_logReturns    ,
+                                                               arr_driftTerm        = self.arr_ItoTerm       ,
+                                                               spot_rate            = self.spot_rate         ,
+                                                               list_observationDays = list_observationDays   )
+
+        np.testing.assert_array_equal(arr_observationDays, [ 1, 21, 42, 125, 259, 260 ])
+
+        # the returns are summed up in chunks: rounding differs slightly
+        np.testing.assert_allclose(arr_paths_obs, arr_paths[arr_observationDays - 1], rtol=1e-15, atol=0.0)
+
+    def test_stressed_vol(self):
+        for window_length in [ 6, 8, 12, 16, 21, 63 ]:
+            stressed_vol = calculate_stressed_vol(self.arr_logReturns, window_length)
+
+            # cumulative sums instead of one std per window: a few ulp
+            self.assertAlmostEqual(stressed_vol / calculate_stressed_vol_Reference(self.arr_logReturns, window_length), 1.0, delta=1e-14)
+
+        # window length without a percentile
+        self.assertIsNone(calculate_stressed_vol(self.arr_logReturns, 10))
+
+    def test_stressed_vol_too_few_returns(self):
+        self.assertIsNone(calculate_stressed_vol(self.arr_logReturns[:63], 63))
+        self.assertIsNotNone(calculate_stressed_vol(self.arr_logReturns[:64], 63))
+
+    def test_select_RandomIndices(self):
+        def select(FX_rate, scenario, randomSeed = 1337):
+            return select_RandomIndices( n_indices     = self.nDays               ,
+                                         n_LogReturns  = self.arr_logReturns.size ,
+                                         n_simulations = self.nSims               ,
+                                         randomSeed    = randomSeed               ,
+                                         FX_rate       = FX_rate                  ,
+                                         scenario      = scenario                 )
+
+        arr_EURUSD_FMU = select('EURUSD', 'FMU')
+        arr_EURUSD_S   = select('EURUSD', 'S'  )
+        arr_GBPUSD_FMU = select('GBPUSD', 'FMU')
+
+        self.assertEqual(arr_EURUSD_FMU.shape, (self.nSims, self.nDays))
+        self.assertTrue(arr_EURUSD_FMU.min() >= 0 and arr_EURUSD_FMU.max() < self.arr_logReturns.size)
+
+        # same key, other call order --> same block
+        np.testing.assert_array_equal(select('GBPUSD', 'FMU'), arr_GBPUSD_FMU)
+        np.testing.assert_array_equal(select('EURUSD', 'S'  ), arr_EURUSD_S  )
+        np.testing.assert_array_equal(select('EURUSD', 'FMU'), arr_EURUSD_FMU)
+
+        # other pair, scenario or seed --> other block
+        self.assertFalse(np.array_equal(arr_EURUSD_FMU, arr_GBPUSD_FMU))
+        self.assertFalse(np.array_equal(arr_EURUSD_FMU, arr_EURUSD_S  ))
+        self.assertFalse(np.array_equal(arr_EURUSD_FMU, select('EURUSD', 'FMU', randomSeed = 1338)))
+
+###############################################################################
+#        RANDOM INDEX FILE: BINARY COMPANION                                  #
+###############################################################################
+class class_Test_RandomIndexFile(TestCase):
+
+    def setUp(self):
+        self.dir_temp = tempfile.TemporaryDirectory()
+
+        self.filename_csv    = os.path.join(self.dir_temp.name, 'RandomIndices.csv')
+        self.filename_npy    = os.path.join(self.dir_temp.name, 'RandomIndices.npy')
+        self.filename_header = self.filename_npy + '.json'
+
+    def tearDown(self):
+        self.dir_temp.cleanup()
+
+    def write_RandomIndexFile(self, arr_RandomValues, time_modified):
+        # one row per trading day, one column per simulation
+        np.savetxt(self.filename_csv, arr_RandomValues.T, fmt='%.17g', delimiter=' ')
+        os.utime(self.filename_csv, (time_modified, time_modified))
+
+    def get_Uniforms(self, seed):
+        # k/1024 is exact in the text file
+        return np.random.default_rng(seed).integers(0, 1024, (50, 30)) / 1024.0
+
+    def test_round_trip(self):
+        arr_RandomValues = self.get_Uniforms(5)
+        self.write_RandomIndexFile(arr_RandomValues, 1.0e9)
+
+        obj_RandomIndices = readData.readRandomIndexFile(self.filename_csv)
+
+        self.assertTrue(obj_RandomIndices.flag_uniform)
+        np.testing.assert_array_equal(obj_RandomIndices.arr_RandomValues, arr_RandomValues)
+        self.assertTrue(os.path.isfile(self.filename_npy) and os.path.isfile(self.filename_header))
+
+        # second read: memory mapped companion
+        obj_RandomIndices = readData.readRandomIndexFile(self.filename_csv)
+
+        self.assertIsInstance(obj_RandomIndices.arr_RandomValues, np.memmap)
+        self.assertTrue(obj_RandomIndices.flag_uniform)
+        np.testing.assert_array_equal(obj_RandomIndices.arr_RandomValues, arr_RandomValues)
+
+    def test_return_picks(self):
+        arr_RandomValues = np.random.default_rng(6).integers(1, 500, (50, 30)).astype(np.float64)
+        self.write_RandomIndexFile(arr_RandomValues, 1.0e9)
+
+        for _ in range(2):
+            obj_RandomIndices = readData.readRandomIndexFile(self.filename_csv)
+
+            self.assertFalse(obj_RandomIndices.flag_uniform)
+            np.testing.assert_array_equal(obj_RandomIndices.arr_RandomValues, arr_RandomValues)
+
+    def test_text_file_newer_than_companion(self):
+        self.write_RandomIndexFile(self.get_Uniforms(5), 1.0e9)
+        readData.readRandomIndexFile(self.filename_csv)
+        os.utime(self.filename_npy, (1.0e9 + 5.0, 1.0e9 + 5.0))
+
+        arr_RandomValues = self.get_Uniforms(7)
+        self.write_RandomIndexFile(arr_RandomValues, 1.0e9 + 10.0)
+
+        obj_RandomIndices = readData.readRandomIndexFile(self.filename_csv)
+        np.testing.assert_array_equal(obj_RandomIndices.arr_RandomValues, arr_RandomValues)
+
+        # the companion was rebuilt
+        obj_RandomIndices = readData.readRandomIndexFile(self.filename_csv)
+        self.assertIsInstance(obj_RandomIndices.arr_RandomValues, np.memmap)
+        np.testing.assert_array_equal(obj_RandomIndices.arr_RandomValues, arr_RandomValues)
+
+    def test_broken_companion(self):
+        arr_RandomValues = self.get_Uniforms(5)
+        self.write_RandomIndexFile(arr_RandomValues, 1.0e9)
+        readData.readRandomIndexFile(self.filename_csv)
+
+        list_invalidate = [ lambda: os.remove(self.filename_npy)                                                        ,
+                            lambda: open(self.filename_header, 'w').write('{"shape": [50, 30]}')                        ,
+                            lambda: open(self.filename_header, 'w').write('{"shape": [30, 50], "dtype": "float64", "type": "uniform"}') ,
+                            lambda: open(self.filename_npy, 'wb').write(b'no npy')                                      ]
+
+        for invalidate in list_invalidate:
+            invalidate()
+
+            obj_RandomIndices = readData.readRandomIndexFile(self.filename_csv)
+            self.assertTrue(obj_RandomIndices.flag_uniform)
+            np.testing.assert_array_equal(obj_RandomIndices.arr_RandomValues, arr_RandomValues)
+
+            # rebuilt from the text file
+            with open(self.filename_header) as f:
+                self.assertEqual(json.load(f)['shape'], [50, 30])
+            self.assertIsInstance(readData.readRandomIndexFile(self.filename_csv).arr_RandomValues, np.memmap)
+
+###############################################################################
+#        MARKETDATA SNAPSHOTS                                                 #
+###############################################################################
+class class_Test_MarketDataSnapshot(TestCase):
+    """
+    readCurrentMarketData with useSnapshot, the database replaced by raw
+    query results as pd.read_sql returns them (quoted strings)
+    """
+    def setUp(self):
+        self.dir_temp = tempfile.TemporaryDirectory()
+        self.nQueries = 0
+        self.level    = 1.0
+
+        self.patch_dir     = mock.patch.object(readData, 'snapshot_dir', self.dir_temp.name)
+        self.patch_queries = mock.patch.object(readData, 'run_MarketDataQueries', self.run_MarketDataQueries)
+        self.patch_dir.start()
+        self.patch_queries.start()
+
+    def tearDown(self):
+        self.patch_queries.stop()
+        self.patch_dir.stop()
+        self.dir_temp.cleanup()
+
+    def run_MarketDataQueries(self, list_queries):
+        self.nQueries += 1
+
+        dict_queryResults = dict()
+        for str_type, sql_query, list_params in list_queries:
+            dict_query = dict()
+            for i_column, column in enumerate(readData.dict_MarketDataColumns[str_type]):
+                if column == 'type':
+                    dict_query[i_column] = [ '"' + str_type + '"' ] * 3
+                elif column == 'date':
+                    dict_query[i_column] = [ '"2018-06-25 00:00:00"' ] * 3
+                elif column in readData.dict_MarketDataFloatColumns[str_type]:
+                    dict_query[i_column] = [ self.level * 0.1, self.level * 1.0/3.0, self.level * 2.5 ]
+                else:
+                    dict_query[i_column] = [ '"' + column + '-' + str(i_row) + '"' for i_row in range(3) ]
+            dict_queryResults[str_type] = pd.DataFrame(dict_query)
+
+        return dict_queryResults
+
+    def read(self):
+        tuple_result = readData.readCurrentMarketData(str_dateIdentifier = '20180625', useSnapshot = True)
+        self.assertTrue(tuple_result[0])
+        return tuple_result[1:]
+
+    def assert_MarketDataEqual(self, tuple_MarketData, tuple_MarketData_expected):
+        for df_MarketData, df_MarketData_expected in zip(tuple_MarketData, tuple_MarketData_expected):
+            self.assertEqual(list(df_MarketData.columns), list(df_MarketData_expected.columns))
+            for column in df_MarketData.columns:
+                np.testing.assert_array_equal(df_MarketData[column].values, df_MarketData_expected[column].values)
+
+    def test_round_trip(self):
+        tuple_database = self.read()
+        self.assertEqual(self.nQueries, 1)
+        self.assertTrue(os.path.isfile(readData.get_MarketDataSnapshotFilename('20180625')))
+        self.assertEqual(tuple_database[0]['date'].tolist(), [ '2018/06/25' ] * 3)
+
+        # served from the snapshot, same data
+        tuple_snapshot = self.read()
+        self.assertEqual(self.nQueries, 1)
+        self.assert_MarketDataEqual(tuple_snapshot, tuple_database)
+
+    def test_invalidate(self):
+        self.read()
+
+        self.level = 2.0
+        self.assertEqual(self.read()[0]['rate'].tolist()[0], 0.1)
+
+        self.assertEqual(readData.invalidateMarketDataSnapshot('20180624'), [])
+        self.assertEqual(readData.invalidateMarketDataSnapshot('20180625'), [ readData.get_MarketDataSnapshotFilename('20180625') ])
+
+        # read from the database again and the snapshot rebuilt
+        tuple_database = self.read()
+        self.assertEqual(self.nQueries, 2)
+        self.assertEqual(tuple_database[0]['rate'].tolist()[0], 0.2)
+        self.assert_MarketDataEqual(self.read(), tuple_database)
+        self.assertEqual(self.nQueries, 2)
+
+        self.assertEqual(len(readData.invalidateMarketDataSnapshot()), 1)
+        self.assertIsNone(readData.readMarketDataSnapshot('20180625'))
+
+    def test_broken_snapshot(self):
+        tuple_database = self.read()
+
+        with open(readData.get_MarketDataSnapshotFilename('20180625'), 'wb') as f:
+            f.write(b'no npz')
+
+        self.assertIsNone(readData.readMarketDataSnapshot('20180625'))
+
+        # read from the database and rewritten
+        self.assert_MarketDataEqual(self.read(), tuple_database)
+        self.assertEqual(self.nQueries, 2)
+        self.assert_MarketDataEqual(readData.readMarketDataSnapshot('20180625'), tuple_database)
+
+###############################################################################
+#        LOG RETURN CACHE                                                     #
+###############################################################################
+def setup_HistoricalExchange(nObservations, list_FX_rates = ['EURUSD', 'USDJPY']):
+    """
+    Historical Exchange observations as readHistoricalMarketData returns them
+    """
+    rng = np.random.default_rng(15)
+
+    list_dates = pd.bdate_range(end = '2018-06-25', periods = nObservations).strftime('%Y/%m/%d').tolist()
+
+    list_MarketData = []
+    for FX_rate in list_FX_rates:
+        list_MarketData.append(pd.DataFrame({ 'type'    : 'Exchange'                                                     ,
+                                              'ccy_FOR' : FX_rate[0:3]                                                   ,
+                                              'date'    : list_dates                                                     ,
+                                              'ccy_DOM' : FX_rate[3:6]                                                   ,
+                                              'rate'    : 1.1 * np.exp(np.cumsum(rng.normal(0.0, 0.006, nObservations))) }))
+
+    return pd.concat(list_MarketData, ignore_index=True)
+
+class class_Test_LogReturnCache(TestCase):
+
+    def setUp(self):
+        self.dir_temp  = tempfile.TemporaryDirectory()
+        self.patch_dir = mock.patch.object(LogReturnCache, 'logReturn_cache_dir', self.dir_temp.name)
+        self.patch_dir.start()
+
+        # counts the computations (memory and disk misses)
+        self.nComputed = 0
+        calculate      = LogReturnCache.calculate_LogReturnStatistics_FX
+
+        def calculate_counted(**kwargs):
+            self.nComputed += 1
+            return calculate(**kwargs)
+
+        self.patch_calculate = mock.patch.object(LogReturnCache, 'calculate_LogReturnStatistics_FX', calculate_counted)
+        self.patch_calculate.start()
+
+        LogReturnCache.cache_LogReturns.clear()
+
+    def tearDown(self):
+        LogReturnCache.cache_LogReturns.clear()
+        self.patch_calculate.stop()
+        self.patch_dir.stop()
+        self.dir_temp.cleanup()
+
+    def get(self, df_Exchange, FX_rate = 'EURUSD'):
+        return LogReturnCache.get_LogReturns_FX( df_HistoricalMarketData_Exchange = df_Exchange  ,
+                                                 ccy_FOR                          = FX_rate[0:3] ,
+                                                 ccy_DOM                          = FX_rate[3:6] ,
+                                                 flag_persist                     = True         )
+
+    def assert_LogReturnsEqual(self, dict_logReturns, dict_logReturns_expected):
+        np.testing.assert_array_equal(dict_logReturns['arr_logReturns'], dict_logReturns_expected['arr_logReturns'])
+        for key in ['std', 'stressed_vol', 'mean_rescaled']:
+            self.assertEqual(dict_logReturns[key], dict_logReturns_expected[key])
+
+    def test_round_trip(self):
+        df_Exchange = setup_HistoricalExchange(300)
+
+        dict_computed = self.get(df_Exchange)
+        self.assertEqual(self.nComputed, 1)
+        self.assertEqual(len(os.listdir(self.dir_temp.name)), 1)
+
+        # memory
+        self.assertIs(self.get(df_Exchange), dict_computed)
+
+        # disk, bit for bit
+        LogReturnCache.cache_LogReturns.clear()
+        self.assert_LogReturnsEqual(self.get(df_Exchange), dict_computed)
+        self.assertEqual(self.nComputed, 1)
+
+        # other pair, other entry
+        self.get(df_Exchange, 'USDJPY')
+        self.assertEqual(self.nComputed, 2)
+
+    def test_too_few_returns_for_stressed_vol(self):
+        df_Exchange = setup_HistoricalExchange(15)
+
+        dict_computed = self.get(df_Exchange)
+        self.assertIsNone(dict_computed['stressed_vol'])
+
+        LogReturnCache.cache_LogReturns.clear()
+        dict_logReturns = self.get(df_Exchange)
+
+        self.assertEqual(self.nComputed, 1)
+        self.assertIsNone(dict_logReturns['stressed_vol'])
+        self.assertIsNone(dict_logReturns['mean_rescaled'])
+        np.testing.assert_array_equal(dict_logReturns['arr_logReturns'], dict_computed['arr_logReturns'])
+
+    def test_new_observation(self):
+        df_Exchange = setup_HistoricalExchange(301)
+
+        self.get(df_Exchange.iloc[1:])
+        dict_logReturns = self.get(df_Exchange)
+
+        # longer history: new key, recomputed
+        self.assertEqual(self.nComputed, 2)
+        self.assertEqual(dict_logReturns['arr_logReturns'].size, 300)
+
+    def test_invalidate(self):
+        df_Exchange = setup_HistoricalExchange(300)
+
+        dict_computed = self.get(df_Exchange)
+        LogReturnCache.invalidate_LogReturnCache()
+        self.assertEqual(os.listdir(self.dir_temp.name), [])
+
+        self.assert_LogReturnsEqual(self.get(df_Exchange), dict_computed)
+        self.assertEqual(self.nComputed, 2)
+        self.assertEqual(len(os.listdir(self.dir_temp.name)), 1)
+
+    def test_broken_file(self):
+        df_Exchange = setup_HistoricalExchange(300)
+
+        dict_computed = self.get(df_Exchange)
+        filename      = os.path.join(self.dir_temp.name, os.listdir(self.dir_temp.name)[0])
+
+        with open(filename, 'wb') as f:
+            np.savez(f, arr_logReturns = dict_computed['arr_logReturns'])
+
+        LogReturnCache.cache_LogReturns.clear()
+        self.assert_LogReturnsEqual(self.get(df_Exchange), dict_computed)
+        self.assertEqual(self.nComputed, 2)
+
+        # rewritten
+        LogReturnCache.cache_LogReturns.clear()
+        self.assert_LogReturnsEqual(self.get(df_Exchange), dict_computed)
+        self.assertEqual(self.nComputed, 2)
+
+###############################################################################
+#        LRU CACHE AND WORKFLOW INPUT CACHE                                   #
+###############################################################################
+class class_Test_LRUCache(TestCase):
+
+    def test_eviction_order(self):
+        obj_cache = class_LRUCache(maxsize = 3)
+
+        for key in ['a', 'b', 'c']:
+            obj_cache.put(key, key.upper())
+
+        # 'a' is used, 'b' is the least recently used entry now
+        self.assertEqual(obj_cache.get('a'), 'A')
+        obj_cache.put('d', 'D')
+
+        self.assertIsNone(obj_cache.get('b'))
+        self.assertEqual([ obj_cache.get(key) for key in ['a', 'c', 'd'] ], ['A', 'C', 'D'])
+
+        # storing an existing key refreshes it: 'a' is evicted next
+        obj_cache.put('c', 'C2')
+        obj_cache.put('e', 'E')
+        obj_cache.put('f', 'F')
+
+        self.assertEqual(list(obj_cache.dict_entries.keys()), ['c', 'e', 'f'])
+        self.assertEqual(obj_cache.get('c'), 'C2')
+
+        self.assertEqual(obj_cache.get_Statistics(), { "hits" : 5, "misses" : 1, "size" : 3, "maxsize" : 3, "ttl" : None })
+
+    def test_ttl(self):
+        obj_cache = class_LRUCache(maxsize = None, ttl = 10.0)
+
+        with mock.patch('timeit.default_timer', return_value = 100.0):
+            obj_cache.put('a', 1)
+
+        with mock.patch('timeit.default_timer', return_value = 105.0):
+            obj_cache.put('b', 2)
+            self.assertEqual(obj_cache.get('a'), 1)
+
+        with mock.patch('timeit.default_timer', return_value = 110.5):
+            self.assertIsNone(obj_cache.get('a'))
+            self.assertEqual(obj_cache.get('b'), 2)
+
+        # the expired entry is dropped on lookup
+        self.assertEqual(len(obj_cache), 1)
+
+        with mock.patch('timeit.default_timer', return_value = 115.5):
+            self.assertEqual(obj_cache.get('b', 'expired'), 'expired')
+
+        self.assertEqual(len(obj_cache), 0)
+
+    def test_get_or_compute(self):
+        obj_cache = class_LRUCache()
+        list_calls = []
+
+        def compute(value):
+            list_calls.append(value)
+            return value
+
+        self.assertEqual(obj_cache.get_or_compute('a', lambda: compute(1)), 1)
+        self.assertEqual(obj_cache.get_or_compute('a', lambda: compute(2)), 1)
+
+        # errors (None) are not stored
+        self.assertIsNone(obj_cache.get_or_compute('b', lambda: compute(None)))
+        self.assertEqual(obj_cache.get_or_compute('b', lambda: compute(3)), 3)
+
+        self.assertEqual(list_calls, [1, None, 3])
+
+class class_Test_WorkflowInputCache(TestCase):
+
+    def setUp(self):
+        self.dict_settings = { "tradeDate" : "25/06/2018", "inputCacheSize" : 2, "inputCacheTTL" : None }
+        self.list_loads    = []
+
+        self.patch_cache = mock.patch.object(WorkflowInputs, 'cache_WorkflowInputs', None)
+        self.patch_cache.start()
+
+    def tearDown(self):
+        self.patch_cache.stop()
+        WorkflowInputs.dict_LoadLocks_WorkflowInputs.clear()
+
+    def get(self, load_WorkflowInputs):
+        with mock.patch.object(WorkflowInputs, 'load_WorkflowInputs', load_WorkflowInputs):
+            return WorkflowInputs.get_WorkflowInputs( dict_settings      = self.dict_settings ,
+                                                      settingsFilename   = 'Settings.json'    ,
+                                                      str_dateIdentifier = '20180625'         )
+
+    def load_Failing(self, **kwargs):
+        self.list_loads.append('failed')
+        return None
+
+    def load_Raising(self, **kwargs):
+        self.list_loads.append('raised')
+        raise RuntimeError('database not reachable')
+
+    def load(self, **kwargs):
+        self.list_loads.append('loaded')
+        return { 'tradeDate' : kwargs['dict_settings']['tradeDate'] }
+
+    def test_failed_load(self):
+        self.assertIsNone(self.get(self.load_Failing))
+        self.assertEqual(WorkflowInputs.dict_LoadLocks_WorkflowInputs, dict())
+
+        with self.assertRaises(RuntimeError):
+            self.get(self.load_Raising)
+        self.assertEqual(WorkflowInputs.dict_LoadLocks_WorkflowInputs, dict())
+
+        # loaded on the next request, then served from the cache
+        dict_inputs = self.get(self.load)
+        self.assertIs(self.get(self.load_Failing), dict_inputs)
+
+        self.assertEqual(self.list_loads, ['failed', 'raised', 'loaded'])
+        self.assertEqual(WorkflowInputs.dict_LoadLocks_WorkflowInputs, dict())
+
+    def test_concurrent_requests_load_once(self):
+        event_release = threading.Event()
+
+        def load_Slow(**kwargs):
+            event_release.wait(5.0)
+            return self.load(**kwargs)
+
+        def get():
+            list_results.append(WorkflowInputs.get_WorkflowInputs( dict_settings      = self.dict_settings ,
+                                                                   settingsFilename   = 'Settings.json'    ,
+                                                                   str_dateIdentifier = '20180625'         ))
+
+        list_results = []
+        list_threads = [ threading.Thread(target = get) for _ in range(4) ]
+
+        with mock.patch.object(WorkflowInputs, 'load_WorkflowInputs', load_Slow):
+            for thread in list_threads:
+                thread.start()
+            event_release.set()
+            for thread in list_threads:
+                thread.join()
+
+        self.assertEqual(self.list_loads, ['loaded'])
+        self.assertTrue(all(dict_inputs is list_results[0] for dict_inputs in list_results))
+        self.assertEqual(WorkflowInputs.dict_LoadLocks_WorkflowInputs, dict())
+
+###############################################################################
+#        MEMOIZED DATE LOGIC                                                  #
+###############################################################################
+class class_Test_MemoizeLRU(TestCase):
+
+    def setUp(self):
+        clear_DateLogicCache()
+
+        date_start = datetime(2017, 12, 1)
+        self.list_dates = [ (date_start + timedelta(days=i)).strftime('%d/%m/%Y') for i in range(0, 200, 3) ]
+
+    def tearDown(self):
+        clear_DateLogicCache()
+
+    def test_DateLogic_matches_uncached(self):
+        # twice: computed, then served from the cache
+        list_misses = []
+
+        for _ in range(2):
+            for cdate in self.list_dates:
+                for shift in ['2D', '-2D', '1M', '6M', '1Y']:
+                    self.assertEqual(addTenor(cdate, shift), addTenor.function_uncached(cdate, shift))
+
+                end_date = addTenor(cdate, '6M')
+
+                list_holidays = getHolidaysBetween(cdate, end_date, COUNTRY_HOLIDAYS = 'England')
+                self.assertEqual(list_holidays, getHolidaysBetween.function_uncached(cdate, end_date, COUNTRY_HOLIDAYS = 'England'))
+
+                self.assertEqual(networkdays(cdate, end_date, list_holidays),
+                                 networkdays.function_uncached(cdate, end_date, list_holidays))
+
+                self.assertEqual(getYearFraction(cdate, end_date, 'ACT365'),
+                                 getYearFraction.function_uncached(cdate, end_date, 'ACT365'))
+
+            list_misses.append([ function.cache.nMisses for function in [addTenor, getHolidaysBetween, networkdays, getYearFraction] ])
+
+        # nothing was computed again
+        self.assertEqual(list_misses[1], list_misses[0])
+
+    def test_returned_list_is_a_copy(self):
+        list_holidays = getHolidaysBetween('01/12/2017', '30/06/2018', COUNTRY_HOLIDAYS = 'England')
+        list_expected = list(list_holidays)
+
+        list_holidays.append('01/01/2099')
+        list_holidays.pop(0)
+
+        self.assertEqual(getHolidaysBetween('01/12/2017', '30/06/2018', COUNTRY_HOLIDAYS = 'England'), list_expected)
+
+    def test_decorator(self):
+        list_calls = []
+
+        @memoize_LRU(maxsize = 2)
+        def add(x, list_y, z = 0):
+            list_calls.append(x)
+            return x + sum(list_y) + z
+
+        self.assertEqual(add(1, [2, 3]), 6)
+        self.assertEqual(add(1, [2, 3]), 6)
+        self.assertEqual(add(1, (2, 3)), 6)
+        self.assertEqual(add(1, [2, 3], z = 1), 7)
+        self.assertEqual(list_calls, [1, 1])
+
+        # maxsize 2: the least recently used argument set is evicted
+        add(2, [])
+        self.assertEqual(add(1, [2, 3], z = 1), 7)
+        self.assertEqual(add(1, [2, 3]), 6)
+        self.assertEqual(list_calls, [1, 1, 2, 1])
+
+        self.assertEqual(add.cache.get_Statistics()['size'], 2)
+        self.assertEqual(add.__name__, 'add')